@@ -1746,7 +1746,7 @@ class URDF(URDFType):
             link = self._link_map[joints[i].child]
             elinks[i].r = link.inertial.origin
             elinks[i].m = link.inertial.mass
-            elinks[i].inertia = link.inertial.inertia
+            elinks[i].I = link.inertial.inertia
 
             try:
                 if self.joints[i].dynamics.friction is not None:
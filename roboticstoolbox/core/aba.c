@@ -0,0 +1,424 @@
+/**
+ * \file aba.c
+ * \author Peter Corke
+ * \author Jesse Haviland
+ * \brief Compute the forward dynamics via the articulated body algorithm
+ */
+
+/*
+ * Compute the forward dynamics via Featherstone's articulated body algorithm
+ *
+ *	Requires:	q	current joint coordinates
+ *			qd	current joint velocities
+ *			tau	applied joint torques
+ *			grav	the gravitational acceleration
+ *
+ *	Returns:	qdd	joint accelerations
+ *
+ * Each link is described in its joint frame, the frame whose z-axis is the
+ * joint axis, so that the joint motion subspace is a unit z rotation or
+ * translation.  For standard DH the joint frame of link j is frame j-1
+ * rotated by the joint, for modified DH it is frame j.
+ *
+ * Spatial vectors are ordered angular then linear, 6x6 matrices are stored
+ * row major.
+ */
+#include	<math.h>
+#include	<string.h>
+#include	"frne.h"
+
+/* motion subspace index of the joint axis within a spatial vector */
+#define	AXIS(l)	((l)->jointtype == PRISMATIC ? 5 : 2)
+
+/* work area for one link */
+typedef struct _abalink {
+	double	E[9];		/* rotation of joint frame wrt parent */
+	double	p[3];		/* origin of joint frame wrt parent */
+	double	I[36];		/* spatial inertia, then articulated inertia */
+	double	v[6];		/* spatial velocity */
+	double	c[6];		/* velocity product acceleration */
+	double	pA[6];		/* bias force, then articulated bias force */
+	double	a[6];		/* spatial acceleration */
+	double	U[6];		/* I S */
+	double	D;		/* S' I S + armature */
+	double	u;		/* tau - S' pA */
+} ABALink;
+
+int
+aba_work_size(int njoints)
+{
+	return njoints * (int)(sizeof(ABALink) / sizeof(double) + 1);
+}
+
+static void
+cross3(double *r, const double *a, const double *b)
+{
+	r[0] = a[1] * b[2] - a[2] * b[1];
+	r[1] = a[2] * b[0] - a[0] * b[2];
+	r[2] = a[0] * b[1] - a[1] * b[0];
+}
+
+/* r = E' x, E a row major 3x3 */
+static void
+rot_t_mult(double *r, const double *E, const double *x)
+{
+	r[0] = E[0] * x[0] + E[3] * x[1] + E[6] * x[2];
+	r[1] = E[1] * x[0] + E[4] * x[1] + E[7] * x[2];
+	r[2] = E[2] * x[0] + E[5] * x[1] + E[8] * x[2];
+}
+
+/* r = E x, E a row major 3x3 */
+static void
+rot_mult(double *r, const double *E, const double *x)
+{
+	r[0] = E[0] * x[0] + E[1] * x[1] + E[2] * x[2];
+	r[1] = E[3] * x[0] + E[4] * x[1] + E[5] * x[2];
+	r[2] = E[6] * x[0] + E[7] * x[1] + E[8] * x[2];
+}
+
+/* motion vector from parent to joint frame coordinates */
+static void
+xform_motion(double *r, const ABALink *l, const double *m)
+{
+	double	t[3], px[3];
+
+	rot_t_mult(r, l->E, m);
+	cross3(px, l->p, m);
+	t[0] = m[3] - px[0];
+	t[1] = m[4] - px[1];
+	t[2] = m[5] - px[2];
+	rot_t_mult(r + 3, l->E, t);
+}
+
+/* add a force vector in joint frame coordinates to one in parent coords */
+static void
+xform_force_add(double *r, const ABALink *l, const double *f)
+{
+	double	n[3], ff[3], px[3];
+
+	rot_mult(n, l->E, f);
+	rot_mult(ff, l->E, f + 3);
+	cross3(px, l->p, ff);
+	r[0] += n[0] + px[0];
+	r[1] += n[1] + px[1];
+	r[2] += n[2] + px[2];
+	r[3] += ff[0];
+	r[4] += ff[1];
+	r[5] += ff[2];
+}
+
+/* add X' Ia X to the parent articulated inertia, X parent to joint frame */
+static void
+xform_inertia_add(double *r, const ABALink *l, const double *Ia)
+{
+	double	X[36], T[36];
+	double	P[9];
+	int	i, j, k;
+
+	/* X = [E' 0; -E' [p]x E'] */
+	P[0] = 0;	P[1] = -l->p[2];	P[2] = l->p[1];
+	P[3] = l->p[2];	P[4] = 0;	P[5] = -l->p[0];
+	P[6] = -l->p[1];	P[7] = l->p[0];	P[8] = 0;
+
+	memset(X, 0, sizeof(X));
+	for (i = 0; i < 3; i++)
+		for (j = 0; j < 3; j++) {
+			double	s = 0;
+
+			X[i * 6 + j] = l->E[j * 3 + i];
+			X[(i + 3) * 6 + j + 3] = l->E[j * 3 + i];
+			for (k = 0; k < 3; k++)
+				s -= l->E[k * 3 + i] * P[k * 3 + j];
+			X[(i + 3) * 6 + j] = s;
+		}
+
+	/* T = Ia X */
+	for (i = 0; i < 6; i++)
+		for (j = 0; j < 6; j++) {
+			double	s = 0;
+
+			for (k = 0; k < 6; k++)
+				s += Ia[i * 6 + k] * X[k * 6 + j];
+			T[i * 6 + j] = s;
+		}
+
+	/* r += X' T */
+	for (i = 0; i < 6; i++)
+		for (j = 0; j < 6; j++) {
+			double	s = 0;
+
+			for (k = 0; k < 6; k++)
+				s += X[k * 6 + i] * T[k * 6 + j];
+			r[i * 6 + j] += s;
+		}
+}
+
+/* r = crm(v) m */
+static void
+cross_motion(double *r, const double *v, const double *m)
+{
+	double	t[3];
+
+	cross3(r, v, m);
+	cross3(r + 3, v, m + 3);
+	cross3(t, v + 3, m);
+	r[3] += t[0];
+	r[4] += t[1];
+	r[5] += t[2];
+}
+
+/* r = crf(v) f */
+static void
+cross_force(double *r, const double *v, const double *f)
+{
+	double	t[3];
+
+	cross3(r, v, f);
+	cross3(t, v + 3, f + 3);
+	r[0] += t[0];
+	r[1] += t[1];
+	r[2] += t[2];
+	cross3(r + 3, v, f + 3);
+}
+
+/* r = I x */
+static void
+mat6_mult(double *r, const double *I, const double *x)
+{
+	for (int i = 0; i < 6; i++) {
+		double	s = 0;
+
+		for (int k = 0; k < 6; k++)
+			s += I[i * 6 + k] * x[k];
+		r[i] = s;
+	}
+}
+
+/* r = [1 0 0; 0 c -s; 0 s c] */
+static void
+rotx(double *r, double alpha)
+{
+	double	s = sin(alpha), c = cos(alpha);
+
+	r[0] = 1;	r[1] = 0;	r[2] = 0;
+	r[3] = 0;	r[4] = c;	r[5] = -s;
+	r[6] = 0;	r[7] = s;	r[8] = c;
+}
+
+/*
+ * Spatial inertia of link j about the origin of its joint frame.  For
+ * standard DH the link parameters are given in frame j, which is the joint
+ * frame translated by a along x and rotated by alpha about x.
+ */
+static void
+link_inertia(double *I, Link *l, DHType dhtype)
+{
+	double	c[3], J[9], R[9], t[9];
+	double	m = l->m;
+	int	i, j, k;
+
+	if (dhtype == STANDARD) {
+		double	rbar[3] = {l->rbar->x, l->rbar->y, l->rbar->z};
+
+		rotx(R, l->alpha);
+		rot_mult(c, R, rbar);
+		c[0] += l->A;
+
+		/* J = R I R' */
+		for (i = 0; i < 3; i++)
+			for (j = 0; j < 3; j++) {
+				double	s = 0;
+
+				for (k = 0; k < 3; k++)
+					s += R[i * 3 + k] * l->I[k * 3 + j];
+				t[i * 3 + j] = s;
+			}
+		for (i = 0; i < 3; i++)
+			for (j = 0; j < 3; j++) {
+				double	s = 0;
+
+				for (k = 0; k < 3; k++)
+					s += t[i * 3 + k] * R[j * 3 + k];
+				J[i * 3 + j] = s;
+			}
+	} else {
+		c[0] = l->rbar->x;
+		c[1] = l->rbar->y;
+		c[2] = l->rbar->z;
+		memcpy(J, l->I, sizeof(J));
+	}
+
+	/* I = [J + m [c]x [c]x' , m [c]x; m [c]x', m 1] */
+	double	C[9] = {
+		0, -c[2], c[1],
+		c[2], 0, -c[0],
+		-c[1], c[0], 0};
+
+	memset(I, 0, 36 * sizeof(double));
+	for (i = 0; i < 3; i++)
+		for (j = 0; j < 3; j++) {
+			double	s = 0;
+
+			for (k = 0; k < 3; k++)
+				s += C[i * 3 + k] * C[j * 3 + k];
+			I[i * 6 + j] = J[i * 3 + j] + m * s;
+			I[i * 6 + j + 3] = m * C[i * 3 + j];
+			I[(i + 3) * 6 + j] = m * C[j * 3 + i];
+		}
+	I[21] = I[28] = I[35] = m;
+}
+
+/**
+ * Articulated body algorithm.
+ *
+ * The torque required to overcome joint friction is subtracted from \p tau
+ * and the motor inertia, reflected through the gear ratio, is added to the
+ * joint, consistent with newton_euler().
+ *
+ * The robot object is not modified so the function may be called from
+ * several threads at once provided each has its own \p work area of at
+ * least aba_work_size() doubles.
+ */
+void
+articulated_body (
+	Robot	*robot,		/*!< robot object  */
+	double	*qdd,		/*!< returned joint accelerations */
+	double	*q,		/*!< joint coordinates */
+	double	*qd,		/*!< joint velocities */
+	double	*tau,		/*!< applied joint torques */
+	double	*grav,		/*!< gravity vector */
+	double	*work		/*!< work area */
+) {
+	int		n = robot->njoints;
+	ABALink		*w = (ABALink *)work;
+	register int	j;
+
+	/*
+	 * forward recursion, link velocities and bias forces
+	 */
+	for (j = 0; j < n; j++) {
+		Link	*l = &robot->links[j];
+		ABALink	*lw = &w[j];
+		double	R[9], Rz[9], th, d, st, ct, h[6];
+		int	ax = AXIS(l);
+
+		if (l->jointtype == PRISMATIC) {
+			th = l->theta;
+			d = q[j] + l->offset;
+		} else {
+			th = q[j] + l->offset;
+			d = l->D;
+		}
+
+		/* constant part of the transform from the parent joint frame */
+		if (robot->dhtype == MODIFIED) {
+			rotx(R, l->alpha);
+			lw->p[0] = l->A;
+		} else if (j > 0) {
+			rotx(R, robot->links[j - 1].alpha);
+			lw->p[0] = robot->links[j - 1].A;
+		} else {
+			rotx(R, 0.0);
+			lw->p[0] = 0.0;
+		}
+		lw->p[1] = 0.0;
+		lw->p[2] = 0.0;
+
+		/* followed by the joint, rotation about z and translation along z */
+		st = sin(th);
+		ct = cos(th);
+		Rz[0] = ct;	Rz[1] = -st;	Rz[2] = 0;
+		Rz[3] = st;	Rz[4] = ct;	Rz[5] = 0;
+		Rz[6] = 0;	Rz[7] = 0;	Rz[8] = 1;
+		for (int r = 0; r < 3; r++)
+			for (int c = 0; c < 3; c++)
+				lw->E[r * 3 + c] = R[r * 3] * Rz[c] +
+					R[r * 3 + 1] * Rz[3 + c] + R[r * 3 + 2] * Rz[6 + c];
+		lw->p[0] += R[2] * d;
+		lw->p[1] += R[5] * d;
+		lw->p[2] += R[8] * d;
+
+		/* velocity */
+		if (j == 0)
+			memset(lw->v, 0, sizeof(lw->v));
+		else
+			xform_motion(lw->v, lw, w[j - 1].v);
+		lw->v[ax] += qd[j];
+
+		/* velocity product acceleration, c = v x S qd */
+		double	vJ[6] = {0, 0, 0, 0, 0, 0};
+
+		vJ[ax] = qd[j];
+		cross_motion(lw->c, lw->v, vJ);
+
+		/* bias force */
+		link_inertia(lw->I, l, robot->dhtype);
+		mat6_mult(h, lw->I, lw->v);
+		cross_force(lw->pA, lw->v, h);
+	}
+
+	/*
+	 * backward recursion, articulated inertias
+	 */
+	for (j = n - 1; j >= 0; j--) {
+		Link	*l = &robot->links[j];
+		ABALink	*lw = &w[j];
+		int	ax = AXIS(l);
+		double	t;
+
+		for (int i = 0; i < 6; i++)
+			lw->U[i] = lw->I[i * 6 + ax];
+		lw->D = lw->U[ax] + l->G * l->G * l->Jm;
+
+		/* applied torque less joint friction */
+		t = tau[j];
+		t -= l->G * l->G * l->B * qd[j];
+		t -= fabs(l->G) * (
+			(qd[j] > 0 ? l->Tc[0] : 0.0) +
+			(qd[j] < 0 ? l->Tc[1] : 0.0)
+		);
+		lw->u = t - lw->pA[ax];
+
+		if (j > 0) {
+			double	Ia[36], pa[6], Iac[6];
+
+			for (int r = 0; r < 6; r++)
+				for (int c = 0; c < 6; c++)
+					Ia[r * 6 + c] = lw->I[r * 6 + c] -
+						lw->U[r] * lw->U[c] / lw->D;
+
+			mat6_mult(Iac, Ia, lw->c);
+			for (int i = 0; i < 6; i++)
+				pa[i] = lw->pA[i] + Iac[i] + lw->U[i] * lw->u / lw->D;
+
+			xform_inertia_add(w[j - 1].I, lw, Ia);
+			xform_force_add(w[j - 1].pA, lw, pa);
+		}
+	}
+
+	/*
+	 * forward recursion, accelerations.  Gravity is a fictitious
+	 * acceleration of the base.
+	 */
+	for (j = 0; j < n; j++) {
+		Link	*l = &robot->links[j];
+		ABALink	*lw = &w[j];
+		int	ax = AXIS(l);
+		double	s = 0;
+
+		if (j == 0) {
+			double	a0[6] = {0, 0, 0, grav[0], grav[1], grav[2]};
+
+			xform_motion(lw->a, lw, a0);
+		} else
+			xform_motion(lw->a, lw, w[j - 1].a);
+
+		for (int i = 0; i < 6; i++) {
+			lw->a[i] += lw->c[i];
+			s += lw->U[i] * lw->a[i];
+		}
+
+		qdd[j] = (lw->u - s) / lw->D;
+		lw->a[ax] += qdd[j];
+	}
+}
@@ -18,6 +18,22 @@
  *  from the robot object.
  *
  *  GRAV overrides the gravity vector in the robot object.
+ *
+ *  FRNE_BATCH(ROBOT*, Q, QD, QDD, GRAV, FEXT, TAU)
+ *
+ *  where Q, QD, QDD and TAU are C-contiguous float64 arrays of shape
+ *  (M, N), each row a point of a trajectory.  The torques are written
+ *  into TAU in place, the GIL is released while computing.
+ *
+ *  FDYN_BATCH(ROBOT*, Q, QD, TAU, GRAV, QDD)
+ *
+ *  Forward dynamics by the articulated body algorithm, the joint
+ *  accelerations for each row of Q, QD and TAU are written into QDD.
+ *
+ *  UPDATE(ROBOT*, J, L)
+ *
+ *  Overwrite the parameters of link J of the robot in place, L is a
+ *  float64 array of the 24 link parameters in the order used by INIT.
  * 
  *  An external force/moment acting on the end of the manipulator may 
  *  also be specified by a 6-element vector FEXT [Fx Fy Fz Mx My Mz].
@@ -26,13 +42,18 @@
  */
 
 #include <math.h>
+#include <string.h>
 #include <Python.h>
 #include "frne.h"
 
 // forward defines
 static PyObject *init(PyObject *self, PyObject *args);
 static PyObject *frne(PyObject *self, PyObject *args);
+static PyObject *frne_batch(PyObject *self, PyObject *args);
+static PyObject *fdyn_batch(PyObject *self, PyObject *args);
+static PyObject *update(PyObject *self, PyObject *args);
 static PyObject *delete(PyObject *self, PyObject *args);
+static void set_link(Link *l, const double *L);
 static void rot_mat (Link *l, double th, double d, DHType type);
 
 
@@ -52,6 +73,24 @@ static PyMethodDef frneMethods[] = {
         METH_VARARGS,
         "Fast rne"
     },
+    {
+        "frne_batch",
+        (PyCFunction)frne_batch,
+        METH_VARARGS,
+        "Fast rne over a trajectory, written in place"
+    },
+    {
+        "fdyn_batch",
+        (PyCFunction)fdyn_batch,
+        METH_VARARGS,
+        "Forward dynamics over a trajectory, written in place"
+    },
+    {
+        "update",
+        (PyCFunction)update,
+        METH_VARARGS,
+        "Update the parameters of one link in place"
+    },
     {
         "delete",
         (PyCFunction)delete,
@@ -199,6 +238,252 @@ static PyObject *frne(PyObject *self, PyObject *args) {
 }
 
 
+/**
+ * Get a C-contiguous float64 buffer of exactly len doubles.
+ *
+ * @param obj Object exporting the buffer protocol
+ * @param view Buffer view to fill, released by the caller on success
+ * @param flags Extra buffer request flags, eg. PyBUF_WRITABLE
+ * @param len Required number of doubles
+ * @param name Argument name for error messages
+ * @return 0 on success, -1 with an exception set on failure
+ */
+static int
+get_buffer(PyObject *obj, Py_buffer *view, int flags, Py_ssize_t len,
+    const char *name)
+{
+    if (PyObject_GetBuffer(obj, view, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT | flags) < 0) {
+        return -1;
+    }
+
+    if (view->itemsize != sizeof(double) || view->format == NULL ||
+        !(view->format[0] == 'd' ||
+            (view->format[0] == '<' && view->format[1] == 'd') ||
+            (view->format[0] == '=' && view->format[1] == 'd'))) {
+        PyErr_Format(PyExc_TypeError, "%s must be a float64 array", name);
+        PyBuffer_Release(view);
+        return -1;
+    }
+
+    if (view->len != len * (Py_ssize_t)sizeof(double)) {
+        PyErr_Format(PyExc_ValueError, "%s has the wrong number of elements", name);
+        PyBuffer_Release(view);
+        return -1;
+    }
+
+    return 0;
+}
+
+
+static PyObject *frne_batch(PyObject *self, PyObject *args) {
+
+    Robot *robot, local;
+    Link *links;
+    Vect gravity;
+    PyObject *rO, *qO, *qdO, *qddO, *gravO, *fextO, *tauO;
+    Py_buffer qB, qdB, qddB, gravB, fextB, tauB;
+    Py_ssize_t M, n;
+
+    if (!PyArg_ParseTuple(args, "OOOOOOO",
+            &rO, &qO, &qdO, &qddO, &gravO, &fextO, &tauO)) {
+        return NULL;
+    }
+
+    if (!(robot = (Robot*) PyCapsule_GetPointer(rO, "Robot"))) {
+        return NULL;
+    }
+
+    n = robot->njoints;
+
+    // The number of trajectory points is taken from q
+    if (PyObject_GetBuffer(qO, &qB, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0) {
+        return NULL;
+    }
+    M = qB.len / (Py_ssize_t)sizeof(double) / (n > 0 ? n : 1);
+    PyBuffer_Release(&qB);
+
+    if (get_buffer(qO, &qB, 0, M * n, "q") < 0) {
+        return NULL;
+    }
+    if (get_buffer(qdO, &qdB, 0, M * n, "qd") < 0) {
+        goto fail_q;
+    }
+    if (get_buffer(qddO, &qddB, 0, M * n, "qdd") < 0) {
+        goto fail_qd;
+    }
+    if (get_buffer(gravO, &gravB, 0, 3, "grav") < 0) {
+        goto fail_qdd;
+    }
+    if (get_buffer(fextO, &fextB, 0, 6, "fext") < 0) {
+        goto fail_grav;
+    }
+    if (get_buffer(tauO, &tauB, PyBUF_WRITABLE, M * n, "tau") < 0) {
+        goto fail_fext;
+    }
+
+    // The link structures hold the intermediate results of the recursion,
+    // so work on a private copy and leave the shared robot untouched.  This
+    // allows several threads to use the same robot at once.
+    links = (Link *)PyMem_RawMalloc((n > 0 ? n : 1) * sizeof(Link));
+    if (links == NULL) {
+        PyErr_NoMemory();
+        goto fail_tau;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+
+    double *q = (double *)qB.buf;
+    double *qd = (double *)qdB.buf;
+    double *qdd = (double *)qddB.buf;
+    double *grav = (double *)gravB.buf;
+    double *fext = (double *)fextB.buf;
+    double *tau = (double *)tauB.buf;
+
+    memcpy(links, robot->links, n * sizeof(Link));
+    gravity.x = grav[0];
+    gravity.y = grav[1];
+    gravity.z = grav[2];
+
+    local.njoints = (int)n;
+    local.gravity = &gravity;
+    local.dhtype = robot->dhtype;
+    local.links = links;
+
+    for (Py_ssize_t p = 0; p < M; p++) {
+        double *qp = q + p * n;
+
+        // Update all position dependent variables
+        for (Py_ssize_t j = 0; j < n; j++) {
+            Link *l = &links[j];
+
+            if (l->jointtype == PRISMATIC) {
+                rot_mat(l, l->theta, qp[j] + l->offset, local.dhtype);
+            } else {
+                rot_mat(l, qp[j] + l->offset, l->D, local.dhtype);
+            }
+        }
+
+        newton_euler(&local, tau + p * n, qd + p * n, qdd + p * n, fext, 1);
+    }
+
+    Py_END_ALLOW_THREADS
+
+    PyMem_RawFree(links);
+    PyBuffer_Release(&tauB);
+    PyBuffer_Release(&fextB);
+    PyBuffer_Release(&gravB);
+    PyBuffer_Release(&qddB);
+    PyBuffer_Release(&qdB);
+    PyBuffer_Release(&qB);
+
+    Py_RETURN_NONE;
+
+fail_tau:
+    PyBuffer_Release(&tauB);
+fail_fext:
+    PyBuffer_Release(&fextB);
+fail_grav:
+    PyBuffer_Release(&gravB);
+fail_qdd:
+    PyBuffer_Release(&qddB);
+fail_qd:
+    PyBuffer_Release(&qdB);
+fail_q:
+    PyBuffer_Release(&qB);
+    return NULL;
+}
+
+
+static PyObject *fdyn_batch(PyObject *self, PyObject *args) {
+
+    Robot *robot;
+    double *work;
+    PyObject *rO, *qO, *qdO, *tauO, *gravO, *qddO;
+    Py_buffer qB, qdB, tauB, gravB, qddB;
+    Py_ssize_t M, n;
+
+    if (!PyArg_ParseTuple(args, "OOOOOO",
+            &rO, &qO, &qdO, &tauO, &gravO, &qddO)) {
+        return NULL;
+    }
+
+    if (!(robot = (Robot*) PyCapsule_GetPointer(rO, "Robot"))) {
+        return NULL;
+    }
+
+    n = robot->njoints;
+
+    // The number of trajectory points is taken from q
+    if (PyObject_GetBuffer(qO, &qB, PyBUF_C_CONTIGUOUS | PyBUF_FORMAT) < 0) {
+        return NULL;
+    }
+    M = qB.len / (Py_ssize_t)sizeof(double) / (n > 0 ? n : 1);
+    PyBuffer_Release(&qB);
+
+    if (get_buffer(qO, &qB, 0, M * n, "q") < 0) {
+        return NULL;
+    }
+    if (get_buffer(qdO, &qdB, 0, M * n, "qd") < 0) {
+        goto fail_q;
+    }
+    if (get_buffer(tauO, &tauB, 0, M * n, "tau") < 0) {
+        goto fail_qd;
+    }
+    if (get_buffer(gravO, &gravB, 0, 3, "grav") < 0) {
+        goto fail_tau;
+    }
+    if (get_buffer(qddO, &qddB, PyBUF_WRITABLE, M * n, "qdd") < 0) {
+        goto fail_grav;
+    }
+
+    // The robot object is only read, all intermediate results are held
+    // in a work area private to this call
+    work = (double *)PyMem_RawMalloc(
+        (n > 0 ? aba_work_size((int)n) : 1) * sizeof(double));
+    if (work == NULL) {
+        PyErr_NoMemory();
+        goto fail_qdd;
+    }
+
+    Py_BEGIN_ALLOW_THREADS
+
+    double *q = (double *)qB.buf;
+    double *qd = (double *)qdB.buf;
+    double *tau = (double *)tauB.buf;
+    double *grav = (double *)gravB.buf;
+    double *qdd = (double *)qddB.buf;
+
+    for (Py_ssize_t p = 0; p < M; p++) {
+        articulated_body(
+            robot, qdd + p * n, q + p * n, qd + p * n, tau + p * n,
+            grav, work);
+    }
+
+    Py_END_ALLOW_THREADS
+
+    PyMem_RawFree(work);
+    PyBuffer_Release(&qddB);
+    PyBuffer_Release(&gravB);
+    PyBuffer_Release(&tauB);
+    PyBuffer_Release(&qdB);
+    PyBuffer_Release(&qB);
+
+    Py_RETURN_NONE;
+
+fail_qdd:
+    PyBuffer_Release(&qddB);
+fail_grav:
+    PyBuffer_Release(&gravB);
+fail_tau:
+    PyBuffer_Release(&tauB);
+fail_qd:
+    PyBuffer_Release(&qdB);
+fail_q:
+    PyBuffer_Release(&qB);
+    return NULL;
+}
+
+
 static PyObject *init(PyObject *self, PyObject *args) {
 
     Robot *robot;
@@ -268,6 +553,69 @@ static PyObject *init(PyObject *self, PyObject *args) {
 }
 
 
+static PyObject *update(PyObject *self, PyObject *args) {
+
+    Robot *robot;
+    PyObject *rO, *LO;
+    Py_buffer LB;
+    int j;
+
+    if (!PyArg_ParseTuple(args, "OiO", &rO, &j, &LO)) {
+        return NULL;
+    }
+
+    if (!(robot = (Robot*) PyCapsule_GetPointer(rO, "Robot"))) {
+        return NULL;
+    }
+
+    if (j < 0 || j >= robot->njoints) {
+        PyErr_SetString(PyExc_IndexError, "link index out of range");
+        return NULL;
+    }
+
+    if (get_buffer(LO, &LB, 0, 24, "L") < 0) {
+        return NULL;
+    }
+
+    set_link(&robot->links[j], (const double *)LB.buf);
+
+    PyBuffer_Release(&LB);
+    Py_RETURN_NONE;
+}
+
+
+/**
+ * Set the parameters of a link.
+ *
+ * @param l Link object, its vectors must already be allocated
+ * @param L The 24 link parameters in the order used by init
+ */
+static void
+set_link(Link *l, const double *L)
+{
+    l->alpha = L[0];
+    l->A = L[1];
+    l->theta = L[2];
+    l->D = L[3];
+    l->jointtype = (Sigma)L[4];
+    l->offset = L[5];
+    l->m = L[6];
+    l->rbar->x = L[7];
+    l->rbar->y = L[8];
+    l->rbar->z = L[9];
+
+    for (int k = 0; k < 9; k++) {
+        l->I[k] = L[10 + k];
+    }
+
+    l->Jm = L[19];
+    l->G = L[20];
+    l->B = L[21];
+    l->Tc[0] = L[22];
+    l->Tc[1] = L[23];
+}
+
+
 /**
  * Return the link rotation matrix and translation vector.
  *
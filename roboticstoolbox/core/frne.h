@@ -93,4 +93,16 @@ void newton_euler (
 	double	*fext,		/*!< external force on manipulator tip */
 	int	stride		/*!< indexing stride for qd, qdd */
 );
+
+int aba_work_size(int njoints);
+
+void articulated_body (
+	Robot	*robot,		/*!< robot object  */
+	double	*qdd,		/*!< returned joint accelerations */
+	double	*q,		/*!< joint coordinates */
+	double	*qd,		/*!< joint velocities */
+	double	*tau,		/*!< applied joint torques */
+	double	*grav,		/*!< gravity vector */
+	double	*work		/*!< work area */
+);
 #endif
\ No newline at end of file
@@ -0,0 +1,723 @@
+"""
+Compiled kinematic chain for DHRobot.
+
+A ``DHChain`` is a flat table of the Denavit-Hartenberg parameters of a robot
+in which every term that does not depend on the joint coordinates is
+evaluated once, when the chain is compiled.  Forward kinematics, Jacobians
+and the joint-space inertia matrix are then evaluated for a stack of joint
+configurations, shape (m,n), with vectorised array operations and no per-link
+``SE3`` objects.
+
+The table is a snapshot of the link parameters, ``DHRobot`` discards it
+whenever a link parameter changes, see ``DHRobot.dynchanged``.
+"""
+import threading
+import numpy as np
+
+
+class DHChain:
+    """
+    Compiled kinematic chain of a DHRobot
+
+    :param robot: The robot to compile
+    :type robot: DHRobot
+
+    :notes:
+        - Base and tool transforms are not part of the chain, they are passed
+          to each method so that changing them does not require a recompile.
+        - Symbolic models cannot be compiled.
+        - The end-effector pose and Jacobian methods evaluate ``q`` in blocks
+          of ``chunk`` rows so that the intermediate link transforms, which
+          are (chunk,n,4,4), stay small for very large ``m``.
+        - Intermediate results are computed in workspace arrays which are
+          kept between calls, one set per thread, and results are written to
+          ``out`` when it is given. A loop which passes the same ``out``
+          and the same number of configurations reuses all of its arrays.
+    """
+
+    #: number of configurations evaluated at once
+    chunk = 4096
+
+    def __init__(self, robot):
+
+        L = robot.links
+
+        self.n = robot.n
+        self.mdh = robot.mdh
+
+        alpha = np.array([link.alpha for link in L], dtype=np.float64)
+        theta = np.array([link.theta for link in L], dtype=np.float64)
+
+        self.a = np.array([link.a for link in L], dtype=np.float64)
+        self.d = np.array([link.d for link in L], dtype=np.float64)
+        self.offset = np.array([link.offset for link in L], dtype=np.float64)
+        self.prismatic = np.array([link.sigma for link in L], dtype=bool)
+        self.sign = np.array(
+            [-1.0 if link.flip else 1.0 for link in L], dtype=np.float64)
+
+        self.sa = np.sin(alpha)
+        self.ca = np.cos(alpha)
+        self._nsa = -self.sa
+        self._nca = -self.ca
+
+        # for prismatic joints the joint angle is constant
+        self.st = np.sin(theta)
+        self.ct = np.cos(theta)
+
+        # the elements of the link transforms which do not depend on q
+        A0 = np.zeros((self.n, 4, 4))
+        if self.mdh == 0:
+            A0[:, 2, 1] = self.sa
+            A0[:, 2, 2] = self.ca
+        else:
+            A0[:, 0, 3] = self.a
+            A0[:, 1, 2] = -self.sa
+            A0[:, 2, 2] = self.ca
+        A0[:, 3, 3] = 1
+        self._A0 = A0
+
+        # inertial parameters, None if any of them are symbolic
+        try:
+            self._m = np.array([link.m for link in L], dtype=np.float64)
+            self._r = np.array(
+                [np.reshape(link.r, 3) for link in L], dtype=np.float64)
+            self._I = np.array(
+                [np.reshape(link.I, (3, 3)) for link in L], dtype=np.float64)
+            self._Jm = np.array(
+                [link.G ** 2 * link.Jm for link in L], dtype=np.float64)
+        except (TypeError, ValueError):
+            self._m = None
+
+        self._local = threading.local()
+
+    def _work(self, m):
+        # Workspace arrays for m configurations, private to the calling
+        # thread. Only a few sizes are kept, typically the chunk size and
+        # the size of the final block.
+        try:
+            cache = self._local.work
+        except AttributeError:
+            cache = self._local.work = {}
+
+        try:
+            return cache[m]
+        except KeyError:
+            if len(cache) >= 4:
+                cache.clear()
+
+            n = self.n
+            w = {
+                'q': np.empty((m, n)),
+                'st': np.empty((m, n)),
+                'ct': np.empty((m, n)),
+                'd': np.empty((m, n)),
+                'A': np.empty((m, n, 4, 4)),
+                'T': np.empty((m, 4, 4)),
+                'T2': np.empty((m, 4, 4)),
+                'R': np.empty((m, 3, 3)),
+                'J': np.empty((m, 6, n)),
+                'v': np.empty((m, 3))
+            }
+            cache[m] = w
+            return w
+
+    def A(self, q, out=None):
+        """
+        Link transforms
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param out: Array to write the result to
+        :type out: float ndarray(m,n,4,4), optional
+        :return: Link transform for every configuration and link
+        :rtype: float ndarray(m,n,4,4)
+
+        The joint flip and offset are applied to ``q``.
+        """
+
+        w = self._work(q.shape[0])
+        if out is None:
+            out = np.empty(q.shape + (4, 4))
+
+        return self._A(q, w, out)
+
+    def _A(self, q, w, A):
+        qj = w['q']
+        st = w['st']
+        ct = w['ct']
+        d = w['d']
+
+        np.multiply(self.sign, q, out=qj)
+        np.add(qj, self.offset, out=qj)
+
+        np.sin(qj, out=st)
+        np.cos(qj, out=ct)
+        np.copyto(st, self.st, where=self.prismatic)
+        np.copyto(ct, self.ct, where=self.prismatic)
+        np.copyto(d, self.d)
+        np.copyto(d, qj, where=self.prismatic)
+
+        A[...] = self._A0
+
+        if self.mdh == 0:
+            # standard DH
+            A[..., 0, 0] = ct
+            np.multiply(st, self._nca, out=A[..., 0, 1])
+            np.multiply(st, self.sa, out=A[..., 0, 2])
+            np.multiply(ct, self.a, out=A[..., 0, 3])
+            A[..., 1, 0] = st
+            np.multiply(ct, self.ca, out=A[..., 1, 1])
+            np.multiply(ct, self._nsa, out=A[..., 1, 2])
+            np.multiply(st, self.a, out=A[..., 1, 3])
+            A[..., 2, 3] = d
+        else:
+            # modified DH
+            A[..., 0, 0] = ct
+            np.negative(st, out=A[..., 0, 1])
+            np.multiply(st, self.ca, out=A[..., 1, 0])
+            np.multiply(ct, self.ca, out=A[..., 1, 1])
+            np.multiply(d, self._nsa, out=A[..., 1, 3])
+            np.multiply(st, self.sa, out=A[..., 2, 0])
+            np.multiply(ct, self.sa, out=A[..., 2, 1])
+            np.multiply(d, self.ca, out=A[..., 2, 3])
+
+        return A
+
+    def fkine(self, q, base=None, tool=None, out=None):
+        """
+        Forward kinematics
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param base: Base transform
+        :type base: SE3, optional
+        :param tool: Tool transform
+        :type tool: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(m,4,4), optional
+        :return: End-effector pose for every configuration
+        :rtype: float ndarray(m,4,4)
+        """
+
+        if out is None:
+            out = np.empty((q.shape[0], 4, 4))
+
+        return self._blocks(self._fkine, q, out, base, tool)
+
+    def _fkine(self, q, out, base, tool):
+        w = self._work(q.shape[0])
+        A = self._A(q, w, w['A'])
+
+        T = w['T']
+        T2 = w['T2']
+
+        T[...] = A[:, 0, :, :]
+        for j in range(1, self.n):
+            np.matmul(T, A[:, j, :, :], out=T2)
+            T, T2 = T2, T
+
+        if base is not None:
+            np.matmul(base.A, T, out=T2)
+            T, T2 = T2, T
+        if tool is not None:
+            np.matmul(T, tool.A, out=T2)
+            T, T2 = T2, T
+
+        out[...] = T
+        return out
+
+    def fkine_all(self, q, base=None, out=None):
+        """
+        Forward kinematics for every link frame
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param base: Base transform
+        :type base: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(m,n,4,4), optional
+        :return: Pose of every link frame for every configuration
+        :rtype: float ndarray(m,n,4,4)
+        """
+
+        w = self._work(q.shape[0])
+        A = self._A(q, w, w['A'])
+
+        if out is None:
+            out = np.empty(A.shape)
+
+        if base is not None:
+            np.matmul(base.A, A[:, 0, :, :], out=out[:, 0, :, :])
+        else:
+            out[:, 0, :, :] = A[:, 0, :, :]
+
+        for j in range(1, self.n):
+            np.matmul(
+                out[:, j - 1, :, :], A[:, j, :, :], out=out[:, j, :, :])
+
+        return out
+
+    def jacobe(self, q, tool=None, out=None):
+        """
+        Manipulator Jacobian in the end-effector frame
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param tool: Tool transform
+        :type tool: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(m,6,n), optional
+        :return: Manipulator Jacobian for every configuration
+        :rtype: float ndarray(m,6,n)
+        """
+
+        if out is None:
+            out = np.empty((q.shape[0], 6, self.n))
+
+        return self._blocks(self._jacobe, q, out, tool)
+
+    def _jacobe(self, q, out, tool):
+        self._jacob(q, tool, out)
+        return out
+
+    def fkine_jacobe(self, q, base=None, tool=None):
+        """
+        Forward kinematics and manipulator Jacobian in the end-effector frame
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param base: Base transform
+        :type base: SE3, optional
+        :param tool: Tool transform
+        :type tool: SE3, optional
+        :return: End-effector pose (m,4,4) and Jacobian (m,6,n) for every
+            configuration
+        :rtype: tuple
+
+        Both come from the single pass over the links of ``jacobe``.
+        """
+
+        T = np.empty((q.shape[0], 4, 4))
+        J = np.empty((q.shape[0], 6, self.n))
+        self._blocks(self._fkine_jacobe, q, T, J, base, tool)
+        return T, J
+
+    def _fkine_jacobe(self, q, T, J, base, tool):
+        U = self._jacob(q, tool, J)
+        if base is not None:
+            np.matmul(base.A, U, out=T)
+        else:
+            T[...] = U
+        return T
+
+    def jacob0(self, q, base=None, tool=None, out=None):
+        """
+        Manipulator Jacobian in the world frame
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param base: Base transform
+        :type base: SE3, optional
+        :param tool: Tool transform
+        :type tool: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(m,6,n), optional
+        :return: Manipulator Jacobian for every configuration
+        :rtype: float ndarray(m,6,n)
+        """
+
+        if out is None:
+            out = np.empty((q.shape[0], 6, self.n))
+
+        return self._blocks(self._jacob0, q, out, base, tool)
+
+    def _jacob0(self, q, out, base, tool):
+        w = self._work(q.shape[0])
+        Je = w['J']
+        U = self._jacob(q, tool, Je)
+
+        R = self._R(U, base, w['R'])
+        np.matmul(R, Je[:, :3, :], out=out[:, :3, :])
+        np.matmul(R, Je[:, 3:, :], out=out[:, 3:, :])
+        return out
+
+    def jacob0v(self, q, base=None, tool=None, out=None):
+        """
+        Velocity transform from the end-effector frame to the world frame
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param base: Base transform
+        :type base: SE3, optional
+        :param tool: Tool transform
+        :type tool: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(m,6,6), optional
+        :return: Velocity transform for every configuration
+        :rtype: float ndarray(m,6,6)
+        """
+
+        if out is None:
+            out = np.empty((q.shape[0], 6, 6))
+
+        return self._blocks(self._jacobv, q, out, base, tool, False)
+
+    def jacobev(self, q, base=None, tool=None, out=None):
+        """
+        Velocity transform from the world frame to the end-effector frame
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param base: Base transform
+        :type base: SE3, optional
+        :param tool: Tool transform
+        :type tool: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(m,6,6), optional
+        :return: Velocity transform for every configuration
+        :rtype: float ndarray(m,6,6)
+        """
+
+        if out is None:
+            out = np.empty((q.shape[0], 6, 6))
+
+        return self._blocks(self._jacobv, q, out, base, tool, True)
+
+    def _jacobv(self, q, out, base, tool, inverse):
+        w = self._work(q.shape[0])
+        T = self._fkine(q, w['T2'], None, tool)
+        R = self._R(T, base, w['R'])
+        if inverse:
+            R = R.transpose(0, 2, 1)
+
+        out[...] = 0
+        out[:, :3, :3] = R
+        out[:, 3:, 3:] = R
+        return out
+
+    def inertia(self, q, out=None):
+        """
+        Joint-space inertia matrix
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param out: Array to write the result to
+        :type out: float ndarray(m,n,n), optional
+        :return: Inertia matrix for every configuration
+        :rtype: float ndarray(m,n,n)
+        :raises TypeError: if the inertial parameters are symbolic
+
+        The matrix is computed by the Composite Rigid Body Algorithm. The
+        spatial inertia of every link is expressed in the base frame, about
+        its origin, so the composite inertia of links j..n is a cumulative
+        sum and element (i,j), i <= j, is ``S_i' Ic_j S_j`` where ``S`` is
+        the joint motion axis.  The diagonal includes the motor inertia
+        reflected through the gear ratio.
+
+        :references:
+            - Rigid Body Dynamics Algorithms, R. Featherstone,
+              Springer, 2008, chap 6.
+        """
+
+        if self._m is None:
+            raise TypeError('inertial parameters must be numeric')
+
+        if out is None:
+            out = np.empty((q.shape[0], self.n, self.n))
+
+        return self._blocks(self._inertia, q, out)
+
+    def _inertia(self, q, out):
+        n = self.n
+
+        S, Il = self._spatial(q)
+
+        # composite inertia of links j..n
+        Ic = np.cumsum(Il[:, ::-1], axis=1)[:, ::-1]
+
+        F = np.matmul(Ic, S[..., np.newaxis])[..., 0]
+        M = np.matmul(S, F.transpose(0, 2, 1))
+
+        iu = np.triu_indices(n, 1)
+        M[:, iu[1], iu[0]] = M[:, iu[0], iu[1]]
+        M[:, range(n), range(n)] += self._Jm
+
+        out[...] = M
+        return out
+
+    def coriolis(self, q, qd, out=None):
+        """
+        Coriolis and centripetal matrix
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param qd: Joint velocities, one configuration per row
+        :type qd: float ndarray(m,n)
+        :param out: Array to write the result to
+        :type out: float ndarray(m,n,n), optional
+        :return: Coriolis matrix for every configuration
+        :rtype: float ndarray(m,n,n)
+        :raises TypeError: if the inertial parameters are symbolic
+
+        The matrix is the one defined by the Christoffel symbols of the
+        inertia matrix, so ``Mdot - 2C`` is skew symmetric. It is computed
+        in a single sweep from the link spatial velocities as
+        ``C = sum_l J_l' (I_l Jdot_l + B_l J_l)``, with composite sums over
+        the links as for the inertia matrix.
+
+        :references:
+            - Numerical methods to compute the Coriolis matrix and Christoffel
+              symbols for rigid-body systems, S. Echeandia and P. M. Wensing,
+              J. Computational and Nonlinear Dynamics, vol. 16, no. 9, 2021.
+        """
+
+        if self._m is None:
+            raise TypeError('inertial parameters must be numeric')
+
+        if out is None:
+            out = np.empty((q.shape[0], self.n, self.n))
+
+        return self._blocks(self._coriolis, q, out, qd)
+
+    def _coriolis(self, q, out, qd):
+        n = self.n
+        m = q.shape[0]
+
+        S, Il = self._spatial(q)
+
+        # spatial velocity of every link, the joint axes move with the
+        # previous link
+        v = np.cumsum(S * qd[..., np.newaxis], axis=1)
+        vp = np.zeros((m, n, 6))
+        vp[:, 1:] = v[:, :-1]
+        Sd = np.matmul(_crm(vp), S[..., np.newaxis])[..., 0]
+
+        # B_l = (crf(v) I - I crm(v) + crfbar(I v)) / 2
+        X = _crm(v)
+        h = np.matmul(Il, v[..., np.newaxis])[..., 0]
+        Bl = -X.transpose(0, 1, 3, 2) @ Il - Il @ X
+        Bl[..., :3, :3] -= _skew(h[..., :3])
+        Bl[..., :3, 3:] -= _skew(h[..., 3:])
+        Bl[..., 3:, :3] -= _skew(h[..., 3:])
+        Bl *= 0.5
+
+        # composite quantities for links j..n
+        Ic = np.cumsum(Il[:, ::-1], axis=1)[:, ::-1]
+        Bc = np.cumsum(Bl[:, ::-1], axis=1)[:, ::-1]
+
+        # element (i,j) is S_i' (Ic_k Sd_j + Bc_k S_j) where k = max(i,j)
+        G = np.matmul(Ic, Sd[..., np.newaxis])[..., 0] + \
+            np.matmul(Bc, S[..., np.newaxis])[..., 0]
+        F = np.matmul(Ic, S[..., np.newaxis])[..., 0]
+        H = np.matmul(Bc.transpose(0, 1, 3, 2), S[..., np.newaxis])[..., 0]
+
+        C = np.matmul(S, G.transpose(0, 2, 1))
+        Cl = np.matmul(F, Sd.transpose(0, 2, 1)) + \
+            np.matmul(H, S.transpose(0, 2, 1))
+
+        il = np.tril_indices(n, -1)
+        C[:, il[0], il[1]] = Cl[:, il[0], il[1]]
+
+        out[...] = C
+        return out
+
+    def gravload(self, q, grav, out=None):
+        """
+        Gravity load
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param grav: Gravity vector in the base frame, one per row
+        :type grav: float ndarray(m,3)
+        :param out: Array to write the result to
+        :type out: float ndarray(m,n), optional
+        :return: Joint forces due to gravity for every configuration
+        :rtype: float ndarray(m,n)
+        :raises TypeError: if the inertial parameters are symbolic
+
+        A gravity-only recursion, the link velocities and accelerations which
+        ``rne`` propagates are zero and are skipped. The weight of every link
+        acts at its centre of mass, the wrench of links j..n about the base
+        origin is a cumulative sum and the load on joint j is its component
+        along the joint motion axis.
+        """
+
+        if self._m is None:
+            raise TypeError('inertial parameters must be numeric')
+
+        if out is None:
+            out = np.empty((q.shape[0], self.n))
+
+        return self._blocks(self._gravload, q, out, grav)
+
+    def _gravload(self, q, out, grav):
+
+        T = self.fkine_all(q)
+        S = self._axes(T)
+
+        # weight of every link and its moment about the base origin
+        c = T[..., :3, 3] + np.einsum('mkij,kj->mki', T[..., :3, :3], self._r)
+        f = self._m[:, np.newaxis] * grav[:, np.newaxis, :]
+        w = np.empty(S.shape)
+        w[..., :3] = np.cross(c, f)
+        w[..., 3:] = f
+
+        # wrench of links j..n
+        w = np.cumsum(w[:, ::-1], axis=1)[:, ::-1]
+
+        np.einsum('mjk,mjk->mj', S, w, out=out)
+        return out
+
+    def _axes(self, T):
+        # joint motion axes (m,n,6) in the base frame from the link frames
+        # (m,n,4,4), the joint flip reverses the axis
+        n = self.n
+        m = T.shape[0]
+        R = T[..., :3, :3]
+        p = T[..., :3, 3]
+
+        # joint axes and a point on each
+        if self.mdh == 0:
+            z = np.empty((m, n, 3))
+            o = np.zeros((m, n, 3))
+            z[:, 0] = (0, 0, 1)
+            z[:, 1:] = R[:, :-1, :, 2]
+            o[:, 1:] = p[:, :-1]
+        else:
+            z = R[..., 2]
+            o = p
+
+        S = np.empty((m, n, 6))
+        S[..., :3] = z
+        S[..., 3:] = np.cross(o, z)
+        S[:, self.prismatic, :3] = 0
+        S[:, self.prismatic, 3:] = z[:, self.prismatic]
+        S *= self.sign[:, np.newaxis]
+        return S
+
+    def _spatial(self, q):
+        """
+        Joint axes and link inertias in the base frame
+
+        :return: The joint motion axes (m,n,6) and the spatial inertia of
+            every link (m,n,6,6), both in the base frame about its origin.
+            Spatial vectors are ordered angular then linear.
+        """
+        n = self.n
+        m = q.shape[0]
+
+        T = self.fkine_all(q)
+        R = T[..., :3, :3]
+        p = T[..., :3, 3]
+
+        S = self._axes(T)
+
+        # spatial inertia of every link
+        c = p + np.einsum('mkij,kj->mki', R, self._r)
+        C = _skew(c)
+        mC = C * self._m[:, np.newaxis, np.newaxis]
+
+        Il = np.empty((m, n, 6, 6))
+        np.matmul(R @ self._I, R.transpose(0, 1, 3, 2), out=Il[..., :3, :3])
+        Il[..., :3, :3] -= mC @ C
+        Il[..., :3, 3:] = mC
+        Il[..., 3:, :3] = mC.transpose(0, 1, 3, 2)
+        Il[..., 3:, 3:] = np.eye(3) * self._m[:, np.newaxis, np.newaxis]
+
+        return S, Il
+
+    def _blocks(self, func, q, out, *args):
+        # evaluate func over q in blocks of rows, writing to out, array
+        # arguments with a row per configuration are split in the same way
+        m = q.shape[0]
+        if m <= self.chunk:
+            return func(q, out, *args)
+
+        for i in range(0, m, self.chunk):
+            block = slice(i, i + self.chunk)
+            func(q[block], out[block], *[
+                a[block] if isinstance(a, np.ndarray) else a for a in args])
+        return out
+
+    def _jacob(self, q, tool, J):
+        """
+        Manipulator Jacobian in the end-effector frame and end-effector pose
+
+        :param J: Array to write the Jacobian to, (m,6,n)
+        :return: The pose (m,4,4) of the end-effector with respect to the
+            base frame, the base transform is not applied. This is a
+            workspace array.
+
+        The link transforms are accumulated backwards from the tool, so the
+        pose falls out of the same pass as the Jacobian. The column of a
+        flipped joint is negated.
+        """
+
+        w = self._work(q.shape[0])
+        A = self._A(q, w, w['A'])
+        v = w['v']
+
+        U = w['T']
+        U2 = w['T2']
+        if tool is not None:
+            U[...] = tool.A
+        else:
+            U[...] = np.eye(4)
+
+        for j in range(self.n - 1, -1, -1):
+            if self.mdh == 0:
+                # standard DH convention
+                np.matmul(A[:, j, :, :], U, out=U2)
+                U, U2 = U2, U
+
+            if not self.prismatic[j]:
+                # revolute axis
+                d = J[:, :3, j]
+                np.multiply(U[:, 1, :3], U[:, 0, 3, np.newaxis], out=d)
+                np.multiply(U[:, 0, :3], U[:, 1, 3, np.newaxis], out=v)
+                np.subtract(d, v, out=d)
+                J[:, 3:, j] = U[:, 2, :3]   # nz oz az
+            else:
+                # prismatic axis
+                J[:, :3, j] = U[:, 2, :3]   # nz oz az
+                J[:, 3:, j] = 0
+
+            if self.mdh != 0:
+                # modified DH convention
+                np.matmul(A[:, j, :, :], U, out=U2)
+                U, U2 = U2, U
+
+        # the joint flip reverses the axis
+        J *= self.sign
+        return U
+
+    @staticmethod
+    def _R(T, base, out):
+        # rotation part of the world-frame pose
+        if base is not None:
+            np.matmul(base.R, T[:, :3, :3], out=out)
+        else:
+            out[...] = T[:, :3, :3]
+        return out
+
+
+def _skew(v):
+    # skew-symmetric matrices (...,3,3) of vectors (...,3)
+    S = np.zeros(v.shape + (3,))
+    S[..., 0, 1] = -v[..., 2]
+    S[..., 0, 2] = v[..., 1]
+    S[..., 1, 0] = v[..., 2]
+    S[..., 1, 2] = -v[..., 0]
+    S[..., 2, 0] = -v[..., 1]
+    S[..., 2, 1] = v[..., 0]
+    return S
+
+
+def _crm(v):
+    # spatial motion cross product matrices (...,6,6) of vectors (...,6)
+    w = _skew(v[..., :3])
+    X = np.zeros(v.shape + (6,))
+    X[..., :3, :3] = w
+    X[..., 3:, 3:] = w
+    X[..., 3:, :3] = _skew(v[..., 3:])
+    return X
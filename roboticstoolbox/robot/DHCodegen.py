@@ -0,0 +1,403 @@
+"""
+Closed-form dynamics code generation for DHRobot.
+
+The joint-space inertia matrix M(q), the Coriolis matrix C(q, qd) and the
+gravity load G(q) of a robot are derived symbolically with SymPy, common
+subexpressions are eliminated and the result is written out as a Python
+module of straight-line NumPy arithmetic which evaluates a stack of joint
+configurations, shape (m,n), at once.
+
+Generated modules are cached on disk, named by a hash of the kinematic and
+inertial parameters of the robot, so the slow symbolic derivation is done
+once per model and later runs simply import the module, see ``load``.  The
+cache directory is ``cachedir``, which defaults to the environment variable
+``RTB_CODEGEN_DIR`` or ``~/.cache/roboticstoolbox/codegen``.  Within a run
+each module file is imported once, and a file found to be missing is not
+looked for again unless it is generated.
+
+The derivation is a Newton-Euler recursion in the link frames. Each link is
+described by a constant transform from its parent followed by the joint
+motion, ``Rx(alpha) Tx(a) Rz(theta) Tz(d)`` for modified DH, and a standard
+DH link is rewritten in the same form with the ``a`` and ``alpha`` of the
+previous link.
+"""
+import os
+import hashlib
+import importlib.util
+import numpy as np
+import sympy
+from sympy.printing.numpy import NumPyPrinter
+
+#: directory in which generated modules are kept
+cachedir = os.environ.get(
+    'RTB_CODEGEN_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'roboticstoolbox',
+                 'codegen'))
+
+# bump when the generated code changes so that stale modules are not used
+_VERSION = 1
+
+# modules already imported, and module files known not to exist, by path
+_modules = {}
+_missing = set()
+
+
+def key(robot):
+    """
+    Hash of the parameters of a robot
+
+    :param robot: The robot
+    :type robot: DHRobot
+    :return: A hexadecimal digest of the kinematic and inertial parameters
+    :rtype: str
+
+    Two robots with the same key have the same generated dynamics code.
+    """
+    h = hashlib.sha1()
+    h.update('{} {} {}'.format(_VERSION, robot.n, robot.mdh).encode())
+    for L in robot.links:
+        params = [
+            L.alpha, L.a, L.theta, L.d, L.sigma, L.offset, L.flip, L.m,
+            np.reshape(L.r, 3), np.reshape(L.I, (3, 3)), L.Jm, L.G]
+        h.update(repr([_repr(p) for p in params]).encode())
+    return h.hexdigest()[:16]
+
+
+def _repr(p):
+    # a stable text form of a numeric or symbolic parameter
+    if isinstance(p, np.ndarray):
+        return [_repr(x) for x in p.ravel()]
+    try:
+        return repr(float(p))
+    except TypeError:
+        return str(p)
+
+
+def filename(robot, directory=None):
+    """
+    Name of the generated module for a robot
+
+    :param robot: The robot
+    :type robot: DHRobot
+    :param directory: The cache directory, defaults to ``cachedir``
+    :type directory: str, optional
+    :return: Path of the module file
+    :rtype: str
+    """
+    if directory is None:
+        directory = cachedir
+    name = ''.join(c if c.isalnum() else '_' for c in str(robot.name))
+    return os.path.join(directory, 'dyn_{}_{}.py'.format(name, key(robot)))
+
+
+def load(robot, directory=None, generate=True):
+    """
+    Load the generated dynamics module of a robot
+
+    :param robot: The robot
+    :type robot: DHRobot
+    :param directory: The cache directory, defaults to ``cachedir``
+    :type directory: str, optional
+    :param generate: Generate the module if it is not in the cache
+    :type generate: bool
+    :return: The module, or None if it is not cached and ``generate`` is
+        False
+    :rtype: module
+
+    The module has the functions ``inertia(q, out)``,
+    ``coriolis(q, out, qd)`` and ``gravload(q, out, grav)`` where ``q`` and
+    ``qd`` are (m,n), ``grav`` is (m,3) in the base frame and ``out`` is the
+    result array (m,n,n) or (m,n), the argument order of the block functions
+    of ``DHChain``.
+
+    :notes:
+        - A module generated by another process after this one found it
+          missing is only loaded when ``generate`` is True.
+    """
+    path = filename(robot, directory)
+
+    module = _modules.get(path)
+    if module is not None:
+        return module
+
+    if not generate and path in _missing:
+        return None
+
+    if not os.path.exists(path):
+        if not generate:
+            _missing.add(path)
+            return None
+        src = source(robot)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # write then rename, so a concurrent reader never sees half a file
+        tmp = '{}.{}.tmp'.format(path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(src)
+        os.replace(tmp, path)
+
+    spec = importlib.util.spec_from_file_location(
+        os.path.splitext(os.path.basename(path))[0], path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    _modules[path] = module
+    _missing.discard(path)
+    return module
+
+
+def derive(robot):
+    """
+    Closed-form dynamics of a robot
+
+    :param robot: The robot
+    :type robot: DHRobot
+    :return: The symbols q, qd and g, and the inertia matrix, Coriolis
+        matrix and gravity load as SymPy matrices
+    :rtype: tuple
+    :raises ValueError: if any parameter is a free symbol
+
+    The inertia matrix includes the motor inertia reflected through the gear
+    ratio, as ``DHRobot.inertia``, joint friction is not included. The
+    Coriolis matrix is the one defined by the Christoffel symbols of the
+    inertia matrix, as ``DHRobot.coriolis``. The gravity load is a function
+    of the gravity vector ``g`` in the base frame.
+    """
+    n = robot.n
+    q = sympy.symbols('q0:{}'.format(n))
+    qd = sympy.symbols('qd0:{}'.format(n))
+    g = sympy.symbols('g0:3')
+
+    links = _links(robot, q)
+
+    zero = sympy.zeros(3, 1)
+
+    # M column by column, a unit acceleration of each joint without gravity
+    # or velocity
+    M = sympy.zeros(n, n)
+    for j in range(n):
+        qdd = [sympy.S.One if k == j else sympy.S.Zero for k in range(n)]
+        tau = _rne(links, [0] * n, qdd, zero)
+        for i in range(j, n):
+            M[i, j] = M[j, i] = tau[i]
+        M[j, j] += _const(robot.links[j].G ** 2 * robot.links[j].Jm)
+
+    G = sympy.Matrix(_rne(links, [0] * n, [0] * n, sympy.Matrix(g)))
+
+    # C_kj = sum_i G_kji qd_i, G_kji = (dM_kj/dq_i + dM_ki/dq_j - dM_ij/dq_k)/2
+    dM = [M.diff(qi) for qi in q]
+    C = sympy.zeros(n, n)
+    for k in range(n):
+        for j in range(n):
+            C[k, j] = sum(
+                (dM[i][k, j] + dM[j][k, i] - dM[k][i, j]) * qd[i]
+                for i in range(n)) / 2
+
+    free = (M.free_symbols | C.free_symbols | G.free_symbols) \
+        - set(q) - set(qd) - set(g)
+    if free:
+        raise ValueError('parameters must be numeric, found {}'.format(
+            sorted(map(str, free))))
+
+    return q, qd, g, M, C, G
+
+
+def _const(x):
+    # a parameter as a SymPy number, values within rounding error of an
+    # integer are made exact so that cos(pi/2) terms vanish
+    try:
+        f = float(x)
+    except TypeError:
+        return sympy.sympify(x)
+
+    if abs(f - round(f)) < 1e-12:
+        return sympy.Integer(round(f))
+    return sympy.Float(f)
+
+
+def _links(robot, q):
+    # per link: constant rotation and translation from the parent frame,
+    # the joint variables, joint axis sign and the inertial parameters in
+    # the frame of the joint
+    L = robot.links
+    links = []
+
+    for j, link in enumerate(L):
+
+        if robot.mdh:
+            a, alpha = link.a, link.alpha
+        elif j > 0:
+            a, alpha = L[j - 1].a, L[j - 1].alpha
+        else:
+            a, alpha = 0, 0
+
+        Rk = _rotx(alpha)
+        pk = sympy.Matrix([_const(a), 0, 0])
+
+        s = -1 if link.flip else 1
+        if link.sigma == 0:
+            theta = s * q[j] + _const(link.offset)
+            d = _const(link.d)
+        else:
+            theta = _const(link.theta)
+            d = s * q[j] + _const(link.offset)
+
+        r = sympy.Matrix([_const(x) for x in np.reshape(link.r, 3)])
+        Ic = sympy.Matrix(3, 3, [
+            _const(x) for x in np.reshape(link.I, 9)])
+
+        if not robot.mdh:
+            # the link frame of standard DH is Tx(a) Rx(alpha) beyond the
+            # frame of the joint
+            Ra = _rotx(link.alpha)
+            r = sympy.Matrix([_const(link.a), 0, 0]) + Ra * r
+            Ic = Ra * Ic * Ra.T
+
+        ct = sympy.cos(theta)
+        st = sympy.sin(theta)
+        Rz = sympy.Matrix([[ct, -st, 0], [st, ct, 0], [0, 0, 1]])
+
+        links.append({
+            'R': Rk * Rz,
+            'p': pk + Rk * sympy.Matrix([0, 0, d]),
+            'z': sympy.Matrix([0, 0, s]),
+            'prismatic': link.sigma != 0,
+            'm': _const(link.m),
+            'r': r,
+            'I': Ic})
+
+    return links
+
+
+def _rotx(alpha):
+    try:
+        ca = _const(np.cos(float(alpha)))
+        sa = _const(np.sin(float(alpha)))
+    except TypeError:
+        ca = sympy.cos(alpha)
+        sa = sympy.sin(alpha)
+    return sympy.Matrix([[1, 0, 0], [0, ca, -sa], [0, sa, ca]])
+
+
+def _rne(links, qd, qdd, grav):
+    # joint forces by the Newton-Euler recursion in the link frames, gravity
+    # is a fictitious acceleration of the base
+    n = len(links)
+
+    w = sympy.zeros(3, 1)
+    wd = sympy.zeros(3, 1)
+    vd = grav
+
+    F = []
+    N = []
+    for j, L in enumerate(links):
+        Rt = L['R'].T
+        z = L['z']
+        p = L['p']
+
+        vd = Rt * (vd + wd.cross(p) + w.cross(w.cross(p)))
+        w = Rt * w
+        wd = Rt * wd
+
+        if L['prismatic']:
+            vd = vd + 2 * w.cross(z * qd[j]) + z * qdd[j]
+        else:
+            wd = wd + w.cross(z * qd[j]) + z * qdd[j]
+            w = w + z * qd[j]
+
+        r = L['r']
+        vc = vd + wd.cross(r) + w.cross(w.cross(r))
+        F.append(L['m'] * vc)
+        N.append(L['I'] * wd + w.cross(L['I'] * w) + r.cross(L['m'] * vc))
+
+    tau = [None] * n
+    f = sympy.zeros(3, 1)
+    nn = sympy.zeros(3, 1)
+    for j in range(n - 1, -1, -1):
+        if j < n - 1:
+            R = links[j + 1]['R']
+            p = links[j + 1]['p']
+            Rf = R * f
+            nn = R * nn + p.cross(Rf)
+            f = Rf
+        f = f + F[j]
+        nn = nn + N[j]
+
+        z = links[j]['z']
+        tau[j] = (f if links[j]['prismatic'] else nn).dot(z)
+
+    return tau
+
+
+def source(robot):
+    """
+    Generate the dynamics module of a robot
+
+    :param robot: The robot
+    :type robot: DHRobot
+    :return: Python source of the module
+    :rtype: str
+
+    The expressions of ``derive`` are reduced by common-subexpression
+    elimination, separately for each function, and printed as NumPy
+    arithmetic on columns of the joint coordinate arrays.
+    """
+    q, qd, g, M, C, G = derive(robot)
+    n = robot.n
+
+    lines = [
+        '"""',
+        'Closed-form dynamics of {} generated by'.format(robot.name),
+        'roboticstoolbox.robot.DHCodegen, do not edit.',
+        '"""',
+        'import numpy',
+        '',
+        'n = {}'.format(n),
+        'key = {!r}'.format(key(robot)),
+        '',
+    ]
+
+    iu = [(i, j) for i in range(n) for j in range(i, n)]
+    lines += _function(
+        'inertia(q, out)', [('q', q)],
+        [('out[:, {}, {}]'.format(i, j), M[i, j]) for i, j in iu] +
+        ['out[:, {}, {}] = out[:, {}, {}]'.format(j, i, i, j)
+         for i, j in iu if i != j])
+    lines += _function(
+        'coriolis(q, out, qd)', [('q', q), ('qd', qd)],
+        [('out[:, {}, {}]'.format(i, j), C[i, j])
+         for i in range(n) for j in range(n)])
+    lines += _function(
+        'gravload(q, out, grav)', [('q', q), ('grav', g)],
+        [('out[:, {}]'.format(i), G[i]) for i in range(n)])
+
+    return '\n'.join(lines)
+
+
+def _function(signature, args, outputs):
+    # source lines of a generated function, outputs are (target, expression)
+    # pairs or literal statements
+    printer = NumPyPrinter({'fully_qualified_modules': True})
+
+    exprs = [o for o in outputs if not isinstance(o, str)]
+    subs, reduced = sympy.cse(
+        [e for _, e in exprs], symbols=sympy.numbered_symbols('x'))
+
+    lines = ['', 'def {}:'.format(signature)]
+
+    used = set().union(*[e.free_symbols for _, e in subs]) \
+        | set().union(*[e.free_symbols for e in reduced])
+    for name, symbols in args:
+        for k, s in enumerate(symbols):
+            if s in used:
+                lines.append('    {} = {}[:, {}]'.format(s, name, k))
+
+    for x, e in subs:
+        lines.append('    {} = {}'.format(x, printer.doprint(e)))
+
+    for (target, _), e in zip(exprs, reduced):
+        lines.append('    {} = {}'.format(target, printer.doprint(e)))
+
+    lines += ['    ' + o for o in outputs if isinstance(o, str)]
+    lines += ['    return out', '']
+    return lines
@@ -182,7 +182,7 @@ class DHLink(Link):
         @wraps(func)
         def wrapper_listen_dyn(*args):
             if args[0]._robot is not None:
-                args[0]._robot.dynchanged()
+                args[0]._robot.dynchanged(args[0])
             return func(*args)
         return wrapper_listen_dyn
 
@@ -287,6 +287,7 @@ class DHLink(Link):
         self._mdh = int(mdh_new)
 
     @offset.setter
+    @_listen_dyn
     def offset(self, offset_new):
         self._offset = offset_new
 
@@ -295,6 +296,7 @@ class DHLink(Link):
         self._qlim = getvector(qlim_new, 2)
 
     @flip.setter
+    @_listen_dyn
     def flip(self, flip_new):
         self._flip = flip_new
 
@@ -3,17 +3,21 @@
 @author Jesse Haviland
 """
 
+import threading
 import numpy as np
 from roboticstoolbox.robot import Robot  # DHLink
 from roboticstoolbox.robot.DHLink import DHLink  # HACK
+from roboticstoolbox.robot.DHChain import DHChain
+from roboticstoolbox.robot.KinematicCache import cached
+from roboticstoolbox.robot.IKSeedTable import IKSeedTable
 from roboticstoolbox.tools.null import null
 from spatialmath.base.argcheck import \
     getvector, isscalar, verifymatrix, getmatrix
-from spatialmath.base.transforms3d import tr2delta, tr2eul
+from spatialmath.base.transforms3d import tr2delta
 from spatialmath import SE3, Twist3
 import spatialmath.base.symbolic as sym
 from scipy.optimize import minimize, Bounds, LinearConstraint
-from frne import init, frne, delete
+from frne import init, frne_batch, fdyn_batch, delete, update
 from roboticstoolbox.backend.PyPlot.functions import \
     _plot, _teach, _fellipse, _vellipse, _plot_ellipse, \
     _plot2, _teach2
@@ -55,6 +59,10 @@ class DHRobot(Robot, Dynamics):
 
     """
 
+    #: look for generated dynamics in the code generation cache without a
+    #: call to ``codegen``, see ``code``
+    codegen_autoload = False
+
     def __init__(
             self,
             L,
@@ -95,10 +103,26 @@ class DHRobot(Robot, Dynamics):
         if not all([link.mdh == self.mdh for link in self.links]):
             raise ValueError('Robot has mixed D&H link conventions')
 
-        # rne parameters
+        # rne parameters, the C robot object and its packed link parameters
         self._rne_ob = None
+        self._rne_changed = False
+        self._rne_L = None
+        self._rne_stale = set()
+        self._rne_mdh = None
         self._dynchanged = True
 
+        # the C robot object is only modified when no batch is using it,
+        # _rne_busy counts the batches in flight
+        self._rne_lock = threading.Condition()
+        self._rne_busy = 0
+
+        # compiled kinematic chain, built on first use
+        self._chain = None
+
+        # generated closed-form dynamics, looked up in the cache on first use
+        self._code = None
+        self._code_checked = False
+
     def __str__(self):
         """
         Pretty prints the DH Model of the robot. Will output angles in degrees
@@ -260,52 +284,230 @@ class DHRobot(Robot, Dynamics):
         r2.qd = self.qd
         r2.qdd = self.qdd
 
+        # the links are equal, so the packed parameters are too
+        if self._rne_L is not None and not self._rne_stale:
+            r2._rne_L = self._rne_L.copy()
+
+        return r2
+
+    def __copy__(self):
+        # a shallow copy, used by nofriction, waits on its own C robot object
+        r2 = self.__class__.__new__(self.__class__)
+        r2.__dict__.update(self.__dict__)
+        r2._rne_lock = threading.Condition()
+        r2._rne_busy = 0
         return r2
 
+    def dynchanged(self, link=None):
+        super().dynchanged(link)
+
+        # link parameters have changed, the compiled chain, the C robot
+        # object and the generated dynamics are stale
+        self._chain = None
+        self._code = None
+        self._code_checked = False
+
+        # a change to one link is applied to the C robot object in place,
+        # only that link is repacked
+        j = None
+        if link is not None:
+            j = next(
+                (i for i, L in enumerate(self.links) if L is link), None)
+
+        if j is None or self._rne_L is None:
+            self._rne_L = None
+            self._rne_stale = set()
+            self._rne_changed = True
+        else:
+            self._rne_stale.add(j)
+
+    @property
+    def chain(self):
+        """
+        Compiled kinematic chain
+
+        :return: The compiled kinematic chain of the robot
+        :rtype: DHChain
+
+        The chain holds a flat table of the link parameters with all
+        constant terms precomputed. It is built on first use and discarded
+        whenever a link parameter changes.
+        """
+        if self._chain is None:
+            self._chain = DHChain(self)
+        return self._chain
+
+    @property
+    def code(self):
+        """
+        Generated closed-form dynamics
+
+        :return: The generated dynamics module of the robot, or None
+        :rtype: module
+
+        The module is the one loaded by ``codegen``, it is discarded when a
+        link parameter changes. When it is available ``inertia``,
+        ``coriolis`` and ``gravload`` evaluate it rather than the compiled
+        chain.
+
+        If ``codegen_autoload`` is True the module is also looked up in the
+        code generation cache the first time it is needed, and again after
+        any link parameter changes, so a model generated by ``codegen`` in
+        an earlier run is used without a call to ``codegen``.
+
+        :notes:
+            - The generated module is Python code which is executed when it
+              is loaded, only set ``codegen_autoload`` for a cache directory
+              that you trust.
+            - A missing module is only looked for once for each set of link
+              parameters, see ``DHCodegen.load``.
+
+        :seealso: :func:`codegen`
+        """
+        if not self._code_checked:
+            self._code_checked = True
+            if self.codegen_autoload and not self.symbolic:
+                try:
+                    from roboticstoolbox.robot import DHCodegen
+                except ImportError:  # pragma: no cover
+                    # code generation requires SymPy
+                    return None
+                self._code = DHCodegen.load(self, generate=False)
+        return self._code
+
+    def codegen(self, directory=None):
+        """
+        Generate closed-form dynamics
+
+        :param directory: The cache directory, defaults to
+            ``DHCodegen.cachedir``
+        :type directory: str, optional
+        :return: The generated dynamics module
+        :rtype: module
+
+        ``robot.codegen()`` derives the inertia matrix, Coriolis matrix and
+        gravity load of the robot symbolically, eliminates common
+        subexpressions and writes them as a NumPy module to the cache, from
+        which it is loaded. From then on ``inertia``, ``coriolis`` and
+        ``gravload`` are straight-line arithmetic. If the module is already
+        in the cache it is simply loaded.
+
+        :notes:
+            - The derivation takes seconds to minutes depending on the
+              number of joints, it is done once for each set of link
+              parameters.
+            - A module in a directory other than the default is only found
+              by this call, see ``code``.
+            - Requires SymPy.
+
+        :seealso: :func:`code`, :mod:`DHCodegen`
+        """
+        from roboticstoolbox.robot import DHCodegen
+
+        self._code = DHCodegen.load(self, directory)
+        self._code_checked = True
+        return self._code
+
+    def _fastkine(self, q):
+        # True if q can be evaluated by the compiled chain
+        return not self.symbolic and q.dtype != object
+
+    def _pack_rne(self):
+        # Compress link data into an (n,24) array, cached between calls so
+        # that only the links which have changed are packed again. Returns
+        # the indices of the links which were packed
+        if self._rne_L is None:
+            self._rne_L = np.zeros((self.n, 24))
+            stale = range(self.n)
+        else:
+            stale = sorted(self._rne_stale)
+        self._rne_stale = set()
+
+        for i in stale:
+            link = self.links[i]
+            L = self._rne_L[i]
+            L[0] = link.alpha
+            L[1] = link.a
+            L[2] = link.theta
+            L[3] = link.d
+            L[4] = link.sigma
+            L[5] = link.offset
+            L[6] = link.m
+            L[7:10] = link.r.flatten()
+            L[10:19] = link.I.flatten()
+            L[19] = link.Jm
+            L[20] = link.G
+            L[21] = link.B
+            L[22:24] = link.Tc.flatten()
+
+        return stale
+
     def _init_rne(self):
-        # Compress link data into a 1D array
-        L = np.zeros(24 * self.n)
+        if not all([link.mdh == self.mdh for link in self.links]):
+            raise ValueError('Robot has mixed D&H link conventions')
 
-        for i in range(self.n):
-            j = i * 24
-            L[j] = self.links[i].alpha
-            L[j + 1] = self.links[i].a
-            L[j + 2] = self.links[i].theta
-            L[j + 3] = self.links[i].d
-            L[j + 4] = self.links[i].sigma
-            L[j + 5] = self.links[i].offset
-            L[j + 6] = self.links[i].m
-            L[j + 7:j + 10] = self.links[i].r.flatten()
-            L[j + 10:j + 19] = self.links[i].I.flatten()
-            L[j + 19] = self.links[i].Jm
-            L[j + 20] = self.links[i].G
-            L[j + 21] = self.links[i].B
-            L[j + 22:j + 24] = self.links[i].Tc.flatten()
-
-        self._rne_ob = init(self.n, self.mdh, L, self.gravity)
+        self._pack_rne()
+        self._rne_mdh = self.mdh
+        self._rne_ob = init(
+            self.n, self.mdh, self._rne_L.ravel(), self.gravity)
+
+    def _update_rne(self):
+        # write the parameters of the changed links into the C robot object
+        for i in self._pack_rne():
+            update(self._rne_ob, i, self._rne_L[i])
 
     def _check_rne(func):
+        # Bring the C robot object up to date and count the call as a batch
+        # in flight. The object is only modified once the batches of other
+        # threads which use it have finished
         @wraps(func)
         def wrapper_check_rne(*args, **kwargs):
-            if args[0]._rne_ob is None or args[0]._rne_changed:
-                args[0].delete_rne()
-                args[0]._init_rne()
-            args[0]._rne_changed = False
-            return func(*args, **kwargs)
+            robot = args[0]
+            with robot._rne_lock:
+                if any([robot.links[i].mdh != robot._rne_mdh
+                        for i in robot._rne_stale]):
+                    # a link convention has changed, which the C robot
+                    # object can not be updated for
+                    robot._rne_changed = True
+
+                if robot._rne_ob is None or robot._rne_changed:
+                    robot.delete_rne()
+                    robot._init_rne()
+                elif robot._rne_stale:
+                    robot._rne_lock.wait_for(lambda: robot._rne_busy == 0)
+                    robot._update_rne()
+                robot._rne_changed = False
+                robot._rne_busy += 1
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with robot._rne_lock:
+                    robot._rne_busy -= 1
+                    robot._rne_lock.notify_all()
         return wrapper_check_rne
 
     def delete_rne(self):
         """
         Frees the memory holding the robot object in c if the robot object
         has been initialised in c.
+
+        Waits for the calls to ``rne`` and ``accel`` in other threads which
+        are using the object.
         """
-        if self._rne_ob is not None:
-            delete(self._rne_ob)
-            self._rne_changed = False
-            self._rne_ob = None
+        with self._rne_lock:
+            if self._rne_ob is not None:
+                self._rne_lock.wait_for(lambda: self._rne_busy == 0)
+                delete(self._rne_ob)
+                self._rne_changed = False
+                self._rne_ob = None
 
     @property
     def mdh(self):
+        # follows a change of the link convention once all links agree
+        mdh = self.links[0].mdh
+        if mdh != self._mdh and all(
+                [link.mdh == mdh for link in self.links]):
+            self._mdh = mdh
         return self._mdh
 
     @property
@@ -618,7 +820,8 @@ class DHRobot(Robot, Dynamics):
 
         return tw, T[-1]
 
-    def fkine(self, q=None):
+    @cached
+    def fkine(self, q=None, out=None):
         '''
         T = fkine(q) evaluates forward kinematics for the robot at joint
         configuration q.
@@ -636,6 +839,10 @@ class DHRobot(Robot, Dynamics):
             j'th joint parameter for the i'th trajectory point.
         :type q: float ndarray(n) or (mxn)
 
+        :param out: Array to write the result to, in which case it is
+            returned instead of an SE3
+        :type out: float ndarray(4,4) or (m,4,4)
+
         :return T: Homogeneous transformation matrix or trajectory
         :rtype T: SE3 or SE3 list
 
@@ -644,11 +851,21 @@ class DHRobot(Robot, Dynamics):
               into the result.
             - Joint offsets, if defined, are added to q before the forward
               kinematics are computed.
+            - With ``out`` the pose is computed in place, no SE3 or
+              intermediate arrays are created.
 
         '''
         if q is None:
             q = np.copy(self.q)
 
+        q = getmatrix(q, (None, self.n))
+        if self._fastkine(q):
+            if out is not None:
+                self.chain.fkine(
+                    q, self._base, self._tool, out=self._outstack(out))
+                return out
+            return self.fkine_batch(q, se3=True)
+
         T = SE3.Empty()
         for qr in getmatrix(q, (None, self.n)):
 
@@ -666,8 +883,57 @@ class DHRobot(Robot, Dynamics):
                 Tr = Tr * self._tool
             T.append(Tr)
 
+        if out is not None:
+            self._outstack(out)[...] = np.array(T.A)
+            return out
+
         return T
 
+    def _outstack(self, out):
+        # view of an out argument as a stack of results
+        if out.ndim == 2:
+            return out[np.newaxis]
+        return out
+
+    def fkine_batch(self, q=None, se3=False, out=None):
+        '''
+        T = fkine_batch(q) evaluates forward kinematics for the robot at
+        every joint configuration in q in a single vectorised pass.
+
+        T = fkine_batch() as above except uses the stored q value of the
+        robot object.
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values). Each row of q is
+            a joint configuration.
+        :type q: float ndarray(n) or (m,n)
+        :param se3: return the result as an SE3 instance rather than an array
+        :type se3: bool
+        :param out: Array to write the result to
+        :type out: float ndarray(m,4,4)
+
+        :return T: Stack of homogeneous transformation matrices
+        :rtype T: float ndarray(m,4,4) or SE3
+
+        :notes:
+            - The robot's base or tool transform, if present, are incorporated
+              into the result.
+            - Joint offsets and joint flips are applied exactly as in
+              ``fkine``.
+            - Very large trajectories are evaluated in blocks of rows, see
+              ``DHChain.chunk``.
+            - Symbolic models are not supported, use ``fkine`` instead.
+
+        '''
+        q = self._qbatch(q)
+
+        T = self.chain.fkine(q, self._base, self._tool, out=out)
+
+        if se3:
+            return SE3([Tk for Tk in T], check=False)
+        else:
+            return T
+
     def fkine_all(self, q=None, old=True):
         '''
         Tall = allfkine(q) evaluates fkine for each joint within a robot and
@@ -696,6 +962,13 @@ class DHRobot(Robot, Dynamics):
         else:
             qr = getvector(q, self.n)
 
+        if self._fastkine(qr):
+            T = self.chain.fkine_all(qr[np.newaxis, :], self._base)[0]
+            Tall = [Tj for Tj in T]
+            if not old:
+                Tall.insert(0, self.base.A)
+            return SE3(Tall, check=False)
+
         if self._base is not None:
             Tj = self._base
         else:
@@ -705,7 +978,6 @@ class DHRobot(Robot, Dynamics):
         # print(Tj)
         for q, L in zip(qr, self.links):
             if first:
-                print(q, L.A(q))
                 Tj *= L.A(q)
                 if old:
                     Tall = Tj
@@ -717,7 +989,8 @@ class DHRobot(Robot, Dynamics):
                 Tall.append(Tj)
         return Tall
 
-    def jacobe(self, q=None):
+    @cached
+    def jacobe(self, q=None, out=None):
         """
         Je = jacobe(q) is the manipulator Jacobian matrix which maps joint
         velocity to end-effector spatial velocity. v = Je*qd in the
@@ -730,6 +1003,9 @@ class DHRobot(Robot, Dynamics):
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
 
+        :param out: Array to write the result to
+        :type out: float ndarray(6,n)
+
         :return J: The manipulator Jacobian in ee frame
         :rtype: float ndarray(6,n)
 
@@ -740,6 +1016,13 @@ class DHRobot(Robot, Dynamics):
         else:
             q = getvector(q, self.n)
 
+        if self._fastkine(q):
+            if out is not None:
+                self.chain.jacobe(
+                    q[np.newaxis, :], self._tool, out=out[np.newaxis])
+                return out
+            return self.chain.jacobe(q[np.newaxis, :], self._tool)[0]
+
         n = self.n
         L = self.links
         J = np.zeros((6, self.n), dtype=q.dtype)
@@ -764,15 +1047,24 @@ class DHRobot(Robot, Dynamics):
                 d = U[2, :3]      # nz oz az
                 delta = np.zeros((3,))
 
-            J[:, j] = np.r_[d, delta]
+            # the joint flip reverses the axis
+            if L[j].flip:
+                J[:, j] = -np.r_[d, delta]
+            else:
+                J[:, j] = np.r_[d, delta]
 
             if self.mdh != 0:
                 # modified DH convention
                 U = L[j].A(q[j]).A @ U
 
+        if out is not None:
+            out[...] = J
+            return out
+
         return J
 
-    def jacob0(self, q=None):
+    @cached
+    def jacob0(self, q=None, out=None):
         """
         J0 = jacob0(q) is the manipulator Jacobian matrix which maps joint
         velocity to end-effector spatial velocity. v = J0*qd in the
@@ -785,7 +1077,10 @@ class DHRobot(Robot, Dynamics):
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
 
-        :return J: The manipulator Jacobian in ee frame
+        :param out: Array to write the result to
+        :type out: float ndarray(6,n)
+
+        :return J: The manipulator Jacobian in base frame
         :rtype: float ndarray(6,n)
 
         """
@@ -795,10 +1090,24 @@ class DHRobot(Robot, Dynamics):
         else:
             q = getvector(q, self.n)
 
+        if self._fastkine(q):
+            if out is not None:
+                self.chain.jacob0(
+                    q[np.newaxis, :], self._base, self._tool,
+                    out=out[np.newaxis])
+                return out
+            return self.chain.jacob0(
+                q[np.newaxis, :], self._base, self._tool)[0]
+
         J0 = self.jacob0v(q) @ self.jacobe(q)
 
+        if out is not None:
+            out[...] = J0
+            return out
+
         return J0
 
+    @cached
     def jacob0v(self, q=None):
         """
         Jv = jacob0v(q) is the spatial velocity Jacobian, at joint
@@ -830,6 +1139,7 @@ class DHRobot(Robot, Dynamics):
 
         return Jv
 
+    @cached
     def jacobev(self, q=None):
         """
         Jv = jacobev(q) is the spatial velocity Jacobian, at joint
@@ -861,6 +1171,142 @@ class DHRobot(Robot, Dynamics):
 
         return Jv
 
+    def jacobe_batch(self, q=None):
+        """
+        Je = jacobe_batch(q) is the manipulator Jacobian in the end-effector
+        frame for every joint configuration in q, evaluated in a single
+        vectorised pass.
+
+        Je = jacobe_batch() as above except uses the stored q value of the
+        robot object.
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values). Each row of q is
+            a joint configuration.
+        :type q: float ndarray(n) or (m,n)
+
+        :return J: The manipulator Jacobian in ee frame
+        :rtype: float ndarray(m,6,n)
+
+        :notes:
+            - Symbolic models are not supported, use ``jacobe`` instead.
+        """
+
+        q = self._qbatch(q)
+        return self.chain.jacobe(q, self._tool)
+
+    def jacob0_batch(self, q=None):
+        """
+        J0 = jacob0_batch(q) is the manipulator Jacobian in the base frame
+        for every joint configuration in q, evaluated in a single vectorised
+        pass.
+
+        J0 = jacob0_batch() as above except uses the stored q value of the
+        robot object.
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values). Each row of q is
+            a joint configuration.
+        :type q: float ndarray(n) or (m,n)
+
+        :return J: The manipulator Jacobian in base frame
+        :rtype: float ndarray(m,6,n)
+
+        :notes:
+            - The end-effector rotation used to transform the Jacobian to the
+              base frame comes from the same pass over the links as the
+              Jacobian itself.
+            - Symbolic models are not supported, use ``jacob0`` instead.
+        """
+
+        q = self._qbatch(q)
+        return self.chain.jacob0(q, self._base, self._tool)
+
+    def jacob0v_batch(self, q=None):
+        """
+        Jv = jacob0v_batch(q) is the spatial velocity Jacobian, relating the
+        velocity in the end-effector frame to velocity in the base frame, for
+        every joint configuration in q.
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values). Each row of q is
+            a joint configuration.
+        :type q: float ndarray(n) or (m,n)
+
+        :returns J: The velocity Jacobian in 0 frame
+        :rtype J: float ndarray(m,6,6)
+        """
+
+        q = self._qbatch(q)
+        return self.chain.jacob0v(q, self._base, self._tool)
+
+    def jacobev_batch(self, q=None):
+        """
+        Jv = jacobev_batch(q) is the spatial velocity Jacobian, relating the
+        velocity in the base frame to velocity in the end-effector frame, for
+        every joint configuration in q.
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values). Each row of q is
+            a joint configuration.
+        :type q: float ndarray(n) or (m,n)
+
+        :returns J: The velocity Jacobian in ee frame
+        :rtype J: float ndarray(m,6,6)
+        """
+
+        q = self._qbatch(q)
+        return self.chain.jacobev(q, self._base, self._tool)
+
+    def _qbatch(self, q):
+        # joint configurations for the batch methods, one per row
+        if q is None:
+            q = np.copy(self.q)
+
+        q = getmatrix(q, (None, self.n))
+
+        if not self._fastkine(q):
+            raise TypeError('batch kinematics require a numeric model')
+
+        return q
+
+    def _ikfkine(self, q):
+        # end-effector pose and Jacobian in the end-effector frame, from one
+        # pass over the links
+        T, J = self.chain.fkine_jacobe(
+            np.reshape(q, (1, self.n)), self._base, self._tool)
+        return T[0], J[0]
+
+    def _ikcost(self, q, Tinv, omega):
+        """
+        Pose error cost of the optimisation based IK solvers and its gradient
+
+        :param q: The joint configuration
+        :type q: float ndarray(n)
+        :param Tinv: Inverse of the desired end-effector pose
+        :type Tinv: float ndarray(4,4)
+        :param omega: Weight matrix
+        :type omega: float ndarray(4,4)
+        :return: The cost and its gradient
+        :rtype: float, float ndarray(n)
+
+        The cost is ``sumsqr((Tinv T(q) - I) omega)``. The derivative of the
+        pose with respect to joint j is ``T(q) X_j`` where ``X_j`` is the
+        twist of column j of the Jacobian in the end-effector frame, so the
+        gradient is ``2 Je' x`` where x collects the translation column and
+        the skew-symmetric part of ``P = (Tinv T)' (Tinv T - I) omega^2``.
+        """
+        Tq, J = self._ikfkine(q)
+
+        A = Tinv @ Tq
+        E = (A - np.eye(4)) @ omega
+        P = A.T @ E @ omega
+
+        x = np.r_[
+            P[:3, 3], P[2, 1] - P[1, 2], P[0, 2] - P[2, 0], P[1, 0] - P[0, 1]]
+
+        return np.sum(E ** 2), 2 * J.T @ x
+
     def ikcon(self, T, q0=None):
         """
         Inverse kinematics by optimization with joint limits
@@ -904,6 +1350,8 @@ class DHRobot(Robot, Dynamics):
             - The objective function (error) is described as:
               sumsqr( (inv(T)*robot.fkine(q) - eye(4)) * omega )
               Where omega is some gain matrix, currently not modifiable.
+            - The gradient of the objective function is computed from the
+              manipulator Jacobian, see ``_ikcost``.
 
         """
 
@@ -928,20 +1376,13 @@ class DHRobot(Robot, Dynamics):
         reach = np.sum(np.abs([self.a, self.d]))
         omega = np.diag([1, 1, 1, 3 / reach])
 
-        def cost(q, T, omega):
-            return np.sum(
-                (
-                    (np.linalg.pinv(T.A) @ self.fkine(q).A - np.eye(4)) @
-                    omega) ** 2
-            )
-
         bnds = Bounds(self.qlim[0, :], self.qlim[1, :])
 
         for i in range(trajn):
-            Ti = T[i]
+            Tinv = np.linalg.pinv(T[i].A)
             res = minimize(
-                lambda q: cost(q, Ti, omega),
-                q0[i, :], bounds=bnds, options={'gtol': 1e-6})
+                self._ikcost, q0[i, :], args=(Tinv, omega), jac=True,
+                bounds=bnds, options={'gtol': 1e-6})
             qstar[i, :] = res.x
             error.append(res.fun)
             exitflag.append(res.success)
@@ -1044,7 +1485,7 @@ class DHRobot(Robot, Dynamics):
               depends on the initial guess q0 (defaults to 0).
             - The default value of q0 is zero which is a poor choice for most
               manipulators (eg. puma560, twolink) since it corresponds to a
-              kinematic singularity.
+              kinematic singularity, see ``ikseeds`` for a better one.
             - Such a solution is completely general, though much less
               efficient than specific inverse kinematic solutions derived
               symbolically, like ikine6s or ikine3.
@@ -1055,7 +1496,8 @@ class DHRobot(Robot, Dynamics):
               to generate q.
             - Joint limits are not considered in this solution.
             - The 'search' option peforms a brute-force search with initial
-              conditions chosen from the entire configuration space.
+              conditions chosen from the entire configuration space, see
+              ``ikine_search``.
             - If the search option is used any prismatic joint must have
               joint limits defined.
 
@@ -1088,45 +1530,20 @@ class DHRobot(Robot, Dynamics):
             mask = np.ones(6)
 
         if search:
-            # Randomised search for a starting point
-            search = False
-            # quiet = True
-
-            for k in range(slimit):
-
-                q0n = np.zeros(self.n)
-                for j in range(self.n):
-                    qlim = self.links[j].qlim
-                    if np.sum(np.abs(qlim)) == 0:
-                        if not self.links[j].sigma:
-                            q0n[j] = np.random.rand() * 2 * np.pi - np.pi
-                        else:
-                            raise ValueError('For a prismatic joint, '
-                                             'search requires joint limits')
-                    else:
-                        q0n[j] = np.random.rand() * (qlim[1] - qlim[0]) + \
-                            qlim[0]
-
-                # fprintf('Trying q = %s\n', num2str(q))
-
-                q, _, _ = self.ikine(
-                    T,
-                    ilimit,
-                    rlimit,
-                    tol,
-                    Y,
-                    Ymin,
-                    mask,
-                    q0n,
-                    search,
-                    slimit,
-                    transpose)
-
-                if not np.sum(np.abs(q)) == 0:
-                    return q, True, err
-
-            q = np.array([])
-            return q, False, err
+            # Multi-start search from random initial configurations
+            qt = np.zeros((trajn, self.n))
+            failed = []
+            for i in range(trajn):
+                qt[i], f, e = self.ikine_search(
+                    T[i], slimit=slimit, ilimit=ilimit, rlimit=rlimit,
+                    tol=tol, Y=Y, Ymin=Ymin, mask=mask, transpose=transpose)
+                failed.append(f)
+                err.extend(e)
+
+            if trajn == 1:
+                return qt[0, :], failed[0], err
+            else:
+                return qt, failed, err
 
         if not self.n >= np.sum(mask):
             raise ValueError('Number of robot DOF must be >= the same number '
@@ -1236,6 +1653,335 @@ class DHRobot(Robot, Dynamics):
 
         return qt, failed, err
 
+    def ikine_batch(
+            self, T,
+            ilimit=500,
+            rlimit=100,
+            tol=1e-10,
+            Y=0.1,
+            Ymin=0,
+            mask=None,
+            q0=None,
+            transpose=None):
+        """
+        Inverse kinematics of many poses by optimization without joint limits
+
+        ``q, failure, reason = ikine_batch(T)`` are the joint coordinates
+        (m,n) corresponding to each of the m end-effector poses in ``T``,
+        solved together. ``failure`` is a boolean array (m) which is True
+        where the solver failed, and ``reason`` contains details of the
+        failures.
+
+        :param T: The desired end-effector poses
+        :type T: SE3 or float ndarray(4,4) or (m,4,4)
+        :param ilimit: maximum number of iterations
+        :type ilimit: int (default 500)
+        :param rlimit: maximum number of consecutive step rejections
+        :type rlimit: int (default 100)
+        :param tol: final error tolerance
+        :type tol: float (default 1e-10)
+        :param Y: initial value of lambda
+        :type Y: float (default 0.1)
+        :param Ymin: minimum allowable value of lambda
+        :type Ymin: float (default 0)
+        :param mask: mask vector that correspond to translation in X, Y and Z
+            and rotation about X, Y and Z respectively.
+        :type mask: float ndarray(6)
+        :param q0: initial joint configuration, one for all poses or one per
+            pose (default all zeros)
+        :type q0: float ndarray(n) or (m,n)
+        :param transpose: use Jacobian transpose with step size A, rather
+            than Levenberg-Marquadt
+        :type transpose: float
+
+        :return q: The calculated joint values
+        :rtype q: float ndarray(n) or (m,n)
+        :return failure: IK solver failed
+        :rtype failure: bool or bool ndarray(m)
+        :return error: If failed, what went wrong
+        :rtype error: List of str
+
+        This is the solver of ``ikine`` applied to all poses in lock-step.
+        Every iteration evaluates the forward kinematics and Jacobians of the
+        poses still being solved in one vectorised pass and solves their
+        damped normal equations together, each pose keeps its own damping
+        factor and count of rejected steps and is retired as soon as it
+        converges or fails.
+
+        :notes:
+            - Each pose starts from its own ``q0``, not from the solution of
+              the previous pose.
+            - The error of a pose is carried over from the previous iteration
+              rather than computed again, so the number of forward kinematic
+              evaluations is halved.
+            - With the ``transpose`` option the step ``A J' e`` is always
+              taken.
+            - Symbolic models are not supported, use ``ikine`` instead.
+
+        :seealso: :func:`ikine`
+        """
+
+        if isinstance(T, SE3):
+            T = T.A
+        T = np.array(T, dtype=np.float64)
+        trajn = 1 if T.ndim == 2 else T.shape[0]
+        T = T.reshape((-1, 4, 4))
+        m = T.shape[0]
+
+        if q0 is None:
+            q0 = np.zeros(self.n)
+        q0 = np.array(q0, dtype=np.float64)
+        if q0.ndim == 1:
+            qt = np.tile(getvector(q0, self.n), (m, 1))
+        else:
+            verifymatrix(q0, (m, self.n))
+            qt = q0.copy()
+
+        if mask is not None:
+            mask = getvector(mask, 6)
+        else:
+            mask = np.ones(6)
+
+        if not self.n >= np.sum(mask):
+            raise ValueError('Number of robot DOF must be >= the same number '
+                             'of 1s in the mask matrix')
+
+        if not self._fastkine(qt):
+            raise TypeError('batch kinematics require a numeric model')
+
+        revolutes = np.array([not link.sigma for link in self.links])
+        eye = np.eye(self.n)
+
+        def error(q, a):
+            e = _ikdelta(self.chain.fkine(q, self._base, self._tool), T[a])
+            return e, np.linalg.norm(e * mask, axis=1)
+
+        # state of every pose, the poses in active are still being solved
+        active = np.arange(m)
+        e, nm = error(qt, active)
+        Yl = np.full(m, float(Y))
+        rejcount = np.zeros(m, dtype=int)
+        failed = np.zeros(m, dtype=bool)
+        err = []
+
+        iterations = 0
+        while len(active) > 0:
+            # Update the count and test against iteration limit
+            iterations += 1
+
+            if iterations > ilimit:
+                for i in active:
+                    err.append('ikine: iteration limit {0} exceeded '
+                               ' (pose {1}), final err {2}'.format(
+                                   ilimit, i, nm[i]))
+                failed[active] = True
+                break
+
+            # Are we there yet
+            active = active[nm[active] >= tol]
+            if len(active) == 0:
+                break
+
+            a = active
+            q = qt[a]
+            J = self.chain.jacobe(q, self._tool)
+            JtW = np.swapaxes(J, 1, 2) * mask
+
+            if transpose is not None:
+                # Do the simple Jacobian transpose with constant gain
+                q = q + transpose * np.einsum('kji,kj->ki', J, e[a])
+                e[a], nm[a] = error(q, a)
+            else:
+                # Do the damped inverse Gauss-Newton with
+                # Levenberg-Marquadt
+                A = JtW @ J + (Yl[a] + Ymin)[:, np.newaxis, np.newaxis] * eye
+                dq = np.linalg.solve(A, JtW @ e[a, :, np.newaxis])[:, :, 0]
+
+                # Compute possible new value of q and the new error
+                qnew = q + dq
+                enew, nmnew = error(qnew, a)
+
+                # Was it a good update?
+                ok = nmnew < nm[a]
+                q[ok] = qnew[ok]
+                e[a[ok]] = enew[ok]
+                nm[a[ok]] = nmnew[ok]
+                Yl[a] = np.where(ok, Yl[a] / 2, Yl[a] * 2)
+                rejcount[a] = np.where(ok, 0, rejcount[a] + 1)
+
+                # retire the poses with too many rejected steps
+                reject = rejcount[a] > rlimit
+                for i, nmi in zip(a[reject], nmnew[reject]):
+                    err.append(
+                        'ikine: rejected-step limit {0} exceeded '
+                        '(pose {1}), final err {2}'.format(rlimit, i, nmi))
+                failed[a[reject]] = True
+                active = a[~reject]
+
+            # Wrap angles for revolute joints
+            k = (q > np.pi) & revolutes
+            q[k] -= 2 * np.pi
+
+            k = (q < -np.pi) & revolutes
+            q[k] += 2 * np.pi
+
+            qt[a] = q
+
+        if np.any(failed):
+            err.append(
+                'failed to converge: try a different '
+                'initial value of joint coordinates')
+
+        if trajn == 1:
+            return qt[0, :], failed[0], err
+        else:
+            return qt, failed, err
+
+    def ikine_search(
+            self, T, nsolutions=1, slimit=100, batch=20, seed=None,
+            distinct=1e-3, **kwargs):
+        """
+        Inverse kinematics by optimization from many initial configurations
+
+        ``q, failure, reason = ikine_search(T)`` are the joint coordinates
+        (n) corresponding to the robot end-effector pose ``T``, found by
+        running ``ikine_batch`` from random initial configurations until it
+        converges. ``failure`` is True if no attempt converged, and
+        ``reason`` contains details of the failure.
+
+        ``q, failure, reason = ikine_search(T, nsolutions=k)`` as above but
+        the search continues until ``k`` distinct solutions have been found.
+        ``q`` is a (k,n) array, with fewer rows if the search failed.
+
+        :param T: The desired end-effector pose
+        :type T: SE3 or float ndarray(4,4)
+        :param nsolutions: number of distinct solutions to find
+        :type nsolutions: int (default 1)
+        :param slimit: maximum number of initial configurations to try
+        :type slimit: int (default 100)
+        :param batch: number of initial configurations solved together
+        :type batch: int (default 20)
+        :param seed: seed of the random number generator
+        :type seed: int, optional
+        :param distinct: solutions which differ by less than this in every
+            joint are the same
+        :type distinct: float (default 1e-3)
+        :param kwargs: options for ``ikine_batch``, eg. ``ilimit``, ``tol``
+            or ``mask``
+
+        :return q: The calculated joint values
+        :rtype q: float ndarray(n) or (k,n)
+        :return failure: IK solver failed
+        :rtype failure: bool
+        :return error: If failed, what went wrong
+        :rtype error: List of str
+
+        All ``slimit`` initial configurations are drawn at once, uniformly
+        within the joint limits, and are tried ``batch`` at a time in one
+        vectorised solve. The search stops after the batch in which the
+        requested number of solutions is reached, so the same ``seed`` gives
+        the same result.
+
+        :notes:
+            - A revolute joint without limits is drawn from [-pi, pi], any
+              prismatic joint must have joint limits defined.
+            - The solutions are not constrained to the joint limits.
+            - If a single solution is requested and none is found, ``q`` is
+              the attempt with the smallest final error.
+
+        :seealso: :func:`ikine_batch`, :func:`ikine`
+        """
+
+        if isinstance(T, SE3):
+            T = T.A
+        T = np.array(T, dtype=np.float64)
+        verifymatrix(T, (4, 4))
+
+        mask = kwargs.get('mask')
+        mask = np.ones(6) if mask is None else getvector(mask, 6)
+
+        # the range of initial values of each joint
+        qlim = self.qlim
+        revolutes = np.array([not link.sigma for link in self.links])
+        unset = np.sum(np.abs(qlim), axis=0) == 0
+        if np.any(unset & ~revolutes):
+            raise ValueError('For a prismatic joint, '
+                             'search requires joint limits')
+        lo = np.where(unset, -np.pi, qlim[0, :])
+        hi = np.where(unset, np.pi, qlim[1, :])
+
+        rng = np.random.default_rng(seed)
+        q0 = rng.uniform(lo, hi, (slimit, self.n))
+
+        solutions = []
+        best = None
+        for start in range(0, slimit, batch):
+            q0k = q0[start:start + batch]
+            qk, failed, _ = self.ikine_batch(
+                np.tile(T, (q0k.shape[0], 1, 1)), q0=q0k, **kwargs)
+
+            for q in qk[~failed]:
+                d = np.array([qs - q for qs in solutions]).reshape(
+                    (-1, self.n))
+                d[:, revolutes] = np.mod(
+                    d[:, revolutes] + np.pi, 2 * np.pi) - np.pi
+                if np.all(np.any(np.abs(d) > distinct, axis=1)):
+                    solutions.append(q)
+
+            if len(solutions) >= nsolutions:
+                break
+
+            if nsolutions == 1:
+                e = _ikdelta(
+                    self.chain.fkine(qk, self._base, self._tool),
+                    np.tile(T, (qk.shape[0], 1, 1)))
+                e = np.linalg.norm(e * mask, axis=1)
+                k = np.argmin(e)
+                if best is None or e[k] < best[0]:
+                    best = (e[k], qk[k])
+
+        err = []
+        failed = len(solutions) < nsolutions
+        if failed:
+            err.append(
+                'ikine: found {0} of {1} solutions from {2} initial '
+                'configurations'.format(len(solutions), nsolutions, slimit))
+
+        if nsolutions == 1:
+            q = solutions[0] if solutions else best[1]
+        else:
+            q = np.array(solutions[:nsolutions]).reshape((-1, self.n))
+
+        return q, failed, err
+
+    def ikseeds(self, npoints=100000, qlim=None, weight=None, seed=None):
+        """
+        Table of initial configurations for inverse kinematics
+
+        :param npoints: Number of joint configurations to sample
+        :type npoints: int
+        :param qlim: Range of every joint, defaults to the joint limits
+        :type qlim: float ndarray(2,n), optional
+        :param weight: Length which scales the orientation features
+        :type weight: float, optional
+        :param seed: Seed of the random number generator
+        :type seed: int, optional
+        :return: The seed table
+        :rtype: IKSeedTable
+
+        ``table = ikseeds()`` samples the forward kinematics over the joint
+        space once. ``table(T)`` is then the sampled configuration whose
+        end-effector pose is nearest to ``T``, a good initial value ``q0``
+        for ``ikine``, ``ikine_batch`` and the other numerical solvers.
+
+        The table can be saved with ``table.save(dirname)`` and loaded,
+        memory-mapped, with ``IKSeedTable.load(dirname)``.
+
+        :seealso: :class:`IKSeedTable`, :func:`ikine_batch`
+        """
+        return IKSeedTable(
+            self, npoints=npoints, qlim=qlim, weight=weight, seed=seed)
+
     def ikine3(self, T, left=True, elbow_up=True):
         """
         Analytical inverse kinematics for three link robots
@@ -1266,6 +2012,8 @@ class DHRobot(Robot, Dynamics):
 
         :notes:
             - The same as IKINE6S without the wrist.
+            - The poses of a trajectory are solved together with vectorised
+              operations, ``ikine3_batch`` returns all the solutions.
             - The inverse kinematic solution is generally not unique, and
               depends on the configuration string.
             - Joint offsets, if defined, are added to the inverse kinematics
@@ -1296,82 +2044,139 @@ class DHRobot(Robot, Dynamics):
 
         trajn = len(T)
 
-        qt = np.zeros((trajn, 3))
+        # undo base transformation
+        Ti = np.linalg.inv(self.base.A) @ self._ikpose(T)
 
-        for j in range(trajn):
-            theta = np.zeros(3)
+        qt = self._ikine3(Ti[:, :3, 3], left, elbow_up)
 
-            a2 = self.links[1].a
-            a3 = self.links[2].a
-            d3 = self.links[2].d
+        if trajn == 1:
+            return qt[0, :]
+        else:
+            return qt
 
-            # undo base transformation
-            Ti = np.linalg.inv(self.base.A) @ T[j].A
+    def ikine3_batch(self, T, tol=1e-6):
+        """
+        Analytical inverse kinematics for three link robots, all solutions
 
-            # The following parameters are extracted from the Homogeneous
-            # Transformation
-            Px = Ti[0, 3]
-            Py = Ti[1, 3]
-            Pz = Ti[2, 3]
+        q, valid = ikine3_batch(T) are the joint coordinates (m,4,3) of all
+        four solutions for each of the m robot end-effector poses ``T``, and
+        a boolean array (m,4) which is True for the solutions which reach the
+        position of the pose.
 
-            # The configuration parameter determines what n1,n2 values are
-            # used and how many solutions are determined which have values
-            # of -1 or +1.
+        As for ``ikine3`` the point which is placed at the position of ``T``
+        is at a distance ``d3`` along the z-axis of the last link frame, the
+        wrist centre of an arm like the Puma 560.
 
-            if left:
-                n1 = -1
-            else:
-                n1 = 1
+        :param T: The desired end-effector poses
+        :type T: SE3 or float ndarray(4,4) or (m,4,4)
+        :param tol: largest error of the forward kinematics of a valid
+            solution, in any element of the position
+        :type tol: float
 
-            if not elbow_up:
-                if n1 == 1:
-                    n2 = -1
-                else:
-                    n2 = 1
-            else:
-                if n1 == 1:
-                    n2 = 1
-                else:
-                    n2 = -1
+        :return q: The calculated joint values
+        :rtype q: float ndarray(m,4,3)
+        :return valid: Solution reaches the position
+        :rtype valid: bool ndarray(m,4)
 
-            # Solve for theta[0]
-            # based on the configuration parameter n1
+        Solution ``k`` is the configuration of ``ikine3`` with
+        ``left = not k & 2`` and ``elbow_up = not k & 1``.
 
-            r = np.sqrt(Px**2 + Py**2)
+        :notes:
+            - Only the position of the pose is used.
+            - Invalid solutions may contain NaN.
+
+        :seealso: :func:`ikine3`
+        """
+
+        if not self.n == 3:
+            raise ValueError(
+                "Function only applicable to three degree of freedom robots")
+
+        if self.mdh:
+            raise ValueError(
+                "Function only applicable to robots with standard DH "
+                "parameters")
+
+        if not self.isrevolute() == [True, True, True]:
+            raise ValueError(
+                "Function only applicable to robots with revolute joints")
+
+        T = self._ikpose(T)
+        P = (np.linalg.inv(self.base.A) @ T)[:, :3, 3]
+
+        q = np.stack([
+            self._ikine3(P, not k & 2, not k & 1) for k in range(4)], axis=1)
 
+        return q, self._ikvalid(
+            q, T, tol, point=np.r_[0, 0, self.links[2].d])
+
+    def _ikine3(self, P, left, elbow_up):
+        # joint coordinates (m,3) of a three link robot for the positions
+        # P (m,3) in the base frame
+        theta = [None] * 3
+
+        a2 = self.links[1].a
+        a3 = self.links[2].a
+        d3 = self.links[2].d
+
+        # The following parameters are extracted from the Homogeneous
+        # Transformation
+        Px = P[:, 0]
+        Py = P[:, 1]
+        Pz = P[:, 2]
+
+        # The configuration parameter determines what n1,n2 values are
+        # used and how many solutions are determined which have values
+        # of -1 or +1.
+
+        if left:
+            n1 = -1
+        else:
+            n1 = 1
+
+        if not elbow_up:
             if n1 == 1:
-                theta[0] = np.arctan2(Py, Px) + np.arcsin(d3 / r)
+                n2 = -1
             else:
-                theta[0] = np.arctan2(Py, Px) + np.pi - np.arcsin(d3 / r)
+                n2 = 1
+        else:
+            if n1 == 1:
+                n2 = 1
+            else:
+                n2 = -1
 
-            # Solve for theta[1]
-            # based on the configuration parameter n2
+        # Solve for theta[0]
+        # based on the configuration parameter n1
 
-            V114 = Px * np.cos(theta[0]) + Py * np.sin(theta[0])
-            r = np.sqrt(V114**2 + Pz**2)
+        r = np.sqrt(Px**2 + Py**2)
 
-            Psi = np.arccos(
-                (a2**2 - d3**2 - a3**2 + V114**2 + Pz**2)
-                / (2.0 * a2 * r))
+        if n1 == 1:
+            theta[0] = np.arctan2(Py, Px) + np.arcsin(d3 / r)
+        else:
+            theta[0] = np.arctan2(Py, Px) + np.pi - np.arcsin(d3 / r)
 
-            theta[1] = np.arctan2(Pz, V114) + n2 * Psi
+        # Solve for theta[1]
+        # based on the configuration parameter n2
 
-            # Solve for theta[2]
-            num = np.cos(theta[1]) * V114 + np.sin(theta[1]) * Pz - a2
-            den = np.cos(theta[1]) * Pz - np.sin(theta[1]) * V114
-            theta[2] = np.arctan2(a3, d3) - np.arctan2(num, den)
+        V114 = Px * np.cos(theta[0]) + Py * np.sin(theta[0])
+        r = np.sqrt(V114**2 + Pz**2)
 
-            # remove the link offset angles
-            for i in range(3):
-                theta[i] -= self.links[i].offset
+        Psi = np.arccos(
+            (a2**2 - d3**2 - a3**2 + V114**2 + Pz**2)
+            / (2.0 * a2 * r))
 
-            # Append to trajectory
-            qt[j, :] = theta
+        theta[1] = np.arctan2(Pz, V114) + n2 * Psi
 
-        if trajn == 1:
-            return qt[0, :]
-        else:
-            return qt
+        # Solve for theta[2]
+        num = np.cos(theta[1]) * V114 + np.sin(theta[1]) * Pz - a2
+        den = np.cos(theta[1]) * Pz - np.sin(theta[1]) * V114
+        theta[2] = np.arctan2(a3, d3) - np.arctan2(num, den)
+
+        # remove the link offset angles
+        for i in range(3):
+            theta[i] = theta[i] - self.links[i].offset
+
+        return np.stack(theta, axis=1)
 
     def ikine6s(self, T, left=True, elbow_up=True, wrist_flip=False):
         """
@@ -1423,6 +2228,8 @@ class DHRobot(Robot, Dynamics):
             - Joint offsets, if defined, are added to the inverse kinematics
               to generate q.
             - Only applicable for standard Denavit-Hartenberg parameters
+            - The poses of a trajectory are solved together with vectorised
+              operations, ``ikine6s_batch`` returns all the solutions.
 
         :reference:
             - Inverse kinematics for a PUMA 560,
@@ -1461,303 +2268,378 @@ class DHRobot(Robot, Dynamics):
         if wrist_flip:
             sol[2] = 2
 
-        if self._is_simple():
-            self.ikineType = 'nooffset'
-        elif self._is_puma():
-            self.ikineType = 'puma'
-        elif self._is_offset():
-            self.ikineType = 'offset'
-        elif self._is_rrp():
-            self.ikineType = 'rrp'
-        else:
-            raise ValueError('This kinematic structure not supported')
+        kind = self._ikine6s_kind()
 
-        q = np.zeros((trajn, self.n))
-        err = []
+        # Undo base and tool transformations
+        Ti = self._ikpose(T, tool=True)
 
-        for j in range(trajn):
+        q = self._ikine6s(Ti, kind, sol)
 
-            theta = np.zeros(self.n)
+        err = []
+        for j in np.flatnonzero(np.any(np.isnan(q), axis=1)):
+            q[j, :] = 0
+            err.append('point not reachable')
 
-            # Undo base and tool transformations
-            Ti = np.linalg.inv(self.base.A) @ T[j].A @ \
-                np.linalg.inv(self.tool.A)
+        if trajn == 1:
+            return q[0, :], err
+        else:
+            return q, err
 
-            if self.ikineType == 'puma':
-                # Puma model with shoulder and elbow offsets
-                # - Inverse kinematics for a PUMA 560,
-                #   Paul and Zhang,
-                #   The International Journal of Robotics Research,
-                #   Vol. 5, No. 2, Summer 1986, p. 32-44
+    def ikine6s_batch(self, T, tol=1e-6):
+        """
+        Analytical inverse kinematics, all solutions
 
-                a2 = self.links[1].a
-                a3 = self.links[2].a
-                d1 = self.links[0].d
-                d3 = self.links[2].d
-                d4 = self.links[3].d
+        q, valid = ikine6s_batch(T) are the joint coordinates (m,8,n) of all
+        eight solutions for each of the m robot end-effector poses ``T``, and
+        a boolean array (m,8) which is True for the solutions which reach the
+        pose.
 
-                # The following parameters are extracted from the Homogeneous
-                # Transformation as defined in equation 1, p. 34
+        :param T: The desired end-effector poses
+        :type T: SE3 or float ndarray(4,4) or (m,4,4)
+        :param tol: largest error of the forward kinematics of a valid
+            solution, in any element of the pose matrix
+        :type tol: float
 
-                Px = Ti[0, 3]
-                Py = Ti[1, 3]
-                Pz = Ti[2, 3] - d1
+        :return q: The calculated joint values
+        :rtype q: float ndarray(m,8,n)
+        :return valid: Solution reaches the pose
+        :rtype valid: bool ndarray(m,8)
 
-                # Solve for theta[0]
-                # r is defined in equation 38, p. 39.
-                # theta[0] uses equations 40 and 41, p.39,
-                # based on the configuration parameter n1
+        Solution ``k`` is the configuration of ``ikine6s`` with
+        ``left = not k & 4``, ``elbow_up = not k & 2`` and
+        ``wrist_flip = k & 1``.  The analytic solution of each configuration
+        is evaluated for all poses at once, and each solution is checked by
+        forward kinematics in one vectorised pass.
 
-                r = np.sqrt(Px**2 + Py**2)
-                if sol[0] == 1:
-                    theta[0] = np.arctan2(Py, Px) + np.pi - np.arcsin(d3 / r)
-                else:
-                    theta[0] = np.arctan2(Py, Px) + np.arcsin(d3 / r)
-
-                # Solve for theta[1]
-                # V114 is defined in equation 43, p.39.
-                # r is defined in equation 47, p.39.
-                # Psi is defined in equation 49, p.40.
-                # theta[1] uses equations 50 and 51, p.40, based on the
-                # configuration parameter n2
-                if sol[1] == 1:
-                    n2 = -1
-                else:
-                    n2 = 1
+        :notes:
+            - The robots supported are those of ``ikine6s``.
+            - Invalid solutions may contain NaN.
 
-                if sol[0] == 2:
-                    n2 = -n2
+        :seealso: :func:`ikine6s`
+        """
 
-                V114 = Px * np.cos(theta[0]) + Py * np.sin(theta[0])
+        if not self.n == 6:
+            raise ValueError(
+                "Function only applicable to six degree of freedom robots")
 
-                r = np.sqrt(V114**2 + Pz**2)
+        if self.mdh:
+            raise ValueError(
+                "Function only applicable to robots with standard DH "
+                "parameters")
 
-                Psi = np.arccos(
-                    (a2**2 - d4**2 - a3**2 + V114**2 + Pz**2)
-                    / (2.0 * a2 * r))
+        if not self.isspherical():
+            raise ValueError(
+                "Function only applicable to robots with a spherical wrist")
 
-                if np.isnan(Psi):
-                    theta = []
-                else:
-                    theta[1] = np.arctan2(Pz, V114) + n2 * Psi
-
-                    # Solve for theta[2]
-                    # theta[2] uses equation 57, p. 40.
-                    num = np.cos(theta[1]) * V114 + np.sin(theta[1]) * Pz - a2
-                    den = np.cos(theta[1]) * Pz - np.sin(theta[1]) * V114
-                    theta[2] = np.arctan2(a3, d4) - np.arctan2(num, den)
-
-            elif self.ikineType == 'nooffset':
-                a2 = self.links[1].a
-                a3 = self.links[2].a
-                d1 = self.links[0].d
-
-                px = Ti[0, 3]
-                py = Ti[1, 3]
-                pz = Ti[2, 3]
-
-                # Autogenerated code
-                if self.links[0].alpha < 0:
-                    if sol[0] == 1:
-                        temp = -px - py * 1j
-                        if np.abs(temp) == 0:
-                            temp = 0
-                        theta[0] = np.angle(temp)
-                    else:
-                        theta[0] = np.angle(px + py * 1j)
+        kind = self._ikine6s_kind()
+        T = self._ikpose(T)
+        Ti = self._ikpose(T, tool=True)
+
+        q = np.stack([
+            self._ikine6s(Ti, kind, [1 + (k >> 2 & 1), 1 + (k >> 1 & 1),
+                                     1 + (k & 1)])
+            for k in range(8)], axis=1)
+
+        return q, self._ikvalid(q, T, tol)
+
+    def _ikpose(self, T, tool=False):
+        # stack of poses (m,4,4), with the base transform and optionally the
+        # tool transform removed
+        if isinstance(T, SE3):
+            T = T.A
+        T = np.reshape(np.array(T, dtype=np.float64), (-1, 4, 4))
+        if tool:
+            T = np.linalg.inv(self.base.A) @ T @ np.linalg.inv(self.tool.A)
+        return T
 
-                    print(theta[0])
+    def _ikvalid(self, q, T, tol, point=None):
+        # True for the solutions q (m,k,n) whose forward kinematics is within
+        # tol of the pose T (m,4,4), or if point is given, which place that
+        # point of the last link frame, without the tool, at the position of T
+        m, k, n = q.shape
+        valid = np.all(np.isfinite(q), axis=2)
+
+        qv = np.where(valid[..., np.newaxis], q, 0).reshape((-1, n))
+        if point is None:
+            Tq = self.chain.fkine(qv, self._base, self._tool)
+            e = Tq.reshape((m, k, 4, 4)) - T[:, np.newaxis]
+        else:
+            Tq = self.chain.fkine(qv, self._base)
+            p = Tq[:, :3, :3] @ point + Tq[:, :3, 3]
+            e = p.reshape((m, k, 3)) - T[:, np.newaxis, :3, 3]
 
-                    S1 = np.sin(theta[0])
-                    C1 = np.cos(theta[0])
+        return valid & np.all(np.abs(e) < tol, axis=tuple(
+            range(2, e.ndim)))
 
-                    if sol[1] == 1:
-                        theta[1] = -np.angle(a2*d1*-2.0+a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j-np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
-                    else:
-                        theta[1] = -np.angle(a2*d1*-2.0+a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j+np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
+    def _ikine6s_kind(self):
+        # the kinematic structure of the arm, for ikine6s
+        if self._is_simple():
+            self.ikineType = 'nooffset'
+        elif self._is_puma():
+            self.ikineType = 'puma'
+        elif self._is_offset():
+            self.ikineType = 'offset'
+        elif self._is_rrp():
+            self.ikineType = 'rrp'
+        else:
+            raise ValueError('This kinematic structure not supported')
 
-                    S2 = np.sin(theta[1])
-                    C2 = np.cos(theta[1])
+        return self.ikineType
+
+    def _ikine6s(self, Ti, kind, sol):
+        # one configuration of the analytic solution for the poses Ti
+        # (m,4,4), NaN where the point is not reachable
+        q = np.zeros((Ti.shape[0], self.n))
+
+        # The arm places the wrist centre, which is offset from the
+        # end-effector by d6 along the last joint axis and by a6
+        L6 = self.links[5]
+        z5 = Ti[:, :3, :3] @ SE3.Rx(L6.alpha).R.T[:, 2]
+        P = Ti[:, :3, 3] - L6.d * z5 - L6.a * Ti[:, :3, 0]
+        q[:, :3] = self._ikine6s_arm(P, kind, sol)
+
+        # Solve for the wrist rotation
+        # We need to account for some random translations between the
+        # first and last 3 joints (d4) and also d6,a6,alpha6 in the
+        # final frame.
+
+        # Rotation of first 3 joints, the arm solution is in joint angles
+        # so the joint offsets are removed
+        offset = np.array([link.offset for link in self.links])
+        A = self.chain.A(np.c_[q[:, :3] - offset[:3], np.zeros((len(q), 3))])
+        R13 = A[:, 0, :3, :3] @ A[:, 1, :3, :3] @ A[:, 2, :3, :3]
+
+        # T = T13 * Tz(d4) * R * Tz(d6) Tx(a5) Rx(alpha6), the translations
+        # do not change the rotation
+        Rt = SE3.Rx(self.links[5].alpha).R
+        R = np.swapaxes(R13, 1, 2) @ Ti[:, :3, :3] @ Rt.T
+
+        # The spherical wrist implements Euler angles
+        q[:, 3:6] = _tr2eul(R, flip=sol[2] == 1)
+
+        if self.links[3].alpha > 0:
+            q[:, 4] = -q[:, 4]
+
+        # Remove the link offset angles
+        return q - offset
+
+    def _ikine6s_arm(self, P, kind, sol):
+        # joint angles (m,3) of the arm of a robot with a spherical wrist, for
+        # the end-effector positions P (m,3), for the configuration sol
+        theta = [None] * 3
+
+        if kind == 'puma':
+            # Puma model with shoulder and elbow offsets
+            # - Inverse kinematics for a PUMA 560,
+            #   Paul and Zhang,
+            #   The International Journal of Robotics Research,
+            #   Vol. 5, No. 2, Summer 1986, p. 32-44
 
-                    if sol[2] == 1:
-                        theta[2] = -np.angle(a2*-1j+C2*d1-C2*pz+S2*d1*1j-S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j-np.sqrt(0j+(-a2+S2*d1-S2*pz+C1*C2*px+C2*S1*py)**2+(-C2*d1+C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
-                    else:
-                        theta[2] = -np.angle(a2*-1j+C2*d1-C2*pz+S2*d1*1j-S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j+np.sqrt(0j+(-a2+S2*d1-S2*pz+C1*C2*px+C2*S1*py)**2+(-C2*d1+C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
+            a2 = self.links[1].a
+            a3 = self.links[2].a
+            d1 = self.links[0].d
+            d3 = self.links[2].d
+            d4 = self.links[3].d
 
-                else:
-                    if sol[0] == 1:
-                        theta[0] = np.angle(px + py * 1j)
-                    else:
-                        temp = -px - py * 1j
-                        if np.abs(temp) == 0:
-                            temp = 0
-                        theta[0] = np.angle(temp)
+            # The following parameters are extracted from the Homogeneous
+            # Transformation as defined in equation 1, p. 34
 
-                    S1 = np.sin(theta[0])
-                    C1 = np.cos(theta[0])
+            Px = P[:, 0]
+            Py = P[:, 1]
+            Pz = P[:, 2] - d1
 
-                    if sol[1] == 1:
-                        theta[1] = -np.angle(a2*d1*2.0-a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j-np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
-                    else:
-                        theta[1] = -np.angle(a2*d1*2.0-a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j+np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
+            # Solve for theta[0]
+            # r is defined in equation 38, p. 39.
+            # theta[0] uses equations 40 and 41, p.39,
+            # based on the configuration parameter n1
 
-                    S2 = np.sin(theta[1])
-                    C2 = np.cos(theta[1])
+            r = np.sqrt(Px**2 + Py**2)
+            if sol[0] == 1:
+                theta[0] = np.arctan2(Py, Px) + np.pi - np.arcsin(d3 / r)
+            else:
+                theta[0] = np.arctan2(Py, Px) + np.arcsin(d3 / r)
 
-                    if sol[2] == 1:
-                        theta[2] = -np.angle(a2*-1j-C2*d1+C2*pz-S2*d1*1j+S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j-np.sqrt(0j+(-a2-S2*d1+S2*pz+C1*C2*px+C2*S1*py)**2+(C2*d1-C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
-                    else:
-                        theta[2] = -np.angle(a2*-1j-C2*d1+C2*pz-S2*d1*1j+S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j+np.sqrt(0j+(-a2-S2*d1+S2*pz+C1*C2*px+C2*S1*py)**2+(C2*d1-C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
-
-            elif self.ikineType == 'offset':
-                # General case with 6 length parameters
-                a1 = self.links[0].a
-                a2 = self.links[1].a
-                a3 = self.links[2].a
-                d1 = self.links[0].d
-                d2 = self.links[1].d
-                d3 = self.links[2].d
-
-                px = Ti[0, 3]
-                py = Ti[1, 3]
-                pz = Ti[2, 3]
-
-                # Autogenerated code
-                if self.links[0].alpha < 0:
-
-                    if sol[0] == 1:
-                        theta[0] = -np.angle(-px+py*1j)+np.angle(d2*1j+d3*1j-np.sqrt(0j+d2*d3*-2.0-d2**2-d3**2+px**2+py**2))  # noqa
-                    else:
-                        theta[0] = np.angle(d2*1j+d3*1j+np.sqrt(0j+d2*d3*-2.0-d2**2-d3**2+px**2+py**2))-np.angle(-px+py*1j)  # noqa
+            # Solve for theta[1]
+            # V114 is defined in equation 43, p.39.
+            # r is defined in equation 47, p.39.
+            # Psi is defined in equation 49, p.40.
+            # theta[1] uses equations 50 and 51, p.40, based on the
+            # configuration parameter n2
+            if sol[1] == 1:
+                n2 = -1
+            else:
+                n2 = 1
 
-                    S1 = np.sin(theta[0])
-                    C1 = np.cos(theta[0])
+            if sol[0] == 2:
+                n2 = -n2
 
-                    if sol[1] == 1:
-                        theta[1] = np.angle(d1*pz*2.0j-np.sqrt(0j+d1*pz**3*4.0+d1**3*pz*4.0-a1**4-a2**4-a3**4-d1**4-py**4-pz**4-C1**4*px**4+C1**2*py**4*2.0-C1**4*py**4+a1**2*a2**2*2.0+a1**2*a3**2*2.0+a2**2*a3**2*2.0-a1**2*d1**2*2.0+a2**2*d1**2*2.0+a3**2*d1**2*2.0-a1**2*py**2*6.0-a2**2*py**2*2.0+a3**2*py**2*2.0-a1**2*pz**2*2.0+a2**2*pz**2*2.0+a3**2*pz**2*2.0-d1**2*py**2*2.0-d1**2*pz**2*6.0-py**2*pz**2*2.0+d1*py**2*pz*4.0+C1**3*a1*px**3*4.0+S1**3*a1*py**3*4.0-C1**2*a1**2*px**2*6.0+C1**2*a2**2*px**2*2.0+C1**2*a3**2*px**2*2.0+C1**2*a1**2*py**2*6.0+C1**2*a2**2*py**2*1.0e1-C1**2*a3**2*py**2*2.0-C1**4*a2**2*py**2*1.2e1+C1**6*a2**2*py**2*4.0-C1**2*d1**2*px**2*2.0+C1**2*d1**2*py**2*2.0-C1**2*px**2*py**2*6.0+C1**4*px**2*py**2*6.0-C1**2*px**2*pz**2*2.0+C1**2*py**2*pz**2*2.0+S1**6*a2**2*py**2*4.0+C1*a1**3*px*4.0+S1*a1**3*py*4.0+a1**2*d1*pz*4.0-a2**2*d1*pz*4.0-a3**2*d1*pz*4.0-C1*a1*a2**2*px*4.0-C1*a1*a3**2*px*4.0-C1*S1*px**3*py*4.0+C1*a1*d1**2*px*4.0+C1*a1*px*py**2*1.2e1+C1*a1*px*pz**2*4.0+S1*a1*a2**2*py*4.0-S1*a1*a3**2*py*4.0+S1*a1*d1**2*py*4.0+S1*a1*px**2*py*4.0+S1*a1*py*pz**2*4.0-C1*S1**3*px*py**3*4.0+C1*S1**3*px**3*py*4.0-C1**3*a1*px*py**2*1.2e1-S1**3*a1*a2**2*py*8.0+C1**2*d1*px**2*pz*4.0-C1**2*d1*py**2*pz*4.0-S1**3*a1*px**2*py*4.0-C1*a1*d1*px*pz*8.0-S1*a1*d1*py*pz*8.0-C1*S1*a1**2*px*py*1.2e1-C1*S1*a2**2*px*py*4.0+C1*S1*a3**2*px*py*4.0-C1*S1*d1**2*px*py*4.0-C1*S1*px*py*pz**2*4.0-C1**2*S1*a1*a2**2*py*8.0+C1**2*S1*a1*px**2*py*8.0+C1*S1**3*a2**2*px*py*8.0+C1**3*S1*a2**2*px*py*8.0+C1*S1*d1*px*py*pz*8.0)-a1**2*1j-a2**2*1j+a3**2*1j-d1**2*1j-py**2*1j-pz**2*1j-C1**2*px**2*1j+C1**2*py**2*1j+C1*a1*px*2.0j+S1*a1*py*2.0j-C1*S1*px*py*2.0j)-np.angle(-a2*(a1*-1j+d1-pz+C1*px*1j+S1**3*py*1j+C1**2*S1*py*1j))  # noqa
-                    else:
-                        theta[1] = np.angle(d1*pz*2.0j+np.sqrt(0j+d1*pz**3*4.0+d1**3*pz*4.0-a1**4-a2**4-a3**4-d1**4-py**4-pz**4-C1**4*px**4+C1**2*py**4*2.0-C1**4*py**4+a1**2*a2**2*2.0+a1**2*a3**2*2.0+a2**2*a3**2*2.0-a1**2*d1**2*2.0+a2**2*d1**2*2.0+a3**2*d1**2*2.0-a1**2*py**2*6.0-a2**2*py**2*2.0+a3**2*py**2*2.0-a1**2*pz**2*2.0+a2**2*pz**2*2.0+a3**2*pz**2*2.0-d1**2*py**2*2.0-d1**2*pz**2*6.0-py**2*pz**2*2.0+d1*py**2*pz*4.0+C1**3*a1*px**3*4.0+S1**3*a1*py**3*4.0-C1**2*a1**2*px**2*6.0+C1**2*a2**2*px**2*2.0+C1**2*a3**2*px**2*2.0+C1**2*a1**2*py**2*6.0+C1**2*a2**2*py**2*1.0e1-C1**2*a3**2*py**2*2.0-C1**4*a2**2*py**2*1.2e1+C1**6*a2**2*py**2*4.0-C1**2*d1**2*px**2*2.0+C1**2*d1**2*py**2*2.0-C1**2*px**2*py**2*6.0+C1**4*px**2*py**2*6.0-C1**2*px**2*pz**2*2.0+C1**2*py**2*pz**2*2.0+S1**6*a2**2*py**2*4.0+C1*a1**3*px*4.0+S1*a1**3*py*4.0+a1**2*d1*pz*4.0-a2**2*d1*pz*4.0-a3**2*d1*pz*4.0-C1*a1*a2**2*px*4.0-C1*a1*a3**2*px*4.0-C1*S1*px**3*py*4.0+C1*a1*d1**2*px*4.0+C1*a1*px*py**2*1.2e1+C1*a1*px*pz**2*4.0+S1*a1*a2**2*py*4.0-S1*a1*a3**2*py*4.0+S1*a1*d1**2*py*4.0+S1*a1*px**2*py*4.0+S1*a1*py*pz**2*4.0-C1*S1**3*px*py**3*4.0+C1*S1**3*px**3*py*4.0-C1**3*a1*px*py**2*1.2e1-S1**3*a1*a2**2*py*8.0+C1**2*d1*px**2*pz*4.0-C1**2*d1*py**2*pz*4.0-S1**3*a1*px**2*py*4.0-C1*a1*d1*px*pz*8.0-S1*a1*d1*py*pz*8.0-C1*S1*a1**2*px*py*1.2e1-C1*S1*a2**2*px*py*4.0+C1*S1*a3**2*px*py*4.0-C1*S1*d1**2*px*py*4.0-C1*S1*px*py*pz**2*4.0-C1**2*S1*a1*a2**2*py*8.0+C1**2*S1*a1*px**2*py*8.0+C1*S1**3*a2**2*px*py*8.0+C1**3*S1*a2**2*px*py*8.0+C1*S1*d1*px*py*pz*8.0)-a1**2*1j-a2**2*1j+a3**2*1j-d1**2*1j-py**2*1j-pz**2*1j-C1**2*px**2*1j+C1**2*py**2*1j+C1*a1*px*2.0j+S1*a1*py*2.0j-C1*S1*px*py*2.0j)-np.angle(-a2*(a1*-1j+d1-pz+C1*px*1j+S1**3*py*1j+C1**2*S1*py*1j))  # noqa
+            V114 = Px * np.cos(theta[0]) + Py * np.sin(theta[0])
 
-                    S2 = np.sin(theta[1])
-                    C2 = np.cos(theta[1])
+            r = np.sqrt(V114**2 + Pz**2)
 
-                    if sol[2] == 1:
-                        theta[2] = np.angle(a3*1j-np.sqrt(0j+d1*pz*-2.0+a1**2+a2**2-a3**2+d1**2+py**2+pz**2+C1**2*px**2-C1**2*py**2+C2*a1*a2*2.0-C1*a1*px*2.0-S2*a2*d1*2.0-S1*a1*py*2.0+S2*a2*pz*2.0-C1*C2*a2*px*2.0-C2*S1*a2*py*2.0+C1*S1*px*py*2.0+0j))-np.angle(a2*-1j-C2*a1*1j+C2*d1-C2*pz+S2*a1+S2*d1*1j-S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)  # noqa
-                    else:
-                        theta[2] = -np.angle(a2*-1j-C2*a1*1j+C2*d1-C2*pz+S2*a1+S2*d1*1j-S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j+np.sqrt(0j+d1*pz*-2.0+a1**2+a2**2-a3**2+d1**2+py**2+pz**2+C1**2*px**2-C1**2*py**2+C2*a1*a2*2.0-C1*a1*px*2.0-S2*a2*d1*2.0-S1*a1*py*2.0+S2*a2*pz*2.0-C1*C2*a2*px*2.0-C2*S1*a2*py*2.0+C1*S1*px*py*2.0))  # noqa
+            Psi = np.arccos(
+                (a2**2 - d4**2 - a3**2 + V114**2 + Pz**2)
+                / (2.0 * a2 * r))
 
-                else:
-                    if sol[0] == 1:
-                        theta[0] = -np.angle(px-py*1j)+np.angle(d2*1j+d3*1j-np.sqrt(0j+d2*d3*-2.0-d2**2-d3**2+px**2+py**2))  # noqa
-                    else:
-                        theta[0] = -np.angle(px-py*1j)+np.angle(d2*1j+d3*1j+np.sqrt(0j+d2*d3*-2.0-d2**2-d3**2+px**2+py**2))  # noqa
+            # Psi is NaN if the point is not reachable
+            theta[1] = np.arctan2(Pz, V114) + n2 * Psi
 
-                    S1 = np.sin(theta[0])
-                    C1 = np.cos(theta[0])
+            # Solve for theta[2]
+            # theta[2] uses equation 57, p. 40.
+            num = np.cos(theta[1]) * V114 + np.sin(theta[1]) * Pz - a2
+            den = np.cos(theta[1]) * Pz - np.sin(theta[1]) * V114
+            theta[2] = np.arctan2(a3, d4) - np.arctan2(num, den)
 
-                    if sol[1] == 1:
-                        theta[1] = np.angle(d1*pz*2.0j-np.sqrt(0j+d1*pz**3*4.0+d1**3*pz*4.0-a1**4-a2**4-a3**4-d1**4-py**4-pz**4-C1**4*px**4+C1**2*py**4*2.0-C1**4*py**4+a1**2*a2**2*2.0+a1**2*a3**2*2.0+a2**2*a3**2*2.0-a1**2*d1**2*2.0+a2**2*d1**2*2.0+a3**2*d1**2*2.0-a1**2*py**2*6.0-a2**2*py**2*2.0+a3**2*py**2*2.0-a1**2*pz**2*2.0+a2**2*pz**2*2.0+a3**2*pz**2*2.0-d1**2*py**2*2.0-d1**2*pz**2*6.0-py**2*pz**2*2.0+d1*py**2*pz*4.0+C1**3*a1*px**3*4.0+S1**3*a1*py**3*4.0-C1**2*a1**2*px**2*6.0+C1**2*a2**2*px**2*2.0+C1**2*a3**2*px**2*2.0+C1**2*a1**2*py**2*6.0+C1**2*a2**2*py**2*1.0e1-C1**2*a3**2*py**2*2.0-C1**4*a2**2*py**2*1.2e1+C1**6*a2**2*py**2*4.0-C1**2*d1**2*px**2*2.0+C1**2*d1**2*py**2*2.0-C1**2*px**2*py**2*6.0+C1**4*px**2*py**2*6.0-C1**2*px**2*pz**2*2.0+C1**2*py**2*pz**2*2.0+S1**6*a2**2*py**2*4.0+C1*a1**3*px*4.0+S1*a1**3*py*4.0+a1**2*d1*pz*4.0-a2**2*d1*pz*4.0-a3**2*d1*pz*4.0-C1*a1*a2**2*px*4.0-C1*a1*a3**2*px*4.0-C1*S1*px**3*py*4.0+C1*a1*d1**2*px*4.0+C1*a1*px*py**2*1.2e1+C1*a1*px*pz**2*4.0+S1*a1*a2**2*py*4.0-S1*a1*a3**2*py*4.0+S1*a1*d1**2*py*4.0+S1*a1*px**2*py*4.0+S1*a1*py*pz**2*4.0-C1*S1**3*px*py**3*4.0+C1*S1**3*px**3*py*4.0-C1**3*a1*px*py**2*1.2e1-S1**3*a1*a2**2*py*8.0+C1**2*d1*px**2*pz*4.0-C1**2*d1*py**2*pz*4.0-S1**3*a1*px**2*py*4.0-C1*a1*d1*px*pz*8.0-S1*a1*d1*py*pz*8.0-C1*S1*a1**2*px*py*1.2e1-C1*S1*a2**2*px*py*4.0+C1*S1*a3**2*px*py*4.0-C1*S1*d1**2*px*py*4.0-C1*S1*px*py*pz**2*4.0-C1**2*S1*a1*a2**2*py*8.0+C1**2*S1*a1*px**2*py*8.0+C1*S1**3*a2**2*px*py*8.0+C1**3*S1*a2**2*px*py*8.0+C1*S1*d1*px*py*pz*8.0)-a1**2*1j-a2**2*1j+a3**2*1j-d1**2*1j-py**2*1j-pz**2*1j-C1**2*px**2*1j+C1**2*py**2*1j+C1*a1*px*2.0j+S1*a1*py*2.0j-C1*S1*px*py*2.0j)-np.angle(-a2*(a1*-1j-d1+pz+C1*px*1j+S1**3*py*1j+C1**2*S1*py*1j))  # noqa
-                    else:
-                        theta[1] = np.angle(d1*pz*2.0j+np.sqrt(0j+d1*pz**3*4.0+d1**3*pz*4.0-a1**4-a2**4-a3**4-d1**4-py**4-pz**4-C1**4*px**4+C1**2*py**4*2.0-C1**4*py**4+a1**2*a2**2*2.0+a1**2*a3**2*2.0+a2**2*a3**2*2.0-a1**2*d1**2*2.0+a2**2*d1**2*2.0+a3**2*d1**2*2.0-a1**2*py**2*6.0-a2**2*py**2*2.0+a3**2*py**2*2.0-a1**2*pz**2*2.0+a2**2*pz**2*2.0+a3**2*pz**2*2.0-d1**2*py**2*2.0-d1**2*pz**2*6.0-py**2*pz**2*2.0+d1*py**2*pz*4.0+C1**3*a1*px**3*4.0+S1**3*a1*py**3*4.0-C1**2*a1**2*px**2*6.0+C1**2*a2**2*px**2*2.0+C1**2*a3**2*px**2*2.0+C1**2*a1**2*py**2*6.0+C1**2*a2**2*py**2*1.0e1-C1**2*a3**2*py**2*2.0-C1**4*a2**2*py**2*1.2e1+C1**6*a2**2*py**2*4.0-C1**2*d1**2*px**2*2.0+C1**2*d1**2*py**2*2.0-C1**2*px**2*py**2*6.0+C1**4*px**2*py**2*6.0-C1**2*px**2*pz**2*2.0+C1**2*py**2*pz**2*2.0+S1**6*a2**2*py**2*4.0+C1*a1**3*px*4.0+S1*a1**3*py*4.0+a1**2*d1*pz*4.0-a2**2*d1*pz*4.0-a3**2*d1*pz*4.0-C1*a1*a2**2*px*4.0-C1*a1*a3**2*px*4.0-C1*S1*px**3*py*4.0+C1*a1*d1**2*px*4.0+C1*a1*px*py**2*1.2e1+C1*a1*px*pz**2*4.0+S1*a1*a2**2*py*4.0-S1*a1*a3**2*py*4.0+S1*a1*d1**2*py*4.0+S1*a1*px**2*py*4.0+S1*a1*py*pz**2*4.0-C1*S1**3*px*py**3*4.0+C1*S1**3*px**3*py*4.0-C1**3*a1*px*py**2*1.2e1-S1**3*a1*a2**2*py*8.0+C1**2*d1*px**2*pz*4.0-C1**2*d1*py**2*pz*4.0-S1**3*a1*px**2*py*4.0-C1*a1*d1*px*pz*8.0-S1*a1*d1*py*pz*8.0-C1*S1*a1**2*px*py*1.2e1-C1*S1*a2**2*px*py*4.0+C1*S1*a3**2*px*py*4.0-C1*S1*d1**2*px*py*4.0-C1*S1*px*py*pz**2*4.0-C1**2*S1*a1*a2**2*py*8.0+C1**2*S1*a1*px**2*py*8.0+C1*S1**3*a2**2*px*py*8.0+C1**3*S1*a2**2*px*py*8.0+C1*S1*d1*px*py*pz*8.0)-a1**2*1j-a2**2*1j+a3**2*1j-d1**2*1j-py**2*1j-pz**2*1j-C1**2*px**2*1j+C1**2*py**2*1j+C1*a1*px*2.0j+S1*a1*py*2.0j-C1*S1*px*py*2.0j)-np.angle(-a2*(a1*-1j+d1-pz+C1*px*1j+S1**3*py*1j+C1**2*S1*py*1j))  # noqa
-                        print(theta[1])
+        elif kind == 'nooffset':
+            a2 = self.links[1].a
+            a3 = self.links[2].a
+            d1 = self.links[0].d
 
-                    S2 = np.sin(theta[1])
-                    C2 = np.cos(theta[1])
+            px = P[:, 0]
+            py = P[:, 1]
+            pz = P[:, 2]
 
-                    if sol[2] == 1:
-                        theta[2] = np.angle(a3*1j-np.sqrt(0j+d1*pz*-2.0+a1**2+a2**2-a3**2+d1**2+py**2+pz**2+C1**2*px**2-C1**2*py**2+C2*a1*a2*2.0-C1*a1*px*2.0+S2*a2*d1*2.0-S1*a1*py*2.0-S2*a2*pz*2.0-C1*C2*a2*px*2.0-C2*S1*a2*py*2.0+C1*S1*px*py*2.0))-np.angle(a2*-1j-C2*a1*1j-C2*d1+C2*pz+S2*a1-S2*d1*1j+S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)  # noqa
-                    else:
-                        theta[2] = -np.angle(a2*-1j-C2*a1*1j-C2*d1+C2*pz+S2*a1-S2*d1*1j+S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j+np.sqrt(0j+d1*pz*-2.0+a1**2+a2**2-a3**2+d1**2+py**2+pz**2+C1**2*px**2-C1**2*py**2+C2*a1*a2*2.0-C1*a1*px*2.0+S2*a2*d1*2.0-S1*a1*py*2.0-S2*a2*pz*2.0-C1*C2*a2*px*2.0-C2*S1*a2*py*2.0+C1*S1*px*py*2.0))  # noqa
-
-            elif self.ikineType == 'rrp':
-                # RRP (Stanford arm like)
-                px = Ti[0, 3]
-                py = Ti[1, 3]
-                pz = Ti[2, 3]
-                d1 = self.links[0].d
-                d2 = self.links[1].d
-
-                # Autogenerated code
-                if self.links[0].alpha < 0:
-                    if sol[0] == 1:
-                        theta[0] = -np.angle(-px+py*1j)+np.angle(d2*1j-np.sqrt(0j+-d2**2+px**2+py**2))  # noqa
-                    else:
-                        theta[0] = np.angle(d2*1j+np.sqrt(0j+-d2**2+px**2+py**2))-np.angle(-px+py*1j)  # noqa
+            # Autogenerated code
+            if self.links[0].alpha < 0:
+                if sol[0] == 1:
+                    temp = -px - py * 1j
+                    temp[np.abs(temp) == 0] = 0
+                    theta[0] = np.angle(temp)
+                else:
+                    theta[0] = np.angle(px + py * 1j)
 
-                    S1 = np.sin(theta[0])
-                    C1 = np.cos(theta[0])
+                S1 = np.sin(theta[0])
+                C1 = np.cos(theta[0])
 
-                    if sol[1] == 1:
-                        theta[1] = np.angle(d1-pz-C1*px*1j-S1*py*1j)  # noqa
-                    else:
-                        theta[1] = np.angle(-d1+pz+C1*px*1j+S1*py*1j)  # noqa
+                if sol[1] == 1:
+                    theta[1] = -np.angle(a2*d1*-2.0+a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j-np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
+                else:
+                    theta[1] = -np.angle(a2*d1*-2.0+a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j+np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
 
-                    S2 = np.sin(theta[1])
-                    C2 = np.cos(theta[1])
+                S2 = np.sin(theta[1])
+                C2 = np.cos(theta[1])
 
-                    theta[2] = -C2*d1+C2*pz+C1*S2*px+S1*S2*py  # noqa
+                if sol[2] == 1:
+                    theta[2] = -np.angle(a2*-1j+C2*d1-C2*pz+S2*d1*1j-S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j-np.sqrt(0j+(-a2+S2*d1-S2*pz+C1*C2*px+C2*S1*py)**2+(-C2*d1+C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
+                else:
+                    theta[2] = -np.angle(a2*-1j+C2*d1-C2*pz+S2*d1*1j-S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j+np.sqrt(0j+(-a2+S2*d1-S2*pz+C1*C2*px+C2*S1*py)**2+(-C2*d1+C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
 
+            else:
+                if sol[0] == 1:
+                    theta[0] = np.angle(px + py * 1j)
                 else:
-                    if sol[0] == 1:
-                        theta[0] = -np.angle(px-py*1j)+np.angle(d2*1j-np.sqrt(0j+-d2**2+px**2+py**2))  # noqa
-                    else:
-                        theta[0] = -np.angle(px-py*1j)+np.angle(d2*1j+np.sqrt(0j+-d2**2+px**2+py**2))  # noqa
+                    temp = -px - py * 1j
+                    temp[np.abs(temp) == 0] = 0
+                    theta[0] = np.angle(temp)
 
-                    S1 = np.sin(theta[0])
-                    C1 = np.cos(theta[0])
+                S1 = np.sin(theta[0])
+                C1 = np.cos(theta[0])
 
-                    if sol[1] == 1:
-                        theta[1] = np.angle(-d1+pz-C1*px*1j-S1*py*1j)  # noqa
-                    else:
-                        theta[1] = np.angle(d1-pz+C1*px*1j+S1*py*1j)  # noqa
+                if sol[1] == 1:
+                    theta[1] = -np.angle(a2*d1*2.0-a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j-np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
+                else:
+                    theta[1] = -np.angle(a2*d1*2.0-a2*pz*2.0-C1*a2*px*2.0j-S1*a2*py*2.0j)+np.angle(d1*pz*2.0j-a2**2*1j+a3**2*1j-d1**2*1j-pz**2*1j-C1**2*px**2*1j+np.sqrt(0j+(a2*d1*2.0-a2*pz*2.0)**2+(C1*a2*px*2.0+S1*a2*py*2.0)**2-(d1*pz*-2.0+a2**2-a3**2+d1**2+pz**2+C1**2*px**2+S1**2*py**2+C1*S1*px*py*2.0)**2)-S1**2*py**2*1j-C1*S1*px*py*2.0j)  # noqa
 
-                    print(theta[1])
+                S2 = np.sin(theta[1])
+                C2 = np.cos(theta[1])
 
-                    S2 = np.sin(theta[1])
-                    C2 = np.cos(theta[1])
+                if sol[2] == 1:
+                    theta[2] = -np.angle(a2*-1j-C2*d1+C2*pz-S2*d1*1j+S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j-np.sqrt(0j+(-a2-S2*d1+S2*pz+C1*C2*px+C2*S1*py)**2+(C2*d1-C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
+                else:
+                    theta[2] = -np.angle(a2*-1j-C2*d1+C2*pz-S2*d1*1j+S2*pz*1j+C1*C2*px*1j-C1*S2*px+C2*S1*py*1j-S1*S2*py)+np.angle(a3*1j+np.sqrt(0j+(-a2-S2*d1+S2*pz+C1*C2*px+C2*S1*py)**2+(C2*d1-C2*pz+C1*S2*px+S1*S2*py)**2-a3**2))  # noqa
 
-                    theta[2] = -C2*d1+C2*pz-C1*S2*px-S1*S2*py  # noqa
+        elif kind == 'offset':
+            # General case with the shoulder offsets a1, d2, d3 and the
+            # elbow offset a3, solved geometrically for the wrist centre
+            a1 = self.links[0].a
+            a2 = self.links[1].a
+            a3 = self.links[2].a
+            d1 = self.links[0].d
+            d2 = self.links[1].d
+            d3 = self.links[2].d
+            d4 = self.links[3].d
+            s1 = np.sin(self.links[0].alpha)
+            s3 = np.sin(self.links[2].alpha)
+
+            px = P[:, 0]
+            py = P[:, 1]
+            pz = P[:, 2]
 
-            if not np.all(np.isnan(theta)):
-                # Solve for the wrist rotation
-                # We need to account for some random translations between the
-                # first and last 3 joints (d4) and also d6,a6,alpha6 in the
-                # final frame.
+            # Solve for theta[0]
+            # in the frame rotated by theta[0] the wrist centre is at
+            # (u, D) in the xy-plane, D is fixed by the shoulder offsets
+            D = -s1 * (d2 + d3)
+            u = np.sqrt(px**2 + py**2 - D**2)
+            if sol[0] == 2:
+                u = -u
+            theta[0] = np.arctan2(py, px) - np.arctan2(D, u)
+
+            # Solve for theta[1] and theta[2]
+            # the upper arm and forearm are a planar 2-link arm in the
+            # frame of link 1, the forearm has length L3 at the angle phi
+            x = u - a1
+            y = s1 * (pz - d1)
+            L3 = np.sqrt(a3**2 + d4**2)
+            phi = np.arctan2(-s3 * d4, a3)
+
+            # beta is NaN if the point is not reachable
+            beta = np.arccos(
+                (x**2 + y**2 - a2**2 - L3**2) / (2.0 * a2 * L3))
+            if (sol[1] == 1) == (s1 > 0):
+                beta = -beta
+
+            theta[1] = np.arctan2(y, x) - np.arctan2(
+                L3 * np.sin(beta), a2 + L3 * np.cos(beta))
+            theta[2] = beta - phi
+
+        elif kind == 'rrp':
+            # RRP (Stanford arm like)
+            px = P[:, 0]
+            py = P[:, 1]
+            pz = P[:, 2]
+            d1 = self.links[0].d
+            d2 = self.links[1].d
+
+            # Autogenerated code
+            if self.links[0].alpha < 0:
+                if sol[0] == 1:
+                    theta[0] = -np.angle(-px+py*1j)+np.angle(d2*1j-np.sqrt(0j+-d2**2+px**2+py**2))  # noqa
+                else:
+                    theta[0] = np.angle(d2*1j+np.sqrt(0j+-d2**2+px**2+py**2))-np.angle(-px+py*1j)  # noqa
 
-                # Transform of first 3 joints
-                T13 = self.A([0, 2], theta)
+                S1 = np.sin(theta[0])
+                C1 = np.cos(theta[0])
 
-                # T = T13 * Tz(d4) * R * Tz(d6) Tx(a5)
-                Td4 = SE3(0, 0, self.links[3].d)      # Tz(d4)
+                if sol[1] == 1:
+                    theta[1] = np.angle(d1-pz-C1*px*1j-S1*py*1j)  # noqa
+                else:
+                    theta[1] = np.angle(-d1+pz+C1*px*1j+S1*py*1j)  # noqa
 
-                # Tz(d6) Tx(a5) Rx(alpha6)
-                Tt = SE3(self.links[5].a, 0, self.links[5].d) * \
-                    SE3.Rx(self.links[5].alpha)
+                S2 = np.sin(theta[1])
+                C2 = np.cos(theta[1])
 
-                R = np.linalg.inv(Td4.A) @ np.linalg.inv(T13.A) @ Ti @ \
-                    np.linalg.inv(Tt.A)
+                theta[2] = -C2*d1+C2*pz+C1*S2*px+S1*S2*py  # noqa
 
-                # The spherical wrist implements Euler angles
-                if sol[2] == 1:
-                    theta[3:6] = tr2eul(R, flip=True)
+            else:
+                if sol[0] == 1:
+                    theta[0] = -np.angle(px-py*1j)+np.angle(d2*1j-np.sqrt(0j+-d2**2+px**2+py**2))  # noqa
                 else:
-                    theta[3:6] = tr2eul(R)
+                    theta[0] = -np.angle(px-py*1j)+np.angle(d2*1j+np.sqrt(0j+-d2**2+px**2+py**2))  # noqa
 
-                if self.links[3].alpha > 0:
-                    theta[4] = -theta[4]
+                S1 = np.sin(theta[0])
+                C1 = np.cos(theta[0])
 
-                # Remove the link offset angles
-                for k in range(self.n):
-                    theta[k] -= self.links[k].offset
+                if sol[1] == 1:
+                    theta[1] = np.angle(-d1+pz-C1*px*1j-S1*py*1j)  # noqa
+                else:
+                    theta[1] = np.angle(d1-pz+C1*px*1j+S1*py*1j)  # noqa
 
-                q[j, :] = theta
-            else:
-                err.append('point not reachable')
+                S2 = np.sin(theta[1])
+                C2 = np.cos(theta[1])
 
-        if trajn == 1:
-            return q[0, :], err
-        else:
-            return q, err
+                theta[2] = -C2*d1+C2*pz-C1*S2*px-S1*S2*py  # noqa
+
+        return np.stack(np.broadcast_arrays(*theta), axis=1)
 
     def _is_simple(self):
         L = self.links
@@ -1888,6 +2770,8 @@ class DHRobot(Robot, Dynamics):
             - Joint offsets, if defined, are added to the inverse kinematics
               to generate q.
             - Joint limits become explicit contraints if 'qlimits' is set.
+            - The gradient of the error function is computed from the
+              manipulator Jacobian.
 
         """
 
@@ -1906,44 +2790,58 @@ class DHRobot(Robot, Dynamics):
         err = []
         col = 2
 
-        # Define the cost function to minimise
+        # Define the cost function to minimise and its gradient, which is
+        # found from the gradient g with respect to a motion of the
+        # end-effector in its own frame, J' g
         def cost(q, T, pweight, col, stiffness):
-            Tq = self.fkine(q)
+            Tq, J = self._ikfkine(q)
+            R = Tq[:3, :3]
+            g = np.zeros(6)
 
             # find the pose error in SE(3)
-            dT = T.t - Tq.t
+            dT = T[:3, 3] - Tq[:3, 3]
 
             # translation error
-            E = np.linalg.norm(dT) * pweight
+            nT = np.linalg.norm(dT)
+            E = nT * pweight
+            if nT > 0:
+                g[:3] = -pweight / nT * (R.T @ dT)
 
             # Rotation error
             # Find dot product of
-            dd = np.dot(T.A[0:3, col], Tq.A[0:3, col])
-            E += np.arccos(dd)**2 * 1000
+            dd = np.clip(np.dot(T[0:3, col], R[0:3, col]), -1, 1)
+            theta = np.arccos(dd)
+            E += theta**2 * 1000
+            g[3:] = -2000 / np.sinc(theta / np.pi) * np.cross(
+                np.eye(3)[col], R.T @ T[0:3, col])
+
+            g = J.T @ g
 
             if stiffness > 0:
                 # Enforce a continuity constraint on joints, minimum bend
-                E += np.sum(np.diff(q)**2) * stiffness
+                dq = np.diff(q)
+                E += np.sum(dq**2) * stiffness
+                g[:-1] -= 2 * stiffness * dq
+                g[1:] += 2 * stiffness * dq
 
-            return E
+            return E, g
 
         for i in range(trajn):
 
-            Ti = T[i]
+            Ti = T[i].A
 
             if qlimits:
                 bnds = Bounds(self.qlim[0, :], self.qlim[1, :])
 
                 res = minimize(
-                    lambda q: cost(q, Ti, pweight, col, stiffness),
-                    q0[i, :], bounds=bnds,
+                    cost, q0[i, :], args=(Ti, pweight, col, stiffness),
+                    jac=True, bounds=bnds,
                     options={'gtol': 1e-6, 'maxiter': ilimit})
             else:
                 # No joint limits, unconstrained optimization
                 res = minimize(
-                    lambda q: cost(q, Ti, pweight, col, stiffness),
-                    q0[i, :],
-                    options={'gtol': 1e-6, 'maxiter': ilimit})
+                    cost, q0[i, :], args=(Ti, pweight, col, stiffness),
+                    jac=True, options={'gtol': 1e-6, 'maxiter': ilimit})
 
             if res.success and i < trajn - 1:
                 q0[i + 1, :] = res.x
@@ -2001,6 +2899,8 @@ class DHRobot(Robot, Dynamics):
             - The objective function (error) is described as:
               sumsqr( (inv(T)*robot.fkine(q) - eye(4)) * omega )
               Where omega is some gain matrix, currently not modifiable.
+            - The gradient of the objective function is computed from the
+              manipulator Jacobian, see ``_ikcost``.
 
         """
 
@@ -2021,18 +2921,12 @@ class DHRobot(Robot, Dynamics):
         reach = np.sum(np.abs([self.a, self.d]))
         omega = np.diag([1, 1, 1, 3 / reach])
 
-        def sumsqr(arr):
-            return np.sum(np.power(arr, 2))
-
         for i in range(trajn):
 
-            Ti = T[i]
+            Tinv = np.linalg.inv(T[i].A)
 
             res = minimize(
-                lambda q: sumsqr(((
-                    np.linalg.inv(Ti.A) @ self.fkine(q).A) - np.eye(4)) @
-                    omega),
-                q0[i, :],
+                self._ikcost, q0[i, :], args=(Tinv, omega), jac=True,
                 options={'gtol': 1e-6, 'maxiter': ilimit})
 
             qt[i, :] = res.x
@@ -2045,7 +2939,9 @@ class DHRobot(Robot, Dynamics):
             return qt, success, err
 
     @_check_rne
-    def rne(self, q, qd=None, qdd=None, grav=None, fext=None):
+    def rne(
+            self, q, qd=None, qdd=None, grav=None, fext=None, out=None,
+            threads=None):
         r"""
         Inverse dynamics
 
@@ -2061,6 +2957,11 @@ class DHRobot(Robot, Dynamics):
         :param fext: Specify wrench acting on the end-effector
              :math:`W=[F_x F_y F_z M_x M_y M_z]`
         :type fext: float ndarray(6)
+        :param out: Array to write the joint torques to
+        :type out: float ndarray(n) or (m,n)
+        :param threads: Number of threads used for a trajectory, 0 for one
+            per CPU, defaults to the ``threads`` attribute
+        :type threads: int, optional
 
         ``tau = rne(q, qd, qdd, grav, fext)`` is the joint torque required for
         the robot to achieve the specified joint position ``q`` (1xn), velocity
@@ -2075,6 +2976,16 @@ class DHRobot(Robot, Dynamics):
         :notes:
             - The torque computed contains a contribution due to armature
               inertia and joint friction.
+            - The trajectory is split into blocks of rows, one per thread,
+              and each block is computed by a single call to the C extension
+              which releases the GIL while it runs. The result does not
+              depend on the number of threads.
+            - Joint flips are applied as for the compiled chain, so the
+              result is consistent with ``inertia``, ``gravload`` and
+              ``coriolis``.
+            - Link parameters may be changed while other threads are in
+              ``rne``, the C robot object is updated once those calls have
+              finished. A change of a link convention builds a new object.
             - If a model has no dynamic parameters set the result is zero.
 
         """
@@ -2104,17 +3015,279 @@ class DHRobot(Robot, Dynamics):
         else:
             fext = getvector(fext, 6)
 
-        tau = np.zeros((trajn, self.n))
+        if out is None:
+            tau = np.zeros((trajn, self.n))
+        else:
+            tau = self._outview(out, (trajn, self.n))
+
+        # each block of the trajectory is evaluated in one call, the torques
+        # are written straight into tau unless it is not a contiguous float
+        # array
+        if tau.dtype == np.float64 and tau.flags.c_contiguous:
+            taub = tau
+        else:
+            taub = np.empty((trajn, self.n))
 
-        for i in range(trajn):
-            tau[i, :] = frne(
-                self._rne_ob, q[i, :], qd[i, :], qdd[i, :], grav, fext)
+        # the C function works in the unflipped joint coordinates
+        sign = self.chain.sign
 
-        if trajn == 1:
+        q = np.ascontiguousarray(q * sign, dtype=np.float64)
+        qd = np.ascontiguousarray(qd * sign, dtype=np.float64)
+        qdd = np.ascontiguousarray(qdd * sign, dtype=np.float64)
+        grav = np.ascontiguousarray(grav, dtype=np.float64)
+        fext = np.ascontiguousarray(fext, dtype=np.float64)
+
+        def block(rows):
+            frne_batch(
+                self._rne_ob, q[rows], qd[rows], qdd[rows], grav, fext,
+                taub[rows])
+
+        self._parallel(block, trajn, threads)
+
+        taub *= sign
+
+        if taub is not tau:
+            tau[:] = taub
+
+        if out is not None:
+            return out
+        elif trajn == 1:
             return tau[0, :]
         else:
             return tau
 
+    @_check_rne
+    def _aba(self, q, qd, torque):
+        """
+        Forward dynamics by the articulated body algorithm
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(m,n)
+        :param qd: The joint velocities of the robot
+        :type qd: float ndarray(m,n)
+        :param torque: The joint torques of the robot
+        :type torque: float ndarray(m,n)
+        :return: The joint accelerations
+        :rtype: float ndarray(m,n)
+
+        Called by ``accel``, the accelerations for all rows are computed by
+        one call to the C extension which releases the GIL while it runs.
+        Joint friction and motor inertia are included as for ``rne``.
+        """
+
+        # the C function works in the unflipped joint coordinates
+        sign = self.chain.sign
+
+        qdd = np.empty(q.shape)
+        fdyn_batch(
+            self._rne_ob,
+            np.ascontiguousarray(q * sign, dtype=np.float64),
+            np.ascontiguousarray(qd * sign, dtype=np.float64),
+            np.ascontiguousarray(torque * sign, dtype=np.float64),
+            np.ascontiguousarray(self.base.R.T @ self.gravity),
+            qdd)
+
+        qdd *= sign
+        return qdd
+
+    def inertia(self, q=None, out=None, threads=None):
+        """
+        Manipulator inertia matrix
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values).
+        :type q: float ndarray(n) or (k,n)
+        :param out: Array to write the inertia matrix to
+        :type out: float ndarray(n,n) or (k,n,n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
+
+        :return I: The inertia matrix
+        :rtype I: float ndarray(n,n) or (k,n,n)
+
+        ``inertia(q)`` is the symmetric joint inertia matrix (nxn) which
+        relates joint torque to joint acceleration for the robot at joint
+        configuration q. If q is a matrix (kxn) the result is (kxnxn).
+
+        :notes:
+            - For numeric models the matrix is computed by the Composite Rigid
+              Body Algorithm, for all configurations at once, see
+              ``DHChain.inertia``. Otherwise it is computed column by column
+              using ``rne``, see ``Dynamics.inertia``.
+            - The diagonal terms include the motor inertia reflected through
+              the gear ratio.
+
+        """
+        if q is None:
+            q = self.q
+
+        qa = np.asarray(q)
+        if not self._fastkine(qa) or self.chain._m is None:
+            return super().inertia(q, out=out, threads=threads)
+
+        trajn = 1
+        try:
+            qa = getvector(q, self.n, 'row')
+        except ValueError:
+            trajn = qa.shape[0]
+            verifymatrix(qa, (trajn, self.n))
+
+        if out is None:
+            In = np.empty((trajn, self.n, self.n))
+        else:
+            In = self._outview(out, (trajn, self.n, self.n))
+
+        chain = self.chain
+        code = self.code
+
+        def block(rows):
+            if code is None:
+                chain.inertia(qa[rows], out=In[rows])
+            else:
+                chain._blocks(code.inertia, qa[rows], In[rows])
+
+        self._parallel(block, trajn, threads)
+
+        if out is not None:
+            return out
+        elif trajn == 1:
+            return In[0, :, :]
+        else:
+            return In
+
+    def gravload(self, q=None, grav=None, out=None, threads=None):
+        """
+        Compute gravity load
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(n) or (k,n)
+        :param grav: The gravity vector (Optional, if not supplied will
+            use the stored gravity values).
+        :type grav: float ndarray(3) or (k,3)
+        :param out: Array to write the joint torques to
+        :type out: float ndarray(n) or (k,n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
+
+        :return taug: The generalised joint force/torques due to gravity
+        :rtype taug: float ndarray(n) or (k,n)
+
+        ``taug = gravload(q)`` calculates the joint gravity loading (n) for
+        the robot in the joint configuration ``q`` and using the default
+        gravitational acceleration specified in the robot object. If q is a
+        matrix (kxn) each row is a configuration and the result is (kxn),
+        ``grav`` may also have a row per configuration.
+
+        :notes:
+            - For numeric models the load is computed by a gravity-only
+              recursion, see ``DHChain.gravload``, which skips the velocity
+              and acceleration terms of ``rne``. Otherwise ``rne`` is used,
+              see ``Dynamics.gravload``.
+            - For repeated evaluation at control rates see ``gravtable``.
+
+        """
+        if q is None:
+            q = self.q
+
+        qa = np.asarray(q)
+        if not self._fastkine(qa) or self.chain._m is None:
+            return super().gravload(q, grav=grav, out=out, threads=threads)
+
+        trajn = 1
+        try:
+            qa = getvector(q, self.n, 'row')
+        except ValueError:
+            trajn = qa.shape[0]
+            verifymatrix(qa, (trajn, self.n))
+
+        if grav is None:
+            grav = self.gravity
+        grav = np.array(grav, dtype=np.float64)
+        if grav.size == 3:
+            grav = getvector(grav, 3, 'row')
+        verifymatrix(grav, (grav.shape[0], 3))
+
+        # gravity in the base frame, a row per configuration
+        grav = np.broadcast_to(grav @ self.base.R, (trajn, 3))
+
+        if out is None:
+            taug = np.empty((trajn, self.n))
+        else:
+            taug = self._outview(out, (trajn, self.n))
+
+        chain = self.chain
+        code = self.code
+
+        def block(rows):
+            if code is None:
+                chain.gravload(qa[rows], grav[rows], out=taug[rows])
+            else:
+                chain._blocks(
+                    code.gravload, qa[rows], taug[rows], grav[rows])
+
+        self._parallel(block, trajn, threads)
+
+        if out is not None:
+            return out
+        elif trajn == 1:
+            return taug[0, :]
+        else:
+            return taug
+
+    def coriolis(self, q, qd):
+        """
+        Coriolis and centripetal term
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(n) or (k,n)
+        :param qd: The joint velocities of the robot
+        :type qd: float ndarray(n) or (k,n)
+
+        :return C: The Coriolis matrix
+        :rtype C: float ndarray(n,n) or (k,n,n)
+
+        ``C = coriolis(q, qd)`` calculates the Coriolis/centripetal matrix
+        (nxn) for the robot in configuration q and velocity qd. The product
+        C*qd is the vector of joint force/torque due to velocity coupling.
+        If q and qd are matrices (kxn) the result is (kxnxn).
+
+        :notes:
+            - For numeric models the matrix is computed for all
+              configurations at once in a single sweep over the links, see
+              ``DHChain.coriolis``. Otherwise it is computed by n^2/2 calls
+              to ``rne``, see ``Dynamics.coriolis``.
+            - Joint friction is not included.
+
+        """
+        qa = np.asarray(q)
+        if not self._fastkine(qa) or self.chain._m is None:
+            return super().coriolis(q, qd)
+
+        trajn = 1
+        try:
+            qa = getvector(q, self.n, 'row')
+            qd = getvector(qd, self.n, 'row')
+        except ValueError:
+            trajn = qa.shape[0]
+            verifymatrix(qa, (trajn, self.n))
+            verifymatrix(qd, (trajn, self.n))
+
+        qd = np.asarray(qd, dtype=np.float64)
+        code = self.code
+
+        if code is None:
+            C = self.chain.coriolis(qa, qd)
+        else:
+            C = self.chain._blocks(
+                code.coriolis, qa, np.empty((trajn, self.n, self.n)), qd)
+
+        if trajn == 1:
+            return C[0, :, :]
+        else:
+            return C
+
     def jacob_dot(self, q=None, qd=None):
         '''
         Jqd = jacob_dot(q, qd) is the product (6) of the derivative of the
@@ -2924,6 +4097,39 @@ class DHRobot(Robot, Dynamics):
         #         ' Matplotlib required for this function')
 
 
+def _tr2eul(R, flip=False):
+    # tr2eul for a stack of rotation matrices (m,3,3)
+    eps = 10 * np.finfo(np.float64).eps
+    singular = (np.abs(R[:, 0, 2]) < eps) & (np.abs(R[:, 1, 2]) < eps)
+
+    if flip:
+        phi = np.arctan2(-R[:, 1, 2], -R[:, 0, 2])
+    else:
+        phi = np.arctan2(R[:, 1, 2], R[:, 0, 2])
+    phi[singular] = 0
+
+    sp = np.sin(phi)
+    cp = np.cos(phi)
+    theta = np.arctan2(cp * R[:, 0, 2] + sp * R[:, 1, 2], R[:, 2, 2])
+    psi = np.arctan2(
+        -sp * R[:, 0, 0] + cp * R[:, 1, 0], -sp * R[:, 0, 1] + cp * R[:, 1, 1])
+
+    return np.c_[phi, theta, psi]
+
+
+def _ikdelta(T0, T1):
+    # tr2delta(T0, T1) for stacks of homogeneous transforms (m,4,4)
+    R0 = T0[:, :3, :3]
+    R = np.swapaxes(R0, 1, 2) @ T1[:, :3, :3]
+    t = np.einsum('kji,kj->ki', R0, T1[:, :3, 3] - T0[:, :3, 3])
+
+    return np.c_[
+        t,
+        0.5 * (R[:, 2, 1] - R[:, 1, 2]),
+        0.5 * (R[:, 0, 2] - R[:, 2, 0]),
+        0.5 * (R[:, 1, 0] - R[:, 0, 1])]
+
+
 class SerialLink(DHRobot):
     def __init__(self, *args, **kwargs):
         print('SerialLink is deprecated, use DHRobot instead')
@@ -5,22 +5,32 @@ Requires access to:
 
     * ``links`` list of ``Link`` objects, atttribute
     * ``rne()`` the inverse dynamics method
+    * ``_aba()`` the articulated body forward dynamics method, optional
 
 so must be subclassed by ``SerialLink`` class.
 
 :todo: perhaps these should be abstract properties, methods of this calss
 """
 import copy
+import os
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from spatialmath.base import \
     getvector, verifymatrix, isscalar, getmatrix, t2r
 from scipy import integrate, interpolate
 from spatialmath.base import symbolic as sym
+from roboticstoolbox.robot.GravityTable import GravityTable
 
 
 class Dynamics:
 
+    #: number of threads used to evaluate a trajectory, 0 for one per CPU
+    threads = 1
+
+    #: minimum number of trajectory rows given to each thread
+    thread_rows = 256
+
     def printdyn(self):
         """
         Print dynamic parameters
@@ -34,7 +44,8 @@ class Dynamics:
 
     def fdyn(
             self, T, q0, torqfun=None, targs=None, qd0=None,
-            solver='RK45', sargs=None, dt=None, progress=False):
+            solver='RK45', sargs=None, dt=None, progress=False,
+            method='walker'):
         """
         Integrate forward dynamics
 
@@ -57,6 +68,8 @@ class Dynamics:
         :param dt: float
         :param progress: show progress bar, default False
         :type progress: bool
+        :param method: forward dynamics method used by ``accel``
+        :type method: str
 
         :return: robot trajectory
         :rtype: namedtuple
@@ -125,6 +138,9 @@ class Dynamics:
           friction to zero.
         - If the function is not specified then zero force/torque is
           applied to the manipulator joints.
+        - The accelerations are computed by ``accel``, ``method='aba'``
+          selects the articulated body algorithm which is faster for robots
+          with many joints.
         - Interpolation is performed using `ScipY integrate.ode
           <https://docs.scipy.org/doc/scipy/reference/generated/scipy.integrate.ode.html>`
           - The SciPy RK45 integrator is used by default
@@ -159,7 +175,7 @@ class Dynamics:
         scipy_integrator = integrate.__dict__[solver]
 
         integrator = scipy_integrator(
-            lambda t, y: self._fdyn(t, y, torqfun, targs),
+            lambda t, y: self._fdyn(t, y, torqfun, targs, method),
             t0=0.0, y0=x0, t_bound=T, **sargs
             )
 
@@ -207,7 +223,134 @@ class Dynamics:
             return namedtuple('fdyn', 't q qd')(
                 tarray, xarray[:, :n], xarray[:, n:])
 
-    def _fdyn(self, t, x, torqfun, targs):
+    def fdyn_ensemble(
+            self, T, q0, dt, torqfun=None, targs=None, qd0=None,
+            integrator='rk4', method='walker', out=None):
+        """
+        Integrate forward dynamics for an ensemble of initial states
+
+        :param T: integration time
+        :type T: float
+        :param q0: initial joint coordinates, one state per row
+        :type q0: array_like(K,n)
+        :param dt: integration time step
+        :type dt: float
+        :param torqfun: a function that computes torque as a function of time
+            and state for all states at once
+        :type torqfun: callable
+        :param targs: argumments passed to ``torqfun``
+        :type targs: dict
+        :param qd0: initial joint velocities, assumed zero if not given
+        :type qd0: array_like(K,n)
+        :param integrator: fixed step integrator, 'rk4' or 'euler'
+        :type integrator: str
+        :param method: forward dynamics method used by ``accel``
+        :type method: str
+        :param out: array to write the state trajectories to
+        :type out: float ndarray(K,N,2n)
+        :return: robot trajectories
+        :rtype: namedtuple
+
+        ``tg = R.fdyn_ensemble(T, q0, dt)`` integrates the dynamics of K
+        robots, with initial joint coordinates given by the rows of ``q0``,
+        in lock step over the time interval 0 to ``T`` and returns the
+        trajectories as a namedtuple with elements:
+
+            - ``t`` the time vector (N,)
+            - ``q`` the joint coordinates (K,N,n)
+            - ``qd`` the joint velocities (K,N,n)
+            - ``x`` the state [q, qd] (K,N,2n), ``q`` and ``qd`` are views
+              of this array
+
+        where N = round(T/dt) + 1.  The torque function is called once per
+        step, or four times for RK4, for all states::
+
+                tau = function(robot, t, q, qd, **args)
+
+        where ``q`` and ``qd`` are (K,n) and ``tau`` must be (K,n).
+
+        :notes:
+            - 'euler' is the semi-implicit (symplectic) Euler method, the
+              velocity is updated first and the new velocity is used to update
+              the joint coordinates.
+            - The states are written to ``out`` as they are computed, so it
+              can be a memory mapped array for very large ensembles.
+            - All members of the ensemble share the dynamic parameters of
+              this robot.
+
+        :seealso: :func:`fdyn`, :func:`accel`
+        """
+
+        n = self.n
+
+        if not isscalar(T):
+            raise ValueError('T must be a scalar')
+        if not isscalar(dt) or dt <= 0:
+            raise ValueError('dt must be a positive scalar')
+        if integrator not in ('rk4', 'euler'):
+            raise ValueError('unknown integrator')
+        q0 = getmatrix(q0, (None, n))
+        K = q0.shape[0]
+        if qd0 is None:
+            qd0 = np.zeros((K, n))
+        else:
+            qd0 = getmatrix(qd0, (K, n))
+        if torqfun is not None:
+            if not callable(torqfun):
+                raise ValueError('torque function must be callable')
+        if targs is None:
+            targs = {}
+
+        N = int(round(T / dt)) + 1
+        t = np.arange(N) * dt
+
+        if out is None:
+            x = np.empty((K, N, 2 * n))
+        else:
+            x = self._outview(out, (K, N, 2 * n))
+
+        def f(t, q, qd):
+            # joint accelerations of all the states
+            if torqfun is None:
+                tau = np.zeros((K, n))
+            else:
+                tau = torqfun(self, t, q, qd, **targs)
+                if np.shape(tau) != (K, n):
+                    raise RuntimeError(
+                        'torque function must return (K,n) array')
+            qdd = self.accel(q, qd, tau, method=method)
+            return np.reshape(qdd, (K, n))
+
+        q = q0.astype(np.float64)
+        qd = qd0.astype(np.float64)
+        x[:, 0, :n] = q
+        x[:, 0, n:] = qd
+
+        for i in range(1, N):
+            ti = t[i - 1]
+            if integrator == 'euler':
+                qd = qd + dt * f(ti, q, qd)
+                q = q + dt * qd
+            else:
+                a1 = f(ti, q, qd)
+                v2 = qd + 0.5 * dt * a1
+                a2 = f(ti + 0.5 * dt, q + 0.5 * dt * qd, v2)
+                v3 = qd + 0.5 * dt * a2
+                a3 = f(ti + 0.5 * dt, q + 0.5 * dt * v2, v3)
+                v4 = qd + dt * a3
+                a4 = f(ti + dt, q + dt * v3, v4)
+                q = q + dt / 6 * (qd + 2 * v2 + 2 * v3 + v4)
+                qd = qd + dt / 6 * (a1 + 2 * a2 + 2 * a3 + a4)
+
+            x[:, i, :n] = q
+            x[:, i, n:] = qd
+
+        if out is not None:
+            x = out
+        return namedtuple('fdyn', 't q qd x')(
+            t, x[..., :n], x[..., n:], x)
+
+    def _fdyn(self, t, x, torqfun, targs, method='walker'):
         """
         Private function called by fdyn
 
@@ -220,6 +363,8 @@ class Dynamics:
         :type torqfun: callable
         :param targs: argumments passed to ``torqfun``
         :type targs: dict
+        :param method: forward dynamics method passed to ``accel``
+        :type method: str
 
         :return: derivative of current state [qd, qdd]
         :rtype: numpy array (2n,)
@@ -241,11 +386,11 @@ class Dynamics:
                 raise RuntimeError(
                     'torque function must return vector with N real elements')
 
-        qdd = self.accel(q, qd, tau)
+        qdd = self.accel(q, qd, tau, method=method)
 
         return np.r_[qd, qdd]
 
-    def accel(self, q, qd, torque):
+    def accel(self, q, qd, torque, method='walker'):
         """
         Compute acceleration due to applied torque
 
@@ -255,6 +400,8 @@ class Dynamics:
         :type qd: float ndarray(n)
         :param torque: The joint torques of the robot
         :type torque: float ndarray(n)
+        :param method: forward dynamics method, 'walker' or 'aba'
+        :type method: str
 
         ``qdd = accel(q, qd, torque)`` calculates a vector (n) of joint
         accelerations that result from applying the actuator force/torque (n)
@@ -271,10 +418,12 @@ class Dynamics:
         :notes:
             - Useful for simulation of manipulator dynamics, in
               conjunction with a numerical integration function.
-            - Uses the method 1 of Walker and Orin to compute the forward
-              dynamics.
-            - Featherstone's method is more efficient for robots with large
-              numbers of joints.
+            - ``method='walker'`` uses the method 1 of Walker and Orin to
+              compute the forward dynamics, the inertia matrix is given by
+              ``inertia``.
+            - ``method='aba'`` uses Featherstone's articulated body algorithm
+              which is O(n) and more efficient for robots with large numbers
+              of joints.
             - Joint friction is considered.
 
         :references:
@@ -282,9 +431,14 @@ class Dynamics:
               M. W. Walker and D. E. Orin,
               ASME Journa of Dynamic Systems, Measurement and Control, vol.
               104, no. 3, pp. 205-211, 1982.
+            - Rigid Body Dynamics Algorithms, R. Featherstone,
+              Springer, 2008, chap 7.
 
         """
 
+        if method not in ('walker', 'aba'):
+            raise ValueError('unknown method')
+
         trajn = 1
 
         try:
@@ -297,30 +451,68 @@ class Dynamics:
             verifymatrix(qd, (trajn, self.n))
             verifymatrix(torque, (trajn, self.n))
 
-        qdd = np.zeros((trajn, self.n))
-
-        for i in range(trajn):
-            # Compute current manipulator inertia torques resulting from unit
-            # acceleration of each joint with no gravity.
-            qI = (np.c_[q[i, :]] @ np.ones((1, self.n))).T
-            qdI = np.zeros((self.n, self.n))
-            qddI = np.eye(self.n)
-
-            M = self.rne(qI, qdI, qddI, grav=[0, 0, 0])
-
-            # Compute gravity and coriolis torque torques resulting from zero
-            # acceleration at given velocity & with gravity acting.
-            tau = self.rne(q[i, :], qd[i, :], np.zeros((1, self.n)))
-
-            inter = np.expand_dims((torque[i, :] - tau), axis=1)
+        if method == 'aba':
+            qdd = self._aba(q, qd, torque)
+        else:
+            # Compute the manipulator inertia matrices, and the gravity and
+            # coriolis torques resulting from zero acceleration at the given
+            # velocity with gravity acting, for all configurations at once.
+            M = self.inertia(q).reshape((trajn, self.n, self.n))
+            tau = self.rne(q, qd, np.zeros((trajn, self.n)))
+            tau = np.reshape(tau, (trajn, self.n))
 
-            qdd[i, :] = np.linalg.solve(M, inter).flatten()
+            qdd = np.linalg.solve(M, (torque - tau)[..., np.newaxis])[..., 0]
 
         if trajn == 1:
             return qdd[0, :]
         else:
             return qdd
 
+    def _parallel(self, func, m, threads=None):
+        """
+        Evaluate a function over the rows of a trajectory on a thread pool
+
+        :param func: Function of a ``slice`` of trajectory rows which writes
+            its results for those rows
+        :type func: callable
+        :param m: Number of trajectory rows
+        :type m: int
+        :param threads: Number of threads, 0 for one per CPU, defaults to
+            the ``threads`` attribute
+        :type threads: int, optional
+
+        The rows are split into contiguous blocks, one per thread, of at
+        least ``thread_rows`` rows. Every row is computed independently of
+        the others so the result does not depend on the number of threads.
+        The work only runs concurrently if ``func`` releases the GIL, as the
+        C extension and large numpy operations do.
+        """
+        if threads is None:
+            threads = self.threads
+        if not isinstance(threads, (int, np.integer)) or threads < 0:
+            raise ValueError('threads must be a non-negative integer')
+        if threads == 0:
+            threads = os.cpu_count() or 1
+
+        nblocks = max(1, min(threads, m // max(self.thread_rows, 1)))
+        if nblocks == 1:
+            func(slice(0, m))
+            return
+
+        with ThreadPoolExecutor(max_workers=nblocks) as pool:
+            jobs = [
+                pool.submit(
+                    func, slice(k * m // nblocks, (k + 1) * m // nblocks))
+                for k in range(nblocks)]
+            for job in jobs:
+                job.result()
+
+    def _aba(self, q, qd, torque):
+        # articulated body forward dynamics, provided by subclasses with a
+        # native implementation
+        raise NotImplementedError(
+            'the aba method is not available for this robot class')
+
     def nofriction(self, coulomb=True, viscous=False):
         """
         NFrobot = nofriction(coulomb, viscous) copies the robot and returns
@@ -346,6 +538,11 @@ class Dynamics:
 
         # add the modified links (copies)
         nf._links = [link.nofriction(coulomb, viscous) for link in self.links]
+        for link in nf._links:
+            link._robot = nf
+
+        # the cached link data belongs to the original robot
+        nf.dynchanged()
 
         return nf
 
@@ -363,33 +560,34 @@ class Dynamics:
         end effector, W = [Fx Fy Fz Mx My Mz]'.
 
         Trajectory operation:
-          In the case q is nxm or J is 6xnxm then tau is nxm where each row
+          In the case q is mxn or J is mx6xn then tau is mxn where each row
           is the generalised force/torque at the pose given by corresponding
-          row of q.
+          row of q. W is either a single wrench, applied at every pose, or
+          mx6 with a wrench per pose.
 
         :param W: A wrench vector applied at the end effector,
             W = [Fx Fy Fz Mx My Mz]
-        :type W: float ndarray(6)
+        :type W: float ndarray(6) or (m,6)
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
-        :type q: float ndarray(n)
+        :type q: float ndarray(n) or (m,n)
         :param J: The manipulator Jacobian (Optional, if not supplied will
             use the q value).
-        :type J: float ndarray(6,n)
+        :type J: float ndarray(6,n) or (m,6,n)
         :param frame: The frame in which to torques are expressed in when J
             is not supplied. 0 means base frame of the robot, 1 means end-
             effector frame
         :type frame: int
 
         :return tau: The joint forces/torques due to w
-        :rtype tau: float ndarray(n)
+        :rtype tau: float ndarray(n) or (m,n)
 
         :notes:
             - Wrench vector and Jacobian must be from the same reference
               frame.
             - Tool transforms are taken into consideration when frame=1.
-            - Must have a constant wrench - no trajectory support for this
-              yet.
+            - For a trajectory the Jacobians are computed together, see
+              ``_jacob_batch``, and the torques by a single product.
 
         """
 
@@ -400,6 +598,12 @@ class Dynamics:
             trajn = W.shape[0]
             verifymatrix(W, (trajn, 6))
 
+        if trajn == 0 and J is None and isinstance(q, np.ndarray) \
+                and q.ndim == 2 and q.shape[0] > 1:
+            # a constant wrench over a trajectory
+            trajn = q.shape[0]
+            W = np.broadcast_to(W, (trajn, 6))
+
         if trajn:
             # A trajectory
             if J is not None:
@@ -408,12 +612,7 @@ class Dynamics:
             else:
                 # Use q instead
                 verifymatrix(q, (trajn, self.n))
-                J = np.zeros((trajn, 6, self.n))
-                for i in range(trajn):
-                    if frame:
-                        J[i, :, :] = self.jacobe(q[i, :])
-                    else:
-                        J[i, :, :] = self.jacob0(q[i, :])
+                J = self._jacob_batch(q, frame)
         else:
             # Single configuration
             if J is not None:
@@ -434,13 +633,25 @@ class Dynamics:
         if trajn == 0:
             tau = -J.T @ W
         else:
-            tau = np.zeros((trajn, self.n))
-
-            for i in range(trajn):
-                tau[i, :] = -J[i, :, :].T @ W[i, :]
+            tau = -np.einsum('mji,mj->mi', J, W)
 
         return tau
 
+    def _jacob_batch(self, q, frame):
+        # manipulator Jacobians (m,6,n) for the rows of q, in the end-effector
+        # frame if frame is true otherwise the base frame. Robots with
+        # vectorised Jacobians provide jacobe_batch and jacob0_batch.
+        batch = getattr(
+            self, 'jacobe_batch' if frame else 'jacob0_batch', None)
+        if batch is not None and not self.symbolic:
+            return batch(q)
+
+        jacob = self.jacobe if frame else self.jacob0
+        J = np.empty((q.shape[0], 6, self.n))
+        for i in range(q.shape[0]):
+            J[i, :, :] = jacob(q[i, :])
+        return J
+
     def payload(self, m, p=np.zeros(3)):
         """
         payload(m, p) adds payload mass adds a payload with point mass m at
@@ -584,19 +795,19 @@ class Dynamics:
             verifymatrix(q, (trajn, self.n))
 
         Mt = np.zeros((trajn, self.n, self.n))
+        M = self.inertia(q).reshape((trajn, self.n, self.n))
 
         for i in range(trajn):
             J = self.jacob0(q[i, :])
             Ji = np.linalg.pinv(J)
-            M = self.inertia(q[i, :])
-            Mt[i, :, :] = Ji.T @ M @ Ji
+            Mt[i, :, :] = Ji.T @ M[i] @ Ji
 
         if trajn == 1:
             return Mt[0, :, :]
         else:
             return Mt
 
-    def inertia(self, q=None):
+    def inertia(self, q=None, out=None, threads=None):
         """
         SerialLink.INERTIA Manipulator inertia matrix
 
@@ -614,6 +825,11 @@ class Dynamics:
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
+        :param out: Array to write the inertia matrix to
+        :type out: float ndarray(n,n) or (k,n,n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
 
         :return I: The inertia matrix
         :rtype I: float ndarray(n,n)
@@ -636,16 +852,23 @@ class Dynamics:
             trajn = q.shape[0]
             verifymatrix(q, (trajn, self.n))
 
-        In = np.zeros((trajn, self.n, self.n))
+        if out is None:
+            In = np.zeros((trajn, self.n, self.n))
+        else:
+            In = self._outview(out, (trajn, self.n, self.n))
 
-        for i in range(trajn):
-            In[i, :, :] = self.rne(
-                (np.c_[q[i, :]] @ np.ones((1, self.n))).T,
-                np.zeros((self.n, self.n)),
-                np.eye(self.n),
-                grav=[0, 0, 0])
+        # column j of every matrix is the torque for a unit acceleration of
+        # joint j, all n*k of them are computed by a single rne call
+        qk = np.repeat(q, self.n, axis=0)
+        qddk = np.tile(np.eye(self.n), (trajn, 1))
 
-        if trajn == 1:
+        self.rne(
+            qk, np.zeros(qk.shape), qddk, grav=[0, 0, 0],
+            out=In.reshape((trajn * self.n, self.n)), threads=threads)
+
+        if out is not None:
+            return out
+        elif trajn == 1:
             return In[0, :, :]
         else:
             return In
@@ -726,7 +949,7 @@ class Dynamics:
         else:
             return C
 
-    def itorque(self, q, qdd):
+    def itorque(self, q, qdd, threads=None):
         """
         Inertia torque
 
@@ -735,6 +958,9 @@ class Dynamics:
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
 
         :return taui: The inertia torque vector
         :rtype taui: float ndarray(n)
@@ -763,14 +989,12 @@ class Dynamics:
             verifymatrix(q, (trajn, self.n))
             verifymatrix(qdd, (trajn, self.n))
 
-        taui = np.zeros((trajn, self.n))
-
-        for i in range(trajn):
-            taui[i, :] = self.rne(
-                q[i, :], np.zeros(self.n), qdd[i, :], grav=[0, 0, 0])
+        taui = self.rne(
+            q, np.zeros((trajn, self.n)), qdd, grav=[0, 0, 0],
+            threads=threads)
 
         if trajn == 1:
-            return taui[0, :]
+            return np.reshape(taui, (self.n,))
         else:
             return taui
 
@@ -911,7 +1135,7 @@ class Dynamics:
     #     else:
     #         return tauB
 
-    def gravload(self, q=None, grav=None):
+    def gravload(self, q=None, grav=None, out=None, threads=None):
         """
         Compute gravity load
 
@@ -920,6 +1144,11 @@ class Dynamics:
         :param grav: The gravity vector (Optional, if not supplied will
             use the stored gravity values).
         :type grav: float ndarray(3)
+        :param out: Array to write the joint torques to
+        :type out: float ndarray(n) or (m,n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
 
         :return taug: The generalised joint force/torques due to gravity
         :rtype taug: float ndarray(n)
@@ -956,53 +1185,107 @@ class Dynamics:
             grav = (grav.T @ np.ones((1, trajn))).T
         verifymatrix(grav, (trajn, 3))
 
-        taug = np.zeros((trajn, self.n))
+        if out is None:
+            taug = np.zeros((trajn, self.n))
+        else:
+            taug = self._outview(out, (trajn, self.n))
 
-        for i in range(trajn):
-            taug[i, :] = self.rne(
-                 q[i, :], np.zeros(self.n), np.zeros(self.n), grav[i, :])
+        zero = np.zeros((trajn, self.n))
 
-        if trajn == 1:
+        # one rne call for each distinct gravity vector, usually just one
+        gu, gi = np.unique(grav, axis=0, return_inverse=True)
+        if gu.shape[0] == 1:
+            self.rne(q, zero, zero, gu[0], out=taug, threads=threads)
+        else:
+            for k in range(gu.shape[0]):
+                rows = gi.ravel() == k
+                taug[rows] = np.reshape(self.rne(
+                    q[rows], zero[rows], zero[rows], gu[k],
+                    threads=threads), (-1, self.n))
+
+        if out is not None:
+            return out
+        elif trajn == 1:
             return taug[0, :]
         else:
             return taug
 
+    def gravtable(
+            self, npoints=16, joints=None, qlim=None, grav=None, q0=None,
+            method='linear'):
+        """
+        Interpolated gravity load table
+
+        :param npoints: Number of grid points for each tabulated joint
+        :type npoints: int or list of int
+        :param joints: Indices of the joints to tabulate, defaults to the
+            joints which the gravity load depends on
+        :type joints: list of int, optional
+        :param qlim: Range of every joint, defaults to the joint limits
+        :type qlim: float ndarray(2,n), optional
+        :param grav: The gravity vector, defaults to the robot's gravity
+        :type grav: float ndarray(3), optional
+        :param q0: Value of the joints which are not tabulated
+        :type q0: float ndarray(n), optional
+        :param method: Interpolation method, 'linear' or 'cubic'
+        :type method: str
+        :return: The gravity load table
+        :rtype: GravityTable
+
+        ``table = gravtable()`` tabulates ``gravload`` over the joint space
+        and ``table(q)`` interpolates it, which is much cheaper than
+        ``gravload`` for repeated evaluation in a control loop. The table
+        can be saved with ``table.save(filename)`` and restored with
+        ``GravityTable.load(filename)``.
+
+        :seealso: :func:`gravload`, :class:`GravityTable`
+        """
+        return GravityTable(
+            self, npoints=npoints, joints=joints, qlim=qlim, grav=grav,
+            q0=q0, method=method)
+
     def paycap(self, w, tauR, frame=1, q=None):
         """
         Static payload capacity of a robot
 
         :param w: The payload wrench
-        :type w: float ndarray(n)
+        :type w: float ndarray(6) or (m,6)
         :param tauR: Joint torque matrix minimum and maximums
         :type tauR: float ndarray(n,2)
         :param frame: The frame in which to torques are expressed in when J
-            is not supplied. 'base' means base frame of the robot, 'ee' means
-            end-effector frame
-        :type frame: str
+            is not supplied. 0 means base frame of the robot, 1 means end-
+            effector frame
+        :type frame: int
         :param q: The joint angles/configuration of the robot.
-        :type q: float ndarray(n)
+        :type q: float ndarray(n) or (m,n)
 
-        :return wmax: The maximum permissible payload wrench
-        :rtype wmax: float ndarray(6)
+        :return wmax: The maximum permissible payload wrench, by joint
+        :rtype wmax: float ndarray(n) or (m,n)
         :return joint: The joint index (zero indexed) which hits its
             force/torque limit
-        :rtype joint: int
+        :rtype joint: int or int ndarray(m)
 
-        ``wmax, joint = paycap(q, w, f, tauR)`` returns the maximum permissible
-        payload wrench ``wmax`` (6) applied at the end-effector, and the index
-        of the joint (zero indexed) which hits its force/torque limit at that
-        wrench. ``q`` (n) is the manipulator pose, ``w`` the payload wrench
-        (6), ``f`` the wrench reference frame and tauR (nx2) is a matrix of
-        joint forces/torques (first col is maximum, second col minimum).
+        ``wmax, joint = paycap(w, tauR, frame, q)`` returns the maximum
+        permissible payload, as a multiple of the unit wrench in the direction
+        of ``w``, for each joint ``wmax`` (n) and the index of the joint
+        (zero indexed) which hits its force/torque limit first. The payload
+        capacity of the robot is ``wmax[joint]``. ``q`` (n) is the
+        manipulator pose, ``w`` the payload wrench (6), ``frame`` the wrench
+        reference frame and tauR (nx2) is a matrix of joint forces/torques
+        (first col is maximum, second col minimum).
 
         Trajectory operation:
-        In the case q is nxm then wmax is Mx6 and J is Mx1 where the rows are
-        the results at the pose given by corresponding row of q.
-
+        In the case q is mxn then wmax is mxn and joint is (m) where the rows
+        are the results at the pose given by corresponding row of q. w is
+        either a single wrench or mx6 with a wrench per pose. The gravity
+        loads and Jacobians of all the poses are computed together and the
+        capacities in a single vectorised pass.
 
         :notes:
             - Wrench vector and Jacobian must be from the same reference frame
             - Tool transforms are taken into consideration for frame=1.
+            - A joint which is not loaded by the payload has infinite
+              capacity.
         """
 
         trajn = 1
@@ -1012,45 +1295,32 @@ class Dynamics:
 
         try:
             q = getvector(q, self.n, 'row')
-            w = getvector(w, 6, 'row')
         except ValueError:
-            trajn = q.shape[1]
+            trajn = q.shape[0]
             verifymatrix(q, (trajn, self.n))
+
+        try:
+            w = getvector(w, 6, 'row')
+        except ValueError:
             verifymatrix(w, (trajn, 6))
 
         verifymatrix(tauR, (self.n, 2))
 
-        wmax = np.zeros((trajn, 6))
-        joint = np.zeros(trajn, dtype=np.int)
-
-        for i in range(trajn):
-            tauB = self.gravload(q[i, :])
-
-            # tauP = self.rne(
-            #     np.zeros(self.n), np.zeros(self.n),
-            #     q, grav=[0, 0, 0], fext=w/np.linalg.norm(w))
+        tauB = np.reshape(self.gravload(q), (trajn, self.n))
 
-            tauP = self.pay(
-                w[i, :]/np.linalg.norm(w[i, :]), q=q[i, :], frame=frame)
+        # torque due to a unit wrench in the direction of w
+        wu = w / np.linalg.norm(w, axis=1)[:, np.newaxis]
+        J = self._jacob_batch(q, frame)
+        tauP = -np.einsum('mji,mj->mi', J, np.broadcast_to(wu, (trajn, 6)))
 
-            M = tauP > 0
-            m = tauP <= 0
+        # the torque limit which the payload drives each joint towards
+        tauL = np.where(tauP > 0, tauR[:, 0], tauR[:, 1])
 
-            TAUm = np.ones(self.n)
-            TAUM = np.ones(self.n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            wmax = (tauL - tauB) / tauP
+        wmax[tauP == 0] = np.inf
 
-            for c in range(self.n):
-                TAUM[c] = tauR[c, 0]
-                TAUm[c] = tauR[c, 1]
-
-            WM = np.zeros(self.n)
-            WM[M] = (TAUM[M] - tauB[M]) / tauP[M]
-            WM[m] = (TAUm[m] - tauB[m]) / tauP[m]
-
-            WM[WM == np.NINF] = np.Inf
-
-            wmax[i, :] = WM
-            joint[i] = np.argmin(WM)
+        joint = np.argmin(wmax, axis=1)
 
         if trajn == 1:
             return wmax[0, :], joint[0]
@@ -1082,12 +1352,12 @@ class Dynamics:
         r2 = self._copy()
         r2.name = 'P/' + self.name
 
-        for i in range(self.n):
+        for link in r2.links:
             s = (2 * np.random.random() - 1) * p + 1
-            r2.links[i].m = r2.links[i].m * s
+            link.m = link.m * s
 
             s = (2 * np.random.random() - 1) * p + 1
-            r2.links[i].I = r2.links[i].I * s    # noqa
+            link.I = link.I * s    # noqa
 
         return r2
 
@@ -1409,6 +1679,17 @@ class Dynamics:
         else:
             return tau
 
+    @staticmethod
+    def _outview(out, shape):
+        # view of an out argument with the shape used internally, results
+        # must land in the caller's array so a copy is not acceptable
+        if not isinstance(out, np.ndarray):
+            raise TypeError('out must be a numpy ndarray')
+        view = out.reshape(shape)
+        if not np.shares_memory(view, out):
+            raise ValueError('out must be contiguous')
+        return view
+
 
 def _printProgressBar(
         fraction, prefix='', suffix='', decimals=1,
@@ -9,6 +9,7 @@ from spatialmath.base.argcheck import getvector, verifymatrix, isscalar
 import roboticstoolbox as rp
 from roboticstoolbox.robot.ETS import ETS
 from roboticstoolbox.robot.Link import Link
+from functools import wraps
 
 
 class ELink(Link):
@@ -116,6 +117,8 @@ class ELink(Link):
             self._jtype = self.VARIABLE
 
         self._v = v
+        self._fkT = None
+        self._robot = None
         self.qlim = qlim
         self.geometry = geometry
         self.collision = collision
@@ -132,10 +135,25 @@ class ELink(Link):
     def __repr__(self):
         return self.name
 
+    def _listen_dyn(func):
+        @wraps(func)
+        def wrapper_listen_dyn(*args):
+            if args[0]._robot is not None:
+                args[0]._robot.dynchanged(args[0])
+            return func(*args)
+        return wrapper_listen_dyn
+
     @property
     def v(self):
         return self._v
 
+    @property
+    def _fk(self):
+        # world pose of the link from the last ERobot.fkine_all, a copy of
+        # the robot's pose buffer taken on read
+        if self._fkT is not None:
+            return SE3(self._fkT.copy(), check=False)
+
     @property
     def Ts(self):
         return self._Ts
@@ -228,6 +246,7 @@ class ELink(Link):
             raise TypeError('Geometry must be of Shape class or list of Shape')
 
         self._collision = new_coll
+        self._bind_shapes()
 
     @geometry.setter
     def geometry(self, geom):
@@ -245,22 +264,41 @@ class ELink(Link):
             raise TypeError('Geometry must be of Shape class or list of Shape')
 
         self._geometry = new_geom
+        self._bind_shapes()
+
+    def _bind_shapes(self, fkT=None):
+        # Attach the shapes of the link to its world pose, a (4,4) view of
+        # the ERobot pose buffer which fkine_all updates in place
+        if fkT is not None:
+            self._fkT = fkT
+
+        if self._fkT is None:
+            return
+
+        for gi in getattr(self, '_geometry', []):
+            gi._bind(self._fkT)
+
+        for gi in getattr(self, '_collision', []):
+            gi._bind(self._fkT)
 
     @qlim.setter
     def qlim(self, qlim_new):
         self._qlim = getvector(qlim_new, 2)
 
     @m.setter
+    @_listen_dyn
     def m(self, m_new):
         self._m = m_new
 
     @r.setter
+    @_listen_dyn
     def r(self, T):
         if not isinstance(T, SE3):
             T = SE3(T)
         self._r = T
 
     @I.setter
+    @_listen_dyn
     def I(self, I_new):  # noqa
         # Try for Inertia Matrix
         try:
@@ -286,10 +324,12 @@ class ELink(Link):
         self._I = I_new
 
     @Jm.setter
+    @_listen_dyn
     def Jm(self, Jm_new):
         self._Jm = Jm_new
 
     @B.setter
+    @_listen_dyn
     def B(self, B_new):
         if isscalar(B_new):
             self._B = B_new
@@ -297,6 +337,7 @@ class ELink(Link):
             raise TypeError("B must be a scalar")
 
     @Tc.setter
+    @_listen_dyn
     def Tc(self, Tc_new):
 
         try:
@@ -314,6 +355,7 @@ class ELink(Link):
         self._Tc = Tc_new
 
     @G.setter
+    @_listen_dyn
     def G(self, G_new):
         self._G = G_new
 
@@ -16,6 +16,9 @@ from roboticstoolbox.robot.ELink import ELink
 from roboticstoolbox.backend import xacro
 from roboticstoolbox.backend import URDF
 from roboticstoolbox.robot.Robot import Robot
+from roboticstoolbox.robot.Dynamics import Dynamics
+from roboticstoolbox.robot.ETree import ETree
+from roboticstoolbox.robot.KinematicCache import cached
 
 # try:
 #     import pybullet as p
@@ -24,10 +27,10 @@ from roboticstoolbox.robot.Robot import Robot
 #     _pyb = False
 
 
-class ERobot(Robot):
+class ERobot(Robot, Dynamics):
     """
     The ERobot. A superclass which represents the
-    kinematics of a serial-link manipulator
+    kinematics and dynamics of a serial-link or branched manipulator
 
     :param et_list: List of elementary transforms which represent the robot
         kinematics
@@ -114,6 +117,18 @@ class ERobot(Robot):
             lambda link: add_links(link, self._ets, self._q_idx))
         self._n = len(self._q_idx)
 
+        # World pose of every link, in the order of ets, updated in place by
+        # fkine_all. Each link, and its shapes, holds a view of its pose.
+        self._fk_buf = np.empty((self.M, 4, 4))
+        self._fk_buf[...] = np.eye(4)
+        self._fk_parent = []
+        for i, link in enumerate(self._ets):
+            if link.parent is None:
+                self._fk_parent.append(-1)
+            else:
+                self._fk_parent.append(self._ets.index(link.parent))
+            link._bind_shapes(self._fk_buf[i])
+
         self._reset_fk_path()
 
         # Current joint angles of the robot
@@ -126,6 +141,105 @@ class ERobot(Robot):
     def _reset_fk_path(self):
         # Pre-calculate the forward kinematics path
         self._fkpath = self.dfs_path(self.base_link, self.ee_link)
+        self._fold_fk_path()
+        self.cache_clear()
+
+        # the dynamic model depends on the end-effector link
+        self._tree = None
+
+    def dynchanged(self, link=None):
+        super().dynchanged(link)
+
+        # link parameters have changed, the dynamic model is stale
+        self._tree = None
+
+    @property
+    def tree(self):
+        """
+        Dynamic model of the link tree
+
+        :return: The dynamic model of the robot
+        :rtype: ETree
+
+        The tree holds a flat table of the links with their constant
+        transforms and inertial parameters. It is built on first use and
+        discarded whenever a link parameter or the ``ee_link`` changes.
+        """
+        if self._tree is None:
+            self._tree = ETree(self)
+        return self._tree
+
+    def _copy(self):
+        # copy the links, the parent of each copy is the copy of its parent,
+        # the geometry is not copied
+        L = {}
+        for link in self.links:
+            L[link] = ELink(
+                ets=link.ets,
+                v=link.v,
+                name=link.name,
+                qlim=link.qlim,
+                m=link.m,
+                r=link.r,
+                I=link.I,
+                Jm=link.Jm,
+                B=link.B,
+                Tc=link.Tc,
+                G=link.G)
+        for link in self.links:
+            if link.parent is not None:
+                L[link]._parent = L[link.parent]
+
+        r2 = ERobot(
+            list(L.values()),
+            base_link=L[self.base_link],
+            ee_link=L[self.ee_link],
+            name=self.name,
+            manufacturer=self.manufacturer,
+            base=self.base,
+            tool=self.tool,
+            gravity=self.gravity)
+
+        r2.q = self.q
+        r2.qd = self.qd
+        r2.qdd = self.qdd
+
+        return r2
+
+    def _fold_fk_path(self):
+        """
+        Fold the static transforms of the forward kinematics path
+
+        Every run of constant transforms along ``_fkpath``, the static part
+        of each link and any static links between two joints, is multiplied
+        out once into a single 4x4 matrix.  The path then evaluates as::
+
+            C[0] @ v[0](q0) @ C[1] @ v[1](q1) ... v[k-1](qk-1) @ C[k]
+
+        where ``C = _fkconst`` holds k+1 constant matrices and
+        ``v = _fkvar`` the k variable elementary transforms.
+        """
+        self._fkconst, self._fkvar = self._fold_path(self._fkpath)
+
+    @staticmethod
+    def _fold_path(path):
+        # constant matrices and variable ETs of a path of links, see
+        # _fold_fk_path
+        const = []
+        var = []
+        C = np.eye(4)
+
+        for link in path:
+            C = C @ link.Ts.A
+
+            if link.jtype == link.VARIABLE:
+                const.append(C)
+                var.append(link.v)
+                C = np.eye(4)
+
+        const.append(C)
+
+        return const, var
 
     # def bfs_link(self, func):
     #     queue = self.root
@@ -433,12 +547,14 @@ class ERobot(Robot):
         if not isinstance(T, SE3):
             T = SE3(T)
         self._base = T
+        self.cache_clear()
 
     @tool.setter
     def tool(self, T):
         if not isinstance(T, SE3):  # pragma nocover
             T = SE3(T)
         self._tool = T
+        self.cache_clear()
 
     @base_link.setter
     def base_link(self, link):
@@ -456,7 +572,8 @@ class ERobot(Robot):
             self._ee_link = self.ets[link]
         self._reset_fk_path()
 
-    def fkine(self, q=None):
+    @cached
+    def fkine(self, q=None, out=None):
         '''
         Evaluates the forward kinematics of a robot based on its ETS and
         joint angles q.
@@ -474,6 +591,9 @@ class ERobot(Robot):
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
+        :param out: Array to write the result to, in which case it is
+            returned instead of an SE3
+        :type out: float ndarray(4,4) or ndarray(m,4,4)
         :return: The transformation matrix representing the pose of the
             end-effector
         :rtype: SE3
@@ -481,6 +601,10 @@ class ERobot(Robot):
         :notes:
             - The robot's base or tool transform, if present, are incorporated
               into the result.
+            - All the points of a trajectory are evaluated together.
+            - A trajectory is (nxm), one configuration per column, unlike
+              ``jacob0``, ``hessian0`` and the dynamics methods which take
+              (mxn), one configuration per row.
 
         :references:
             - Kinematic Derivatives using the Elementary Transform
@@ -499,27 +623,25 @@ class ERobot(Robot):
             trajn = q.shape[1]
             verifymatrix(q, (self.n, trajn))
 
-        for i in range(trajn):
-            j = 0
-            tr = self.base
-
-            for link in self._fkpath:
-                if link.jtype == link.VARIABLE:
-                    T = link.A(q[j, i])
-                    j += 1
-                else:
-                    T = link.A()
+        C = self._fkconst
 
-                tr = tr * T
+        T = np.empty((trajn, 4, 4))
+        T2 = np.empty((trajn, 4, 4))
+        T[...] = self.base.A @ C[0]
 
-            tr = tr * self.tool
+        for j, v in enumerate(self._fkvar):
+            np.matmul(T, v.T_batch(q[j, :]), out=T2)
+            np.matmul(T2, C[j + 1], out=T)
 
-            if i == 0:
-                t = SE3(tr)
+        if out is not None:
+            if out.ndim == 2:
+                np.matmul(T[0], self.tool.A, out=out)
             else:
-                t.append(tr)
+                np.matmul(T, self.tool.A, out=out)
+            return out
 
-        return t
+        np.matmul(T, self.tool.A, out=T2)
+        return SE3([Ti for Ti in T2], check=False)
 
     def fkine_graph(self, q=None, from_link=None, to_link=None):
 
@@ -549,8 +671,8 @@ class ERobot(Robot):
 
     def fkine_all(self, q=None):
         '''
-        Tall = fkine_all(q) evaluates fkine for each joint within a robot and
-        returns a trajecotry of poses.
+        Tall = fkine_all(q) evaluates fkine for each link within a robot and
+        returns their world poses.
 
         Tall = fkine_all() as above except uses the stored q value of the
         robot object.
@@ -559,12 +681,17 @@ class ERobot(Robot):
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
 
-        :return T: Homogeneous transformation trajectory
-        :rtype T: SE3 list
+        :return T: World pose of every link, in the order of ``ets``
+        :rtype T: float ndarray(M,4,4)
 
         :notes:
             - The robot's base transform, if present, are incorporated
               into the result.
+            - The poses are written in place to a buffer owned by the robot,
+              the returned array is a copy of it.
+            - The collision and geometry shapes of each link hold a view of
+              the link pose, their world transform is composed only when it
+              is read.
 
         :references:
             - Kinematic Derivatives using the Elementary Transform
@@ -577,37 +704,24 @@ class ERobot(Robot):
         else:
             q = getvector(q, self.n)
 
-        # t = self.base
-        # Tall = SE3()
+        base = self.base.A
+        buf = self._fk_buf
         j = 0
 
-        if self.ets[0].jtype == self.ets[0].VARIABLE:
-            self.ets[0]._fk = self.base * self.ets[0].A(q[j])
-            j += 1
-        else:
-            self.ets[0]._fk = self.base * self.ets[0].A()
-
-        for col in self.ets[0].collision:
-            col.wT = self.ets[0]._fk
-
-        for gi in self.ets[0].geometry:
-            gi.wT = self.ets[0]._fk
-
-        for i in range(1, self.M):
-            if self.ets[i].jtype == self.ets[i].VARIABLE:
-                t = self.ets[i].A(q[j])
+        for i, link in enumerate(self.ets):
+            if link.jtype == link.VARIABLE:
+                T = link.A(q[j], fast=True)
                 j += 1
             else:
-                t = self.ets[i].A()
-
-            self.ets[i]._fk = self.ets[i].parent._fk * t
+                T = link.A(fast=True)
 
-            # Update the collision objects transform as well
-            for col in self.ets[i].collision:
-                col.wT = self.ets[i]._fk
+            parent = self._fk_parent[i]
+            if parent < 0:
+                np.matmul(base, T, out=buf[i])
+            else:
+                np.matmul(buf[parent], T, out=buf[i])
 
-            for gi in self.ets[i].geometry:
-                gi.wT = self.ets[i]._fk
+        return buf.copy()
 
     # def jacob0(self, q=None):
     #     """
@@ -704,9 +818,53 @@ class ERobot(Robot):
 
         return path, n
 
+    @cached
     def jacob0(
             self, q=None, from_link=None, to_link=None,
-            offset=None, T=None):
+            offset=None, T=None, out=None):
+        """
+        J0 = jacob0(q) is the manipulator Jacobian matrix which maps joint
+        velocity to end-effector spatial velocity. v = J0*qd in the
+        base frame.
+
+        J0 = jacob0() as above except uses the stored q value of the
+        robot object.
+
+        Trajectory operation:
+        Calculates the Jacobian for each point on a trajectory of joints q
+        where q is (mxn) and the returned Jacobian is (mx6xn)
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values).
+        :type q: float ndarray(n) or ndarray(m,n)
+        :param from_link: The link at the start of the chain, defaults to
+            the base link
+        :type from_link: ELink, optional
+        :param to_link: The link at the end of the chain, defaults to the
+            end-effector link
+        :type to_link: ELink, optional
+        :param offset: A static offset applied after to_link
+        :type offset: SE3, optional
+        :param T: The pose of the end of the chain with respect to the base
+            frame, if already known
+        :type T: SE3, optional
+        :param out: Array to write the result to
+        :type out: float ndarray(6,n) or ndarray(m,6,n), optional
+
+        :return J: The manipulator Jacobian in the base frame
+        :rtype: float ndarray(6,n) or ndarray(m,6,n)
+
+        :notes:
+            - The frames along the chain are accumulated in a single forward
+              sweep, the end-effector position falls out of the same sweep
+              so no matrix inverse is required.
+            - A trajectory is (mxn), one configuration per row, unlike
+              ``fkine`` which takes (nxm), one configuration per column.
+
+        :references:
+            - Kinematic Derivatives using the Elementary Transform
+              Sequence, J. Haviland and P. Corke
+        """
 
         if from_link is None:
             from_link = self.base_link
@@ -721,69 +879,73 @@ class ERobot(Robot):
 
         if q is None:
             q = np.copy(self.q)
+
+        trajn = isinstance(q, np.ndarray) and q.ndim == 2 \
+            and q.shape[0] > 1 and q.shape[1] > 1
+
+        if trajn:
+            if q.shape[1] < n:
+                raise ValueError('q must have at least n columns')
         else:
             try:
                 q = getvector(q, n)
             except ValueError:
                 q = getvector(q, self.n)
+            q = q[np.newaxis, :]
 
-        if T is None:
-            T = (self.base.inv()
-                 * self.fkine_graph(q, from_link=from_link, to_link=to_link)
-                 * offset)
-
-        T = T.A
-        U = np.eye(4)
-        j = 0
-        J = np.zeros((6, n))
-
-        for link in path:
-
-            if link.jtype is link.STATIC:
-                U = U @ link.A(fast=True)
-            else:
-                U = U @ link.A(q[j], fast=True)
-
-                if link == to_link:
-                    U = U @ offset.A
-
-                Tu = np.linalg.inv(U) @ T
-                n = U[:3, 0]
-                o = U[:3, 1]
-                a = U[:3, 2]
-                x = Tu[0, 3]
-                y = Tu[1, 3]
-                z = Tu[2, 3]
-
-                if link.v.axis == 'Rz':
-                    J[:3, j] = (o * x) - (n * y)
-                    J[3:, j] = a
-
-                elif link.v.axis == 'Ry':
-                    J[:3, j] = (n * z) - (a * x)
-                    J[3:, j] = o
+        if from_link is self.base_link and to_link is self.ee_link:
+            C, V = self._fkconst, self._fkvar
+        else:
+            C, V = self._fold_path(path)
 
-                elif link.v.axis == 'Rx':
-                    J[:3, j] = (a * y) - (o * z)
-                    J[3:, j] = n
+        m = q.shape[0]
 
-                elif link.v.axis == 'tx':
-                    J[:3, j] = n
-                    J[3:, j] = np.array([0, 0, 0])
+        # forward sweep, the frame of each joint is kept
+        U = np.broadcast_to(C[0], (m, 4, 4))
+        Uj = np.empty((m, n, 4, 4))
 
-                elif link.v.axis == 'ty':
-                    J[:3, j] = o
-                    J[3:, j] = np.array([0, 0, 0])
+        for j, v in enumerate(V):
+            U = U @ v.T_batch(q[:, j])
+            Uj[:, j, :, :] = U
+            U = U @ C[j + 1]
 
-                elif link.v.axis == 'tz':
-                    J[:3, j] = a
-                    J[3:, j] = np.array([0, 0, 0])
+        if T is None:
+            pe = (U @ offset.A)[:, :3, 3]
+        else:
+            pe = T.A[np.newaxis, :3, 3]
+
+        # the joint axis is a column of the joint frame: x, y or z
+        E = np.zeros((n, 3))
+        revolute = np.zeros(n, dtype=bool)
+        for j, v in enumerate(V):
+            E[j, 'xyz'.index(v.axis[1].lower())] = 1
+            revolute[j] = v.axis[0] == 'R'
+
+        axis = np.einsum('mjrc,jc->mjr', Uj[:, :, :3, :3], E)
+        d = pe[:, np.newaxis, :] - Uj[:, :, :3, 3]
+        rev = revolute[np.newaxis, :, np.newaxis]
+
+        if out is None:
+            J = np.empty((m, 6, n))
+        elif trajn:
+            J = out
+        else:
+            J = out[np.newaxis]
 
-                j += 1
+        J[:, :3, :] = np.where(rev, np.cross(axis, d), axis).transpose(0, 2, 1)
+        J[:, 3:, :] = np.where(rev, axis, 0).transpose(0, 2, 1)
 
-        return J
+        if out is not None:
+            return out
+        elif trajn:
+            return J
+        else:
+            return J[0]
 
-    def jacobe(self, q=None, from_link=None, to_link=None, offset=None):
+    @cached
+    def jacobe(
+            self, q=None, from_link=None, to_link=None, offset=None,
+            out=None):
         """
         Je = jacobe(q) is the manipulator Jacobian matrix which maps joint
         velocity to end-effector spatial velocity. v = Je*qd in the
@@ -796,6 +958,9 @@ class ERobot(Robot):
             if not supplied will use the stored q values).
         :type q: float ndarray(n)
 
+        :param out: Array to write the result to
+        :type out: float ndarray(6,n), optional
+
         :return J: The manipulator Jacobian in ee frame
         :rtype: float ndarray(6,n)
 
@@ -820,7 +985,8 @@ class ERobot(Robot):
              * offset)
 
         J0 = self.jacob0(q, from_link, to_link, offset, T)
-        Je = self.jacobev(q, from_link, to_link, offset, T) @ J0
+        Je = np.matmul(
+            self.jacobev(q, from_link, to_link, offset, T), J0, out=out)
         return Je
 
     def hessian0(self, q=None, J0=None, from_link=None, to_link=None):
@@ -830,13 +996,17 @@ class ERobot(Robot):
         function calulcates this based on the ETS of the robot. One of J0 or q
         is required. Supply J0 if already calculated to save computation time
 
+        Trajectory operation:
+        If q is (mxn) or J0 is (mx6xn) the Hessian is calculated for every
+        configuration and is returned as (mx6xnxn)
+
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
-        :type q: float ndarray(n)
+        :type q: float ndarray(n) or ndarray(m,n)
         :param J0: The manipulator Jacobian in the 0 frame
-        :type J0: float ndarray(6,n)
+        :type J0: float ndarray(6,n) or ndarray(m,6,n)
         :return: The manipulator Hessian in 0 frame
-        :rtype: float ndarray(6,n,n)
+        :rtype: float ndarray(6,n,n) or ndarray(m,6,n,n)
 
         :references:
             - Kinematic Derivatives using the Elementary Transform
@@ -852,27 +1022,24 @@ class ERobot(Robot):
         path, n = self.get_path(from_link, to_link)
 
         if J0 is None:
-            if q is None:
-                q = np.copy(self.q)
-            else:
-                q = getvector(q, n)
-
             J0 = self.jacob0(q, from_link, to_link)
         else:
-            verifymatrix(J0, (6, n))
+            self._verify_jacob(J0, n)
 
-        H = np.zeros((6, n, n))
+        # column i of the translational and rotational Jacobian, (...,n,3)
+        v = np.swapaxes(J0[..., :3, :], -1, -2)
+        w = np.swapaxes(J0[..., 3:, :], -1, -2)
 
-        for j in range(n):
-            for i in range(j, n):
+        # the (i, j) element is the cross product of column j with column i
+        Hv = np.cross(w[..., np.newaxis, :, :], v[..., :, np.newaxis, :])
+        Hw = np.cross(w[..., np.newaxis, :, :], w[..., :, np.newaxis, :])
 
-                H[:3, i, j] = np.cross(J0[3:, j], J0[:3, i])
-                H[3:, i, j] = np.cross(J0[3:, j], J0[3:, i])
+        # only i >= j is defined, the translational part is symmetric
+        lower = np.tril(np.ones((n, n), dtype=bool))[..., np.newaxis]
+        Hv = np.where(lower, Hv, np.swapaxes(Hv, -2, -3))
+        Hw = np.where(lower, Hw, 0)
 
-                if i != j:
-                    H[:3, j, i] = H[:3, i, j]
-
-        return H
+        return np.moveaxis(np.concatenate((Hv, Hw), axis=-1), -1, -3)
 
     def manipulability(self, q=None, J=None, from_link=None, to_link=None):
         """
@@ -884,13 +1051,17 @@ class ERobot(Robot):
         singularity. One of J or q is required. Supply J if already
         calculated to save computation time
 
+        Trajectory operation:
+        If q is (mxn) or J is (mx6xn) the manipulability of every
+        configuration is returned as an ndarray(m)
+
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
-        :type q: float ndarray(n)
+        :type q: float ndarray(n) or ndarray(m,n)
         :param J: The manipulator Jacobian in any frame
-        :type J: float ndarray(6,n)
+        :type J: float ndarray(6,n) or ndarray(m,6,n)
         :return: The manipulability index
-        :rtype: float
+        :rtype: float or ndarray(m)
 
         :references:
             - Analysis and control of robot manipulators with redundancy,
@@ -909,16 +1080,11 @@ class ERobot(Robot):
         path, n = self.get_path(from_link, to_link)
 
         if J is None:
-            if q is None:
-                q = np.copy(self.q)
-            else:
-                q = getvector(q, n)
-
             J = self.jacob0(q, from_link, to_link)
         else:
-            verifymatrix(J, (6, n))
+            self._verify_jacob(J, n)
 
-        return np.sqrt(np.linalg.det(J @ np.transpose(J)))
+        return np.sqrt(np.linalg.det(J @ np.swapaxes(J, -1, -2)))
 
     def jacobm(self, q=None, J=None, H=None, from_link=None, to_link=None):
         """
@@ -927,15 +1093,24 @@ class ERobot(Robot):
         One of J or q is required. Supply J and H if already calculated to
         save computation time
 
+        Trajectory operation:
+        If q is (mxn), or J is (mx6xn) and H is (mx6xnxn), the manipulability
+        Jacobian of every configuration is returned as (mxnx1)
+
         :param q: The joint angles/configuration of the robot (Optional,
             if not supplied will use the stored q values).
-        :type q: float ndarray(n)
+        :type q: float ndarray(n) or ndarray(m,n)
         :param J: The manipulator Jacobian in any frame
-        :type J: float ndarray(6,n)
+        :type J: float ndarray(6,n) or ndarray(m,6,n)
         :param H: The manipulator Hessian in any frame
-        :type H: float ndarray(6,n,n)
+        :type H: float ndarray(6,n,n) or ndarray(m,6,n,n)
         :return: The manipulability Jacobian
-        :rtype: float ndarray(n)
+        :rtype: float ndarray(n,1) or ndarray(m,n,1)
+
+        :notes:
+            - J J^T is factorised once by Cholesky, the factor gives both the
+              manipulability and the solution against J J^T, no explicit
+              inverse is formed.
 
         :references:
             - Kinematic Derivatives using the Elementary Transform
@@ -951,31 +1126,39 @@ class ERobot(Robot):
         path, n = self.get_path(from_link, to_link)
 
         if J is None:
-            if q is None:
-                q = np.copy(self.q)
-            else:
-                q = getvector(q, n)
-
             J = self.jacob0(q, from_link, to_link)
         else:
-            verifymatrix(J, (6, n))
+            self._verify_jacob(J, n)
 
         if H is None:
             H = self.hessian0(J0=J, from_link=from_link, to_link=to_link)
-        else:
-            verifymatrix(H, (6, n, n))
+        elif not isinstance(H, np.ndarray):
+            raise TypeError('H must be a numpy ndarray')
+        elif H.shape[-3:] != (6, n, n) or H.shape[:-3] != J.shape[:-2]:
+            raise ValueError('H must be 6xnxn for every Jacobian in J')
+
+        # J J^T = L L^T
+        L = np.linalg.cholesky(J @ np.swapaxes(J, -1, -2))
+        manipulability = np.prod(
+            np.diagonal(L, axis1=-2, axis2=-1), axis=-1)
 
-        manipulability = self.manipulability(
-            J=J, from_link=from_link, to_link=to_link)
-        b = np.linalg.inv(J @ np.transpose(J))
-        Jm = np.zeros((n, 1))
+        # (J J^T)^-1 J by forward and back substitution
+        b = np.linalg.solve(
+            np.swapaxes(L, -1, -2), np.linalg.solve(L, J))
 
-        for i in range(n):
-            c = J @ np.transpose(H[:, :, i])
-            Jm[i, 0] = manipulability * \
-                np.transpose(c.flatten('F')) @ b.flatten('F')
+        # Jm_i = m tr((J J^T)^-1 J H_i^T)
+        Jm = manipulability[..., np.newaxis] * \
+            np.einsum('...kl,...kli->...i', b, H)
 
-        return Jm
+        return Jm[..., np.newaxis]
+
+    @staticmethod
+    def _verify_jacob(J, n):
+        # a Jacobian (6,n) or a stack of them (m,6,n)
+        if not isinstance(J, np.ndarray):
+            raise TypeError('J must be a numpy ndarray')
+        if J.ndim not in (2, 3) or J.shape[-2:] != (6, n):
+            raise ValueError('J must be 6xn or mx6xn')
 
     # def __str__(self):
     #     """
@@ -1076,6 +1259,310 @@ class ERobot(Robot):
 
         return Jv
 
+    def rne(
+            self, q, qd=None, qdd=None, grav=None, fext=None, out=None,
+            threads=None):
+        r"""
+        Inverse dynamics
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(n) or (m,n)
+        :param qd: The joint velocities of the robot
+        :type qd: float ndarray(n) or (m,n)
+        :param qdd: The joint accelerations of the robot
+        :type qdd: float ndarray(n) or (m,n)
+        :param grav: Gravity vector to overwrite robots gravity value
+        :type grav: float ndarray(3)
+        :param fext: Specify wrench acting on the end-effector link
+             :math:`W=[F_x F_y F_z M_x M_y M_z]`
+        :type fext: float ndarray(6)
+        :param out: Array to write the joint torques to
+        :type out: float ndarray(n) or (m,n)
+        :param threads: Number of threads used for a trajectory, 0 for one
+            per CPU, defaults to the ``threads`` attribute
+        :type threads: int, optional
+
+        ``tau = rne(q, qd, qdd, grav, fext)`` is the joint torque required for
+        the robot to achieve the specified joint position ``q``, velocity
+        ``qd`` and acceleration ``qdd``. ``fext`` is the wrench exerted by the
+        ``ee_link`` expressed in its own frame.
+
+        Trajectory operation:
+        If q, qd and qdd (mxn) are matrices with m rows representing a
+        trajectory then tau (mxn) is a matrix with rows corresponding to each
+        trajectory step, all steps are evaluated together.
+
+        :notes:
+            - The torque computed contains a contribution due to armature
+              inertia and joint friction.
+            - Every link of the tree contributes, including branches which do
+              not lead to ``ee_link``.
+            - If a model has no dynamic parameters set the result is zero.
+
+        """
+        q, qd, qdd = self._dynargs(q, qd, qdd)
+        trajn = q.shape[0]
+
+        if grav is None:
+            grav = self.gravity
+        grav = self.base.R.T @ getvector(grav, 3)
+
+        if fext is not None:
+            fext = getvector(fext, 6)
+
+        if out is None:
+            tau = np.empty((trajn, self.n))
+        else:
+            tau = self._outview(out, (trajn, self.n))
+
+        tree = self.tree
+
+        def block(rows):
+            tau[rows] = tree.rne(q[rows], qd[rows], qdd[rows], grav, fext)
+
+        self._parallel(block, trajn, threads)
+
+        if out is not None:
+            return out
+        elif trajn == 1:
+            return tau[0, :]
+        else:
+            return tau
+
+    def inertia(self, q=None, out=None, threads=None):
+        """
+        Manipulator inertia matrix
+
+        :param q: The joint angles/configuration of the robot (Optional,
+            if not supplied will use the stored q values).
+        :type q: float ndarray(n) or (k,n)
+        :param out: Array to write the inertia matrix to
+        :type out: float ndarray(n,n) or (k,n,n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
+
+        :return I: The inertia matrix
+        :rtype I: float ndarray(n,n) or (k,n,n)
+
+        ``inertia(q)`` is the symmetric joint inertia matrix (nxn) which
+        relates joint torque to joint acceleration for the robot at joint
+        configuration q, computed by the Composite Rigid Body Algorithm.  If
+        q is a matrix (kxn) the result is (kxnxn).
+
+        :notes:
+            - The diagonal terms include the motor inertia reflected through
+              the gear ratio.
+
+        """
+        if q is None:
+            q = self.q
+
+        q, = self._dynargs(q)
+        trajn = q.shape[0]
+
+        if out is None:
+            In = np.empty((trajn, self.n, self.n))
+        else:
+            In = self._outview(out, (trajn, self.n, self.n))
+
+        tree = self.tree
+
+        def block(rows):
+            In[rows] = tree.inertia(q[rows])
+
+        self._parallel(block, trajn, threads)
+
+        if out is not None:
+            return out
+        elif trajn == 1:
+            return In[0, :, :]
+        else:
+            return In
+
+    def gravload(self, q=None, grav=None, out=None, threads=None):
+        """
+        Compute gravity load
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(n) or (k,n)
+        :param grav: The gravity vector (Optional, if not supplied will
+            use the stored gravity values).
+        :type grav: float ndarray(3) or (k,3)
+        :param out: Array to write the joint torques to
+        :type out: float ndarray(n) or (k,n)
+        :param threads: Number of threads used for a trajectory, see
+            ``rne``
+        :type threads: int, optional
+
+        :return taug: The generalised joint force/torques due to gravity
+        :rtype taug: float ndarray(n) or (k,n)
+
+        ``taug = gravload(q)`` calculates the joint gravity loading (n) for
+        the robot in the joint configuration ``q`` by a gravity-only
+        recursion which skips the velocity and acceleration terms of
+        ``rne``. If q is a matrix (kxn) each row is a configuration and the
+        result is (kxn), ``grav`` may also have a row per configuration.
+
+        :notes:
+            - For repeated evaluation at control rates see ``gravtable``.
+
+        """
+        if q is None:
+            q = self.q
+
+        q, = self._dynargs(q)
+        trajn = q.shape[0]
+
+        if grav is None:
+            grav = self.gravity
+        grav = np.array(grav, dtype=np.float64)
+        if grav.size == 3:
+            grav = getvector(grav, 3, 'row')
+        verifymatrix(grav, (grav.shape[0], 3))
+        grav = np.broadcast_to(grav @ self.base.R, (trajn, 3))
+
+        if out is None:
+            taug = np.empty((trajn, self.n))
+        else:
+            taug = self._outview(out, (trajn, self.n))
+
+        tree = self.tree
+
+        def block(rows):
+            taug[rows] = tree.gravload(q[rows], grav[rows])
+
+        self._parallel(block, trajn, threads)
+
+        if out is not None:
+            return out
+        elif trajn == 1:
+            return taug[0, :]
+        else:
+            return taug
+
+    def coriolis(self, q, qd):
+        """
+        Coriolis and centripetal term
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(n) or (k,n)
+        :param qd: The joint velocities of the robot
+        :type qd: float ndarray(n) or (k,n)
+
+        :return C: The Coriolis matrix
+        :rtype C: float ndarray(n,n) or (k,n,n)
+
+        ``C = coriolis(q, qd)`` calculates the Coriolis/centripetal matrix
+        (nxn) for the robot in configuration q and velocity qd. The product
+        C*qd is the vector of joint force/torque due to velocity coupling.
+        If q and qd are matrices (kxn) the result is (kxnxn).
+
+        :notes:
+            - Joint friction is not included.
+
+        """
+        q, qd = self._dynargs(q, qd)
+
+        C = self.tree.coriolis(q, qd)
+
+        if q.shape[0] == 1:
+            return C[0, :, :]
+        else:
+            return C
+
+    def friction(self, qd):
+        """
+        Joint friction
+
+        :param qd: The joint velocities of the robot
+        :type qd: float ndarray(n)
+        :return: The joint friction forces/torques for the robot
+        :rtype: float ndarray(n,)
+
+        ``tau = friction(qd)`` calculates the vector of joint friction
+        forces/torques for the robot moving with joint velocities qd, see
+        ``ELink.friction``.
+        """
+        qd = getvector(qd, self.n)
+        links = [self.ets[i] for i in self.q_idx]
+        return np.array([link.friction(qd[j]) for j, link in enumerate(links)])
+
+    def nofriction(self, coulomb=True, viscous=False):
+        """
+        Remove joint friction
+
+        :param coulomb: if True, will set the Coulomb friction to 0
+        :type coulomb: bool
+        :param viscous: if True, will set the viscous friction to 0
+        :type viscous: bool
+        :return: A copy of the robot with the friction removed
+        :rtype: ERobot
+
+        ``nf = nofriction(coulomb, viscous)`` copies the robot and returns a
+        robot with the same parameters except the Coulomb and/or viscous
+        friction parameters set to zero.
+
+        :notes:
+            - The copy has the same link tree but no geometry.
+        """
+        nf = self._copy()
+        nf.name = 'NF/' + self.name
+
+        for link in nf.links:
+            if viscous:
+                link.B = 0.0
+            if coulomb:
+                link.Tc = [0.0, 0.0]
+
+        return nf
+
+    def _aba(self, q, qd, torque):
+        """
+        Forward dynamics by the articulated body algorithm
+
+        :param q: The joint angles/configuration of the robot
+        :type q: float ndarray(m,n)
+        :param qd: The joint velocities of the robot
+        :type qd: float ndarray(m,n)
+        :param torque: The joint torques of the robot
+        :type torque: float ndarray(m,n)
+        :return: The joint accelerations
+        :rtype: float ndarray(m,n)
+
+        Called by ``accel``, see ``ETree.aba``.
+        """
+        grav = self.base.R.T @ getvector(self.gravity, 3)
+        tree = self.tree
+
+        qdd = np.empty(q.shape)
+
+        def block(rows):
+            qdd[rows] = tree.aba(q[rows], qd[rows], torque[rows], grav)
+
+        self._parallel(block, q.shape[0])
+
+        return qdd
+
+    def _dynargs(self, *args):
+        # joint space arguments as (m,n) float arrays, a missing argument is
+        # zero
+        try:
+            x = [getvector(args[0], self.n, 'row')]
+        except ValueError:
+            x = [np.array(args[0], dtype=np.float64)]
+            verifymatrix(x[0], (x[0].shape[0], self.n))
+
+        for a in args[1:]:
+            if a is None:
+                x.append(np.zeros(x[0].shape))
+            else:
+                a = np.reshape(np.asarray(a, dtype=np.float64), (-1, self.n))
+                verifymatrix(a, x[0].shape)
+                x.append(a)
+
+        return x
+
     # def teach(
     #         self, block=True, q=None, limits=None,
     #         jointaxes=True, eeframe=True, shadow=True, name=True):
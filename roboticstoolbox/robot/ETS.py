@@ -108,6 +108,42 @@ class ETS(UserList):
         else:
             return self.axis_func(q)
 
+    def T_batch(self, q):
+        """
+        Calculates the transformation matrices of the ET for many values of q
+
+        :param q: The joint coordinates, ignored if this ET is static
+        :type q: float ndarray(m)
+        :return: The transformation matrices of the ET
+        :rtype: float ndarray(m,4,4)
+
+        Vectorised equivalent of ``T`` which evaluates the ET for a whole
+        stack of joint coordinates without building a matrix per element.
+        """
+        q = np.asarray(q, dtype=np.float64)
+
+        if self.jtype is self.STATIC:
+            q = np.full(q.shape, self.eta, dtype=np.float64)
+
+        T = np.zeros(q.shape + (4, 4))
+        T[..., [0, 1, 2, 3], [0, 1, 2, 3]] = 1
+
+        axis = self.axis
+
+        if axis[0] == 'R':
+            # indices of the plane of rotation, in right-handed order
+            i, j = {'Rx': (1, 2), 'Ry': (2, 0), 'Rz': (0, 1)}[axis]
+            c = np.cos(q)
+            s = np.sin(q)
+            T[..., i, i] = c
+            T[..., j, j] = c
+            T[..., i, j] = -s
+            T[..., j, i] = s
+        else:
+            T[..., 'xyz'.index(axis[1]), 3] = q
+
+        return T
+
     def joints(self):
         """
         Get index of joint transforms
@@ -0,0 +1,459 @@
+"""
+Rigid-body dynamics of an ERobot link tree.
+
+An ``ETree`` is a flat table of the links of an ``ERobot``, in the order of
+``ERobot.ets`` so that every link follows its parent, with the constant part
+of each link transform and the inertial parameters of each link.  Inverse
+dynamics, forward dynamics, the joint-space inertia matrix and the Coriolis
+matrix are then evaluated for a stack of joint configurations, shape (m,n),
+with vectorised array operations.  Branching, tree structured, robots are
+supported.
+
+All the spatial quantities are expressed in the robot's base frame about its
+origin, angular then linear, so forces propagate from a link to its parent
+without a change of coordinates.
+
+The table is a snapshot of the link parameters, ``ERobot`` keeps it until a
+link parameter or the end-effector link changes.
+"""
+import numpy as np
+from roboticstoolbox.robot.DHChain import _skew, _crm
+
+
+class ETree:
+    """
+    Dynamic model of the link tree of an ERobot
+
+    :param robot: The robot to compile
+    :type robot: ERobot
+
+    :notes:
+        - The base transform is not part of the tree, gravity is rotated into
+          the base frame instead.
+        - The tool transform is not part of the tree.
+        - A link's centre of mass ``r`` is an SE3, its rotation gives the
+          frame in which the inertia tensor ``I`` is expressed, as for URDF.
+    """
+
+    def __init__(self, robot):
+
+        links = robot.ets
+
+        self.n = robot.n
+        self.M = len(links)
+        self.parent = list(robot._fk_parent)
+        self.ee = links.index(robot.ee_link)
+
+        self.Ts = np.array([link.Ts.A for link in links])
+        self.v = []
+        self.joint = []
+        self.prismatic = []
+        self.axis = []
+
+        j = 0
+        for link in links:
+            if link.jtype == link.VARIABLE:
+                self.v.append(link.v)
+                self.joint.append(j)
+                self.prismatic.append(link.v.axis[0] != 'R')
+                self.axis.append('xyz'.index(link.v.axis[1]))
+                j += 1
+            else:
+                self.v.append(None)
+                self.joint.append(-1)
+                self.prismatic.append(False)
+                self.axis.append(None)
+
+        self.m = np.array([link.m for link in links], dtype=np.float64)
+        self.r = np.array([link.r.A for link in links], dtype=np.float64)
+        self.Icom = np.array(
+            [np.reshape(link.I, (3, 3)) for link in links], dtype=np.float64)
+
+        # actuator parameters, by joint
+        jl = [link for link in links if link.jtype == link.VARIABLE]
+        self.Jm = np.array(
+            [link.G ** 2 * link.Jm for link in jl], dtype=np.float64)
+        self.B = np.array(
+            [link.G ** 2 * link.B for link in jl], dtype=np.float64)
+        self.Tc = np.array(
+            [np.abs(link.G) * np.reshape(link.Tc, 2) for link in jl],
+            dtype=np.float64).reshape((-1, 2))
+
+    def _kinematics(self, q):
+        """
+        Link poses and joint axes in the base frame
+
+        :return: The pose of every link (m,M,4,4) and the motion axis of
+            every link's joint (m,M,6), zero for static links.
+        """
+        m = q.shape[0]
+        M = self.M
+
+        T = np.empty((m, M, 4, 4))
+        S = np.zeros((m, M, 6))
+
+        for i in range(M):
+            p = self.parent[i]
+            if p < 0:
+                T[:, i] = self.Ts[i]
+            else:
+                np.matmul(T[:, p], self.Ts[i], out=T[:, i])
+
+            v = self.v[i]
+            if v is not None:
+                j = self.joint[i]
+                # the joint axis is fixed in the frame before the joint
+                z = T[:, i, :3, self.axis[i]]
+                if self.prismatic[i]:
+                    S[:, i, 3:] = z
+                else:
+                    S[:, i, :3] = z
+                    S[:, i, 3:] = np.cross(T[:, i, :3, 3], z)
+                T[:, i] = T[:, i] @ v.T_batch(q[:, j])
+
+        return T, S
+
+    def _spatial(self, q):
+        """
+        Link poses, joint axes and link inertias in the base frame
+
+        :return: The pose of every link (m,M,4,4), the motion axis of every
+            link's joint (m,M,6), zero for static links, and the spatial
+            inertia of every link (m,M,6,6).
+        """
+        m = q.shape[0]
+        M = self.M
+
+        T, S = self._kinematics(q)
+
+        R = T[..., :3, :3]
+        Rc = R @ self.r[:, :3, :3]
+        c = T[..., :3, 3] + np.einsum('mkij,kj->mki', R, self.r[:, :3, 3])
+
+        C = _skew(c)
+        mC = C * self.m[:, np.newaxis, np.newaxis]
+
+        Il = np.empty((m, M, 6, 6))
+        np.matmul(
+            Rc @ self.Icom, Rc.transpose(0, 1, 3, 2), out=Il[..., :3, :3])
+        Il[..., :3, :3] -= mC @ C
+        Il[..., :3, 3:] = mC
+        Il[..., 3:, :3] = mC.transpose(0, 1, 3, 2)
+        Il[..., 3:, 3:] = np.eye(3) * self.m[:, np.newaxis, np.newaxis]
+
+        return T, S, Il
+
+    def _composite(self, X):
+        # sum X over the subtree rooted at each link, in place
+        for i in range(self.M - 1, -1, -1):
+            p = self.parent[i]
+            if p >= 0:
+                X[:, p] += X[:, i]
+        return X
+
+    def _pairs(self):
+        # (a, b) link index pairs of all joints where a is b or an ancestor
+        # of b, b is the deeper of the two
+        for b in range(self.M):
+            if self.joint[b] < 0:
+                continue
+            a = b
+            while a >= 0:
+                if self.joint[a] >= 0:
+                    yield a, b
+                a = self.parent[a]
+
+    def rne(self, q, qd, qdd, grav, fext=None):
+        """
+        Inverse dynamics
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param qd: Joint velocities, one configuration per row
+        :type qd: float ndarray(m,n)
+        :param qdd: Joint accelerations, one configuration per row
+        :type qdd: float ndarray(m,n)
+        :param grav: Gravity vector in the base frame
+        :type grav: float ndarray(3)
+        :param fext: Wrench applied by the end-effector link, in its own
+            frame, [Fx Fy Fz Mx My Mz]
+        :type fext: float ndarray(6), optional
+        :return: Joint forces for every configuration
+        :rtype: float ndarray(m,n)
+
+        The joint forces include the motor inertia reflected through the
+        gear ratio and joint friction, as for ``DHRobot.rne``.
+        """
+        m = q.shape[0]
+        M = self.M
+
+        T, S, Il = self._spatial(q)
+
+        # forward recursion, link velocities and accelerations, gravity is a
+        # fictitious acceleration of the base
+        v = np.zeros((m, M, 6))
+        a = np.zeros((m, M, 6))
+        a0 = np.r_[0, 0, 0, grav]
+
+        for i in range(M):
+            p = self.parent[i]
+            if p >= 0:
+                v[:, i] = v[:, p]
+                a[:, i] = a[:, p]
+            else:
+                a[:, i] = a0
+
+            j = self.joint[i]
+            if j >= 0:
+                vj = S[:, i] * qd[:, j, np.newaxis]
+                v[:, i] += vj
+                a[:, i] += S[:, i] * qdd[:, j, np.newaxis]
+                a[:, i] += np.matmul(_crm(v[:, i]), vj[..., np.newaxis])[
+                    ..., 0]
+
+        # link forces, f = I a + v x* I v
+        h = np.matmul(Il, v[..., np.newaxis])[..., 0]
+        f = np.matmul(Il, a[..., np.newaxis])[..., 0]
+        f -= np.matmul(
+            _crm(v).transpose(0, 1, 3, 2), h[..., np.newaxis])[..., 0]
+
+        if fext is not None:
+            Re = T[:, self.ee, :3, :3]
+            F = Re @ fext[:3]
+            f[:, self.ee, 3:] += F
+            f[:, self.ee, :3] += Re @ fext[3:] + \
+                np.cross(T[:, self.ee, :3, 3], F)
+
+        # backward recursion, forces transmitted to the parent
+        self._composite(f)
+
+        tau = np.empty((m, self.n))
+        for i in range(M):
+            j = self.joint[i]
+            if j >= 0:
+                tau[:, j] = np.einsum('mk,mk->m', S[:, i], f[:, i])
+
+        # actuator inertia and friction
+        tau += self.Jm * qdd
+        tau += self.B * qd
+        tau += np.where(qd > 0, self.Tc[:, 0], 0.0)
+        tau += np.where(qd < 0, self.Tc[:, 1], 0.0)
+
+        return tau
+
+    def aba(self, q, qd, tau, grav):
+        """
+        Forward dynamics
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param qd: Joint velocities, one configuration per row
+        :type qd: float ndarray(m,n)
+        :param tau: Joint forces, one configuration per row
+        :type tau: float ndarray(m,n)
+        :param grav: Gravity vector in the base frame
+        :type grav: float ndarray(3)
+        :return: Joint accelerations for every configuration
+        :rtype: float ndarray(m,n)
+
+        The accelerations are computed by the articulated body algorithm,
+        with all the spatial quantities in the base frame. The motor inertia
+        adds to the articulated inertia about each joint axis and the joint
+        friction is subtracted from the joint forces, so the result is the
+        inverse of ``rne``.
+        """
+        m = q.shape[0]
+        M = self.M
+
+        T, S, IA = self._spatial(q)
+
+        # forward recursion, link velocities and the acceleration of each
+        # link due to its joint velocity
+        v = np.zeros((m, M, 6))
+        c = np.zeros((m, M, 6))
+        for i in range(M):
+            p = self.parent[i]
+            if p >= 0:
+                v[:, i] = v[:, p]
+
+            j = self.joint[i]
+            if j >= 0:
+                vj = S[:, i] * qd[:, j, np.newaxis]
+                v[:, i] += vj
+                c[:, i] = np.matmul(_crm(v[:, i]), vj[..., np.newaxis])[
+                    ..., 0]
+
+        # bias forces, v x* I v
+        h = np.matmul(IA, v[..., np.newaxis])[..., 0]
+        pA = -np.matmul(
+            _crm(v).transpose(0, 1, 3, 2), h[..., np.newaxis])[..., 0]
+
+        u = tau - self.B * qd
+        u -= np.where(qd > 0, self.Tc[:, 0], 0.0)
+        u -= np.where(qd < 0, self.Tc[:, 1], 0.0)
+
+        # backward recursion, articulated inertias and bias forces
+        U = np.zeros((m, M, 6))
+        D = np.empty((m, self.n))
+        for i in range(M - 1, -1, -1):
+            p = self.parent[i]
+            j = self.joint[i]
+
+            if j >= 0:
+                U[:, i] = np.matmul(IA[:, i], S[:, i, :, np.newaxis])[..., 0]
+                D[:, j] = np.einsum('mk,mk->m', S[:, i], U[:, i]) + self.Jm[j]
+                u[:, j] -= np.einsum('mk,mk->m', S[:, i], pA[:, i])
+
+            if p < 0:
+                continue
+
+            if j >= 0:
+                Ui = U[:, i] / D[:, j, np.newaxis]
+                Ia = IA[:, i] - U[:, i, :, np.newaxis] * Ui[:, np.newaxis, :]
+                IA[:, p] += Ia
+                pA[:, p] += pA[:, i] + Ui * u[:, j, np.newaxis]
+                pA[:, p] += np.matmul(Ia, c[:, i, :, np.newaxis])[..., 0]
+            else:
+                IA[:, p] += IA[:, i]
+                pA[:, p] += pA[:, i]
+
+        # forward recursion, link and joint accelerations, gravity is a
+        # fictitious acceleration of the base
+        a = np.empty((m, M, 6))
+        a0 = np.r_[0, 0, 0, grav]
+        qdd = np.empty((m, self.n))
+        for i in range(M):
+            p = self.parent[i]
+            if p >= 0:
+                a[:, i] = a[:, p] + c[:, i]
+            else:
+                a[:, i] = a0 + c[:, i]
+
+            j = self.joint[i]
+            if j >= 0:
+                qdd[:, j] = (u[:, j] - np.einsum(
+                    'mk,mk->m', U[:, i], a[:, i])) / D[:, j]
+                a[:, i] += S[:, i] * qdd[:, j, np.newaxis]
+
+        return qdd
+
+    def gravload(self, q, grav):
+        """
+        Gravity load
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param grav: Gravity vector in the base frame, one per row
+        :type grav: float ndarray(m,3)
+        :return: Joint forces due to gravity for every configuration
+        :rtype: float ndarray(m,n)
+
+        A gravity-only recursion, only the link poses are needed. The weight
+        of every link acts at its centre of mass and the load on a joint is
+        the component of the wrench of its subtree along the joint axis.
+        """
+        T, S = self._kinematics(q)
+
+        c = T[..., :3, 3] + np.einsum(
+            'mkij,kj->mki', T[..., :3, :3], self.r[:, :3, 3])
+        f = self.m[:, np.newaxis] * grav[:, np.newaxis, :]
+        w = np.empty(S.shape)
+        w[..., :3] = np.cross(c, f)
+        w[..., 3:] = f
+
+        self._composite(w)
+
+        taug = np.empty((q.shape[0], self.n))
+        for i in range(self.M):
+            j = self.joint[i]
+            if j >= 0:
+                taug[:, j] = np.einsum('mk,mk->m', S[:, i], w[:, i])
+        return taug
+
+    def inertia(self, q):
+        """
+        Joint-space inertia matrix
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :return: Inertia matrix for every configuration
+        :rtype: float ndarray(m,n,n)
+
+        The matrix is computed by the Composite Rigid Body Algorithm,
+        element (a,b) is ``S_a' Ic_b S_b`` where joint a is joint b or one of
+        its ancestors and ``Ic_b`` is the inertia of the subtree moved by
+        joint b. Joints on different branches do not couple.
+        """
+        T, S, Il = self._spatial(q)
+        Ic = self._composite(Il)
+
+        Mq = np.zeros((q.shape[0], self.n, self.n))
+        for a, b in self._pairs():
+            F = np.matmul(Ic[:, b], S[:, b, :, np.newaxis])[..., 0]
+            x = np.einsum('mk,mk->m', S[:, a], F)
+            Mq[:, self.joint[a], self.joint[b]] = x
+            Mq[:, self.joint[b], self.joint[a]] = x
+
+        Mq[:, range(self.n), range(self.n)] += self.Jm
+        return Mq
+
+    def coriolis(self, q, qd):
+        """
+        Coriolis and centripetal matrix
+
+        :param q: Joint coordinates, one configuration per row
+        :type q: float ndarray(m,n)
+        :param qd: Joint velocities, one configuration per row
+        :type qd: float ndarray(m,n)
+        :return: Coriolis matrix for every configuration
+        :rtype: float ndarray(m,n,n)
+
+        The matrix is the one defined by the Christoffel symbols of the
+        inertia matrix, computed as for ``DHChain.coriolis``.
+        """
+        m = q.shape[0]
+        M = self.M
+
+        T, S, Il = self._spatial(q)
+
+        # link velocities, a joint axis moves with the parent link
+        v = np.zeros((m, M, 6))
+        Sd = np.zeros((m, M, 6))
+        for i in range(M):
+            p = self.parent[i]
+            if p >= 0:
+                v[:, i] = v[:, p]
+                Sd[:, i] = np.matmul(
+                    _crm(v[:, p]), S[:, i, :, np.newaxis])[..., 0]
+            j = self.joint[i]
+            if j >= 0:
+                v[:, i] += S[:, i] * qd[:, j, np.newaxis]
+
+        # B_l = (crf(v) I - I crm(v) + crfbar(I v)) / 2
+        X = _crm(v)
+        h = np.matmul(Il, v[..., np.newaxis])[..., 0]
+        Bl = -X.transpose(0, 1, 3, 2) @ Il - Il @ X
+        Bl[..., :3, :3] -= _skew(h[..., :3])
+        Bl[..., :3, 3:] -= _skew(h[..., 3:])
+        Bl[..., 3:, :3] -= _skew(h[..., 3:])
+        Bl *= 0.5
+
+        Ic = self._composite(Il)
+        Bc = self._composite(Bl)
+
+        C = np.zeros((m, self.n, self.n))
+        for a, b in self._pairs():
+            ja = self.joint[a]
+            jb = self.joint[b]
+            Sb = S[:, b, :, np.newaxis]
+            G = np.matmul(Ic[:, b], Sd[:, b, :, np.newaxis])[..., 0] + \
+                np.matmul(Bc[:, b], Sb)[..., 0]
+            C[:, ja, jb] = np.einsum('mk,mk->m', S[:, a], G)
+
+            if a != b:
+                F = np.matmul(Ic[:, b], Sb)[..., 0]
+                H = np.matmul(Bc[:, b].transpose(0, 2, 1), Sb)[..., 0]
+                C[:, jb, ja] = np.einsum('mk,mk->m', F, Sd[:, a]) + \
+                    np.einsum('mk,mk->m', H, S[:, a])
+
+        return C
@@ -0,0 +1,251 @@
+"""
+Interpolated gravity load for DHRobot and ERobot.
+
+A ``GravityTable`` holds the gravity load of a robot evaluated on a regular
+grid over the joints which it depends on, usually the proximal joints, and
+interpolates it at run time.  Evaluation is a handful of array operations
+whatever the complexity of the robot, which suits gravity compensation in a
+control loop, and a table can be saved to disk and loaded again without the
+robot model.
+"""
+import numpy as np
+from spatialmath.base import getvector, verifymatrix
+from scipy import interpolate
+
+
+class GravityTable:
+    """
+    Interpolated gravity load
+
+    :param robot: The robot to tabulate
+    :type robot: DHRobot or ERobot
+    :param npoints: Number of grid points for each tabulated joint
+    :type npoints: int or list of int
+    :param joints: Indices of the joints to tabulate, defaults to the joints
+        which the gravity load depends on
+    :type joints: list of int, optional
+    :param qlim: Range of every joint, defaults to the robot's joint limits
+    :type qlim: float ndarray(2,n), optional
+    :param grav: The gravity vector, defaults to the robot's gravity
+    :type grav: float ndarray(3), optional
+    :param q0: Value of the joints which are not tabulated, defaults to zero
+    :type q0: float ndarray(n), optional
+    :param method: Interpolation method, 'linear' or 'cubic'
+    :type method: str
+
+    ``table(q)`` is the gravity load (n) at the joint configuration ``q``
+    (n). If ``q`` is a matrix (kxn) each row is a configuration and the
+    result is (kxn).
+
+    Example:
+
+    .. runblock:: pycon
+
+        >>> import roboticstoolbox as rtb
+        >>> puma = rtb.models.DH.Puma560()
+        >>> table = puma.gravtable(npoints=20)
+        >>> table.joints
+        >>> table(puma.qn)
+
+    :notes:
+        - The table is built by a single batched call to ``gravload``.
+        - The joints which the load depends on are found by perturbing each
+          joint at random configurations, for a serial arm with a vertical
+          first axis the first joint is not needed. Joints which are not
+          tabulated are held at ``q0`` when the table is built and ignored
+          when it is evaluated.
+        - Configurations outside the range of the table are clamped to it.
+        - Multilinear interpolation needs at least 2 points per joint, cubic
+          interpolation at least 4.
+        - The table is a snapshot, it does not change when the payload or
+          any other parameter of the robot changes.
+    """
+
+    def __init__(
+            self, robot, npoints=16, joints=None, qlim=None, grav=None,
+            q0=None, method='linear'):
+
+        n = robot.n
+
+        if qlim is None:
+            qlim = robot.qlim
+        qlim = np.array(qlim, dtype=np.float64)
+        verifymatrix(qlim, (2, n))
+
+        if grav is None:
+            grav = robot.gravity
+        grav = getvector(grav, 3)
+
+        if q0 is None:
+            q0 = np.zeros(n)
+        q0 = getvector(q0, n)
+
+        if joints is None:
+            joints = _gravity_joints(robot, qlim, grav)
+        joints = np.array(joints, dtype=int).reshape(-1)
+
+        lo = qlim[0, joints]
+        hi = qlim[1, joints]
+        if np.any(hi <= lo):
+            raise ValueError(
+                'the range of every tabulated joint must be set, use qlim')
+
+        npoints = np.broadcast_to(
+            np.array(npoints, dtype=int), joints.shape).copy()
+
+        # gravity load at every grid point
+        axes = [np.linspace(a, b, k) for a, b, k in zip(lo, hi, npoints)]
+        q = np.tile(q0, (int(np.prod(npoints)), 1))
+        if len(joints) > 0:
+            grid = np.meshgrid(*axes, indexing='ij')
+            q[:, joints] = np.stack([g.ravel() for g in grid], axis=1)
+
+        tau = np.reshape(robot.gravload(q, grav), (q.shape[0], n))
+
+        self._setup(
+            joints, lo, hi, tau.reshape(tuple(npoints) + (n,)), grav, q0,
+            method)
+
+    def _setup(self, joints, lo, hi, tau, grav, q0, method):
+
+        self.joints = joints
+        self.lo = lo
+        self.hi = hi
+        self.tau = tau
+        self.grav = grav
+        self.q0 = q0
+        self.method = method
+        self.n = tau.shape[-1]
+
+        npoints = np.array(tau.shape[:-1], dtype=int)
+
+        if method == 'linear':
+            if np.any(npoints < 2):
+                raise ValueError('linear interpolation needs 2 points')
+        elif method == 'cubic':
+            if np.any(npoints < 4):
+                raise ValueError('cubic interpolation needs 4 points')
+        else:
+            raise ValueError('unknown interpolation method')
+
+        self.npoints = npoints
+        self.axes = [
+            np.linspace(a, b, k) for a, b, k in zip(lo, hi, npoints)]
+        self._h = (hi - lo) / (npoints - 1)
+
+        # flat table and the offsets of the 2^d corners of a grid cell
+        d = len(joints)
+        self._flat = tau.reshape((-1, self.n))
+        strides = np.ones(d, dtype=int)
+        for k in range(d - 2, -1, -1):
+            strides[k] = strides[k + 1] * npoints[k + 1]
+        self._strides = strides
+        self._bits = (
+            np.arange(2 ** d)[:, np.newaxis] >> np.arange(d)[::-1]) & 1
+        self._offsets = self._bits @ strides
+
+        if method == 'cubic':
+            self._spline = interpolate.RegularGridInterpolator(
+                self.axes, tau, method='cubic')
+
+    def __call__(self, q):
+        """
+        Interpolated gravity load
+
+        :param q: The joint configuration of the robot
+        :type q: float ndarray(n) or (k,n)
+        :return: The gravity load
+        :rtype: float ndarray(n) or (k,n)
+        """
+        trajn = 1
+        try:
+            q = getvector(q, self.n, 'row')
+        except ValueError:
+            trajn = q.shape[0]
+            verifymatrix(q, (trajn, self.n))
+
+        x = np.clip(q[:, self.joints], self.lo, self.hi)
+
+        if self.method == 'linear':
+            tau = self._linear(x)
+        else:
+            tau = self._spline(x)
+
+        if trajn == 1:
+            return tau[0, :]
+        else:
+            return tau
+
+    def _linear(self, x):
+        # multilinear interpolation, the value is the weighted sum of the
+        # values at the corners of the grid cell containing x
+        u = (x - self.lo) / self._h
+        i = np.minimum(u.astype(int), self.npoints - 2)
+        t = u - i
+
+        w = np.where(
+            self._bits, t[:, np.newaxis, :], 1 - t[:, np.newaxis, :]).prod(
+                axis=2)
+        v = self._flat[(i @ self._strides)[:, np.newaxis] + self._offsets]
+
+        return np.einsum('mc,mcn->mn', w, v)
+
+    def save(self, filename):
+        """
+        Save the table
+
+        :param filename: Name of the file, the extension ``.npz`` is added
+            if not given
+        :type filename: str
+
+        The table is written by ``numpy.savez`` and does not refer to the
+        robot, see ``load``.
+        """
+        np.savez(
+            filename, joints=self.joints, lo=self.lo, hi=self.hi,
+            tau=self.tau, grav=self.grav, q0=self.q0,
+            method=np.array(self.method))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a saved table
+
+        :param filename: Name of the file written by ``save``
+        :type filename: str
+        :return: The gravity table
+        :rtype: GravityTable
+        """
+        with np.load(filename) as f:
+            table = cls.__new__(cls)
+            table._setup(
+                f['joints'], f['lo'], f['hi'], f['tau'], f['grav'], f['q0'],
+                str(f['method']))
+        return table
+
+    def __repr__(self):
+        return 'GravityTable(joints={}, npoints={}, method={!r})'.format(
+            [int(j) for j in self.joints], [int(k) for k in self.npoints],
+            self.method)
+
+
+def _gravity_joints(robot, qlim, grav, nsamples=20, tol=1e-9):
+    # indices of the joints which the gravity load depends on, a joint is
+    # needed if changing it alone changes the load at any of a set of random
+    # configurations
+    rng = np.random.default_rng(0)
+
+    lo = np.where(qlim[1] > qlim[0], qlim[0], -np.pi)
+    hi = np.where(qlim[1] > qlim[0], qlim[1], np.pi)
+
+    q = rng.uniform(lo, hi, (nsamples, robot.n))
+    qp = np.tile(q, (robot.n, 1))
+    for j in range(robot.n):
+        qp[j * nsamples:(j + 1) * nsamples, j] = rng.uniform(
+            lo[j], hi[j], nsamples)
+
+    tau = robot.gravload(np.r_[q, qp], grav)
+    dtau = np.abs(tau[nsamples:] - np.tile(tau[:nsamples], (robot.n, 1)))
+    dtau = dtau.reshape((robot.n, -1)).max(axis=1)
+
+    return np.flatnonzero(dtau > tol * (1 + np.abs(tau).max()))
@@ -0,0 +1,192 @@
+"""
+Warm-start seeds for numerical inverse kinematics.
+
+An ``IKSeedTable`` holds the end-effector poses of a robot at a large random
+sample of joint configurations, in a KD-tree over features of the position
+and orientation of the pose. For a desired pose the nearest stored
+configurations are good initial values ``q0`` for the iterative IK solvers,
+which then converge in fewer iterations and more often than from the
+default of all zeros.
+
+A table is sampled once per robot model and saved to a directory of ``.npy``
+files which are memory-mapped when the table is loaded, so many processes
+can share one table without reading it into memory.
+"""
+import os
+import numpy as np
+from scipy.spatial import cKDTree
+from spatialmath import SE3
+
+
+class IKSeedTable:
+    """
+    Initial configurations for inverse kinematics
+
+    :param robot: The robot to sample
+    :type robot: DHRobot
+    :param npoints: Number of joint configurations to sample
+    :type npoints: int
+    :param qlim: Range of every joint, defaults to the robot's joint limits
+    :type qlim: float ndarray(2,n), optional
+    :param weight: Length which scales the orientation features, defaults
+        to a third of the sum of the link lengths
+    :type weight: float, optional
+    :param seed: Seed of the random number generator
+    :type seed: int, optional
+
+    ``table(T)`` is the stored joint configuration (n) whose end-effector
+    pose is nearest to ``T``. If ``T`` contains m poses the result is (m,n),
+    and ``table(T, k)`` is the k nearest configurations (k,n) or (m,k,n).
+
+    Example:
+
+    .. runblock:: pycon
+
+        >>> import roboticstoolbox as rtb
+        >>> puma = rtb.models.DH.Puma560()
+        >>> table = puma.ikseeds(npoints=10000, seed=0)
+        >>> T = puma.fkine(puma.qn)
+        >>> q, failed, _ = puma.ikine(T, q0=table(T))
+
+    :notes:
+        - The distance between two poses is the Euclidean distance between
+          the positions plus ``weight`` times the distance between the first
+          two columns of the rotation matrices, which for small rotations is
+          ``weight`` times the angle between them.
+        - Configurations are drawn uniformly within the joint limits, a
+          revolute joint without limits is drawn from [-pi, pi], any
+          prismatic joint must have joint limits defined.
+        - The base and tool transforms of the robot are included in the
+          stored poses.
+        - The KD-tree is built again when a table is loaded, from the
+          memory-mapped features.
+    """
+
+    def __init__(self, robot, npoints=100000, qlim=None, weight=None,
+                 seed=None):
+
+        n = robot.n
+
+        if qlim is None:
+            qlim = robot.qlim
+        qlim = np.array(qlim, dtype=np.float64).reshape((2, n))
+
+        revolutes = np.array([not link.sigma for link in robot.links])
+        unset = qlim[1] <= qlim[0]
+        if np.any(unset & ~revolutes):
+            raise ValueError('For a prismatic joint, '
+                             'the joint limits must be set')
+        lo = np.where(unset, -np.pi, qlim[0])
+        hi = np.where(unset, np.pi, qlim[1])
+
+        if weight is None:
+            weight = np.sum(np.abs([robot.a, robot.d])) / 3
+
+        rng = np.random.default_rng(seed)
+        q = rng.uniform(lo, hi, (npoints, n))
+
+        if hasattr(robot, 'fkine_batch'):
+            T = robot.fkine_batch(q)
+        else:
+            T = np.array([robot.fkine(qk).A for qk in q])
+
+        self._setup(q, _features(T, weight), weight)
+
+    def _setup(self, q, features, weight):
+
+        self.q = q
+        self.features = features
+        self.weight = float(weight)
+        self.n = q.shape[1]
+        self._tree = cKDTree(features)
+
+    def __call__(self, T, k=1):
+        """
+        Nearest stored configurations
+
+        :param T: The desired end-effector pose
+        :type T: SE3 or float ndarray(4,4) or (m,4,4)
+        :param k: Number of configurations for each pose
+        :type k: int
+        :return: The configurations, nearest first
+        :rtype: float ndarray(n), (k,n), (m,n) or (m,k,n)
+        """
+        return self.query(T, k)[1]
+
+    def query(self, T, k=1):
+        """
+        Nearest stored configurations and their distances
+
+        :param T: The desired end-effector pose
+        :type T: SE3 or float ndarray(4,4) or (m,4,4)
+        :param k: Number of configurations for each pose
+        :type k: int
+        :return: The distances of the stored poses from ``T`` and the
+            configurations, nearest first
+        :rtype: float ndarray, float ndarray
+
+        The shapes are those of ``table(T, k)`` without the last dimension
+        for the distances.
+        """
+        if isinstance(T, SE3):
+            T = T.A
+        T = np.array(T, dtype=np.float64)
+        trajn = 1 if T.ndim == 2 else T.shape[0]
+        T = T.reshape((-1, 4, 4))
+
+        d, i = self._tree.query(_features(T, self.weight), k=k)
+        q = self.q[i]
+
+        if trajn == 1:
+            return d[0], q[0]
+        else:
+            return d, q
+
+    def save(self, dirname):
+        """
+        Save the table
+
+        :param dirname: Name of a directory, which is created if necessary
+        :type dirname: str
+
+        The arrays are written by ``numpy.save``, one file each, and the
+        table does not refer to the robot, see ``load``.
+        """
+        os.makedirs(dirname, exist_ok=True)
+        np.save(os.path.join(dirname, 'q.npy'), self.q)
+        np.save(os.path.join(dirname, 'features.npy'), self.features)
+        np.save(os.path.join(dirname, 'weight.npy'), self.weight)
+
+    @classmethod
+    def load(cls, dirname, mmap=True):
+        """
+        Load a saved table
+
+        :param dirname: Name of the directory written by ``save``
+        :type dirname: str
+        :param mmap: Memory-map the arrays rather than read them
+        :type mmap: bool
+        :return: The seed table
+        :rtype: IKSeedTable
+        """
+        mode = 'r' if mmap else None
+        table = cls.__new__(cls)
+        table._setup(
+            np.load(os.path.join(dirname, 'q.npy'), mmap_mode=mode),
+            np.load(os.path.join(dirname, 'features.npy'), mmap_mode=mode),
+            np.load(os.path.join(dirname, 'weight.npy')))
+        return table
+
+    def __len__(self):
+        return self.q.shape[0]
+
+    def __repr__(self):
+        return 'IKSeedTable(npoints={}, n={}, weight={:.4g})'.format(
+            len(self), self.n, self.weight)
+
+
+def _features(T, weight):
+    # the features (m,9) of the poses T (m,4,4) in the KD-tree, the position
+    # and the scaled first two columns of the rotation matrix
+    return np.c_[
+        T[:, :3, 3], weight * T[:, :3, 0], weight * T[:, :3, 1]]
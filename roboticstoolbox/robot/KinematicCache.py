@@ -0,0 +1,135 @@
+"""
+Configuration-keyed cache for kinematic results.
+
+A robot may hold a ``KinematicCache`` which remembers the results of its
+kinematic methods, ``fkine``, ``jacob0`` and friends, keyed on the method, the
+exact joint vector and any link range arguments.  Repeated queries at the same
+configuration, common within one control cycle, are then served without
+recomputation.
+
+The cache is bounded and least-recently-used entries are evicted first.  It
+is cleared by the robot whenever its kinematics could have changed, a link
+parameter, the base or tool transform, or the base or end-effector link.
+"""
+from collections import OrderedDict, namedtuple
+from functools import wraps
+import numpy as np
+from spatialmath import SE3
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+
+class KinematicCache:
+    """
+    Bounded least-recently-used cache of kinematic results
+
+    :param maxsize: The maximum number of results held
+    :type maxsize: int
+    """
+
+    def __init__(self, maxsize=128):
+
+        if maxsize < 1:
+            raise ValueError('maxsize must be at least 1')
+
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        """
+        Look up a result
+
+        :param key: The key of the result
+        :type key: tuple
+        :return: A copy of the result, or None if not present
+        """
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return _copy(value)
+
+    def put(self, key, value):
+        """
+        Store a result
+
+        :param key: The key of the result
+        :type key: tuple
+        :param value: The result, a copy is stored
+        :type value: ndarray or SE3
+        """
+        self._data[key] = _copy(value)
+        self._data.move_to_end(key)
+
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """
+        Remove all results, the statistics are kept
+        """
+        self._data.clear()
+
+    def info(self):
+        """
+        Cache statistics
+
+        :return: hits, misses, maxsize and current size of the cache
+        :rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self))
+
+
+def _copy(value):
+    # results are copied in and out so callers cannot modify the cache
+    if isinstance(value, np.ndarray):
+        return value.copy()
+    elif isinstance(value, SE3):
+        return SE3([T.copy() for T in value.data], check=False)
+    else:
+        return value
+
+
+def cached(func):
+    """
+    Decorate a robot kinematic method so that it uses the robot's cache
+
+    The wrapped method must take the joint coordinates as its first
+    argument.  The result is cached only when the robot has a cache, the
+    joint coordinates are numeric and all the other arguments are hashable,
+    otherwise the method is called directly.
+    """
+    @wraps(func)
+    def wrapper_cached(self, q=None, *args, **kwargs):
+        cache = self._kcache
+        if cache is None:
+            return func(self, q, *args, **kwargs)
+
+        qk = self.q if q is None else q
+        try:
+            qk = np.asarray(qk)
+            if qk.dtype == object:
+                raise TypeError
+            qk = np.ascontiguousarray(qk, dtype=np.float64)
+            key = (
+                func.__name__, qk.shape, qk.tobytes(), args,
+                tuple(sorted(kwargs.items())))
+            hash(key)
+        except (TypeError, ValueError):
+            return func(self, q, *args, **kwargs)
+
+        value = cache.get(key)
+        if value is None:
+            value = func(self, q, *args, **kwargs)
+            cache.put(key, value)
+        return value
+    return wrapper_cached
@@ -3,6 +3,7 @@ import numpy as np
 from spatialmath import SE3
 from spatialmath.base.argcheck import getvector
 from roboticstoolbox.robot.Link import Link
+from roboticstoolbox.robot.KinematicCache import KinematicCache
 # from roboticstoolbox.backend import URDF
 # from roboticstoolbox.backend import xacro
 from pathlib import PurePath, PurePosixPath
@@ -23,6 +24,7 @@ class Robot:
             keywords=(),
             symbolic=False):
 
+        self._kcache = None
         self.name = name
         self.manufacturer = manufacturer
         self.symbolic = symbolic
@@ -92,8 +94,47 @@ class Robot:
     #
     #     return data
 
-    def dynchanged(self):
+    def dynchanged(self, link=None):
         self._dynchanged = True
+        self.cache_clear()
+
+    def cache_enable(self, maxsize=128):
+        """
+        Enable the kinematics cache
+
+        :param maxsize: The maximum number of results held
+        :type maxsize: int
+
+        Results of the kinematic methods, ``fkine``, ``jacob0``, ``jacobe``
+        etc., are remembered for the most recently used joint
+        configurations. The cache is cleared automatically when a link
+        parameter, or the base or tool transform, changes.
+        """
+        self._kcache = KinematicCache(maxsize)
+
+    def cache_disable(self):
+        """
+        Disable the kinematics cache and discard its contents
+        """
+        self._kcache = None
+
+    def cache_clear(self):
+        """
+        Discard the contents of the kinematics cache
+        """
+        if self._kcache is not None:
+            self._kcache.clear()
+
+    def cache_info(self):
+        """
+        Kinematics cache statistics
+
+        :return: hits, misses, maxsize and current size of the cache, or
+            None if the cache is not enabled
+        :rtype: CacheInfo
+        """
+        if self._kcache is not None:
+            return self._kcache.info()
 
     @property
     def n(self):
@@ -150,9 +191,10 @@ class Robot:
         if T is None or isinstance(T, SE3):
             self._base = T
         elif SE3.isvalid(T):
-            self._tool = SE3(T, check=False)
+            self._base = SE3(T, check=False)
         else:
             raise ValueError('base must be set to None (no tool) or an SE3')
+        self.cache_clear()
 
     @tool.setter
     def tool(self, T):
@@ -166,6 +208,7 @@ class Robot:
             self._tool = SE3(T, check=False)
         else:
             raise ValueError('tool must be set to None (no tool) or an SE3')
+        self.cache_clear()
 
     @gravity.setter
     def gravity(self, gravity_new):
@@ -56,7 +56,7 @@ class Shape(object):
             filename=None,
             stype=None):
 
-        self._wT = SE3()
+        self._wT = np.eye(4)
         self.co = None
         self.base = base
         self.wT = None
@@ -109,9 +109,10 @@ class Shape(object):
 
     def _update_pyb(self):
         if _pyb and self.co is not None:
-            q = r2q(self.wT.R)
+            T = self.wT
+            q = r2q(T.R)
             rot = [q[1], q[2], q[3], q[0]]
-            p.resetBasePositionAndOrientation(self.co, self.wT.t, rot)
+            p.resetBasePositionAndOrientation(self.co, T.t, rot)
 
     def _init_pob(self):
         pass
@@ -134,15 +135,28 @@ class Shape(object):
 
     @property
     def wT(self):
-        return self._wT * self.base
+        return SE3(self._wT @ self.base.A, check=False)
 
     @wT.setter
     def wT(self, T):
-        if not isinstance(T, SE3):
-            T = SE3(T)
+        # The pose is copied, the world pose is only composed when it is
+        # read
+        if T is None:
+            T = np.eye(4)
+        elif isinstance(T, SE3):
+            T = np.array(T.A, dtype=np.float64)
+        elif not isinstance(T, np.ndarray) or T.shape != (4, 4):
+            T = SE3(T).A
+        else:
+            T = np.array(T, dtype=np.float64)
         self._wT = T
         self._update_pyb()
 
+    def _bind(self, T):
+        # Hold a 4x4 view of an ERobot link pose buffer by reference, so the
+        # shape follows the link as fkine_all updates the buffer in place
+        self._wT = T
+
     @property
     def base(self):
         return self._base
@@ -196,18 +210,19 @@ class Shape(object):
         if not isinstance(T, SE3):
             T = SE3(T)
         self._base = T
-        self._update_pyb()
 
     @_check_pyb
     def closest_point(self, shape, min_distance):
 
         if not self.pinit:
             self._init_pob()
-            self._update_pyb()
 
         if not shape.pinit:
             shape._init_pob()
-            shape._update_pyb()
+
+        # poses are pushed to pybullet only when a query needs them
+        self._update_pyb()
+        shape._update_pyb()
 
         ret = p.getClosestPoints(self.co, shape.co, min_distance)
 
@@ -7,6 +7,8 @@ from roboticstoolbox.robot.ERobot import ERobot
 from roboticstoolbox.robot.ELink import ELink
 from roboticstoolbox.robot.ETS import ETS
 from roboticstoolbox.robot.Shape import Shape, Cylinder
+from roboticstoolbox.robot.GravityTable import GravityTable
+from roboticstoolbox.robot.IKSeedTable import IKSeedTable
 
 __all__ = [
     'Robot',
@@ -23,5 +25,7 @@ __all__ = [
     'ERobot',
     'ETS',
     'Shape',
-    'Cylinder'
+    'Cylinder',
+    'GravityTable',
+    'IKSeedTable'
     ]
@@ -55,6 +55,7 @@ frne = Extension(
         sources=[
             './roboticstoolbox/core/vmath.c',
             './roboticstoolbox/core/ne.c',
+            './roboticstoolbox/core/aba.c',
             './roboticstoolbox/core/frne.c'])
 
 setup(
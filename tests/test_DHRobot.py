@@ -8,6 +8,9 @@ import numpy as np
 import roboticstoolbox as rp
 import spatialmath as sm
 import unittest
+import tempfile
+import os
+from concurrent.futures import ThreadPoolExecutor
 
 
 class TestDHRobot(unittest.TestCase):
@@ -180,6 +183,211 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(TT[2].A, T1)
         nt.assert_array_almost_equal(TT[3].A, T1)
 
+    def test_fkine_batch(self):
+        l0 = rp.PrismaticMDH(theta=0.3, a=0.2, alpha=0.4, offset=0.1)
+        l1 = rp.RevoluteMDH(d=0.5, a=0.1, alpha=-0.2, offset=0.3, flip=True)
+        l2 = rp.RevoluteMDH(d=0.1, a=0.3, alpha=1.2)
+
+        r0 = rp.DHRobot(
+            [l0, l1, l2], base=sm.SE3.Rx(0.3) * sm.SE3(1, 2, 3),
+            tool=sm.SE3.Ry(0.2) * sm.SE3(0, 0, 0.4))
+        puma = rp.models.DH.Puma560()
+        puma.base = sm.SE3.Rz(0.2)
+        puma.tool = sm.SE3(0, 0, 0.1)
+
+        for robot in [r0, puma]:
+            qq = np.random.rand(5, robot.n)
+
+            TT = robot.fkine_batch(qq)
+            self.assertEqual(TT.shape, (5, 4, 4))
+
+            for k in range(5):
+                T = robot.links[0].A(qq[k, 0])
+                for j in range(1, robot.n):
+                    T *= robot.links[j].A(qq[k, j])
+                T = robot.base * T * robot.tool
+                nt.assert_array_almost_equal(TT[k], T.A)
+
+            T3 = robot.fkine_batch(qq, se3=True)
+            self.assertIsInstance(T3, sm.SE3)
+            self.assertEqual(len(T3), 5)
+            nt.assert_array_almost_equal(T3[2].A, TT[2])
+
+        puma.q = puma.qn
+        nt.assert_array_almost_equal(
+            puma.fkine_batch()[0], puma.fkine(puma.qn).A)
+
+    def test_chain(self):
+        l0 = rp.PrismaticMDH(theta=0.3, a=0.2, alpha=0.4, offset=0.1)
+        l1 = rp.RevoluteMDH(d=0.5, a=0.1, alpha=-0.2, offset=0.3, flip=True)
+        l2 = rp.RevoluteMDH(d=0.1, a=0.3, alpha=1.2)
+
+        r0 = rp.DHRobot(
+            [l0, l1, l2], base=sm.SE3.Rx(0.3) * sm.SE3(1, 2, 3),
+            tool=sm.SE3.Ry(0.2) * sm.SE3(0, 0, 0.4))
+        puma = rp.models.DH.Puma560()
+        puma.base = sm.SE3.Rz(0.2)
+        puma.tool = sm.SE3(0, 0, 0.1)
+
+        for robot in [r0, puma]:
+            q = np.random.rand(robot.n)
+
+            # the symbolic flag forces the per-link reference path
+            robot.symbolic = True
+            Je = robot.jacobe(q)
+            J0 = robot.jacob0(q)
+            Tall = robot.fkine_all(q)
+            robot.symbolic = False
+
+            nt.assert_array_almost_equal(robot.jacobe(q), Je)
+            nt.assert_array_almost_equal(robot.jacob0(q), J0)
+
+            T = robot.fkine_all(q)
+            self.assertEqual(len(T), robot.n)
+            for Tk, Tr in zip(T, Tall):
+                nt.assert_array_almost_equal(Tk.A, Tr.A)
+
+            T = robot.fkine_all(q, old=False)
+            self.assertEqual(len(T), robot.n + 1)
+            nt.assert_array_almost_equal(T[0].A, robot.base.A)
+
+    def test_jacob_batch(self):
+        l0 = rp.PrismaticMDH(theta=0.3, a=0.2, alpha=0.4, offset=0.1)
+        l1 = rp.RevoluteMDH(d=0.5, a=0.1, alpha=-0.2, offset=0.3, flip=True)
+        l2 = rp.RevoluteMDH(d=0.1, a=0.3, alpha=1.2)
+
+        r0 = rp.DHRobot(
+            [l0, l1, l2], base=sm.SE3.Rx(0.3) * sm.SE3(1, 2, 3),
+            tool=sm.SE3.Ry(0.2) * sm.SE3(0, 0, 0.4))
+        puma = rp.models.DH.Puma560()
+        puma.base = sm.SE3.Rz(0.2)
+        puma.tool = sm.SE3(0, 0, 0.1)
+
+        for robot in [r0, puma]:
+            qq = np.random.rand(7, robot.n)
+
+            # force evaluation in several blocks
+            robot.chain.chunk = 3
+
+            Je = robot.jacobe_batch(qq)
+            J0 = robot.jacob0_batch(qq)
+            J0v = robot.jacob0v_batch(qq)
+            Jev = robot.jacobev_batch(qq)
+            self.assertEqual(Je.shape, (7, 6, robot.n))
+            self.assertEqual(J0.shape, (7, 6, robot.n))
+            self.assertEqual(J0v.shape, (7, 6, 6))
+
+            for k in range(7):
+                nt.assert_array_almost_equal(Je[k], robot.jacobe(qq[k]))
+                nt.assert_array_almost_equal(J0[k], robot.jacob0(qq[k]))
+                nt.assert_array_almost_equal(J0v[k], robot.jacob0v(qq[k]))
+                nt.assert_array_almost_equal(Jev[k], robot.jacobev(qq[k]))
+
+        puma.q = puma.qn
+        nt.assert_array_almost_equal(
+            puma.jacob0_batch()[0], puma.jacob0(puma.qn))
+
+        with self.assertRaises(TypeError):
+            rp.models.DH.Puma560(symbolic=True).jacob0_batch(puma.qn)
+
+    def test_jacob_batch_flip(self):
+        puma = rp.models.DH.Puma560()
+        puma.links[1].flip = True
+        puma.links[4].flip = True
+        qq = np.random.rand(3, 6)
+        dt = 1e-6
+
+        J0 = puma.jacob0_batch(qq)
+        Je = puma.jacobe_batch(qq)
+        for k in range(3):
+            # finite differences of the end-effector pose
+            T = puma.fkine(qq[k]).A
+            Jn = np.empty((6, 6))
+            for j in range(6):
+                dq = np.zeros(6)
+                dq[j] = dt
+                T2 = puma.fkine(qq[k] + dq).A
+                dR = T2[:3, :3] @ T[:3, :3].T
+                Jn[:3, j] = (T2[:3, 3] - T[:3, 3]) / dt
+                Jn[3:, j] = [dR[2, 1], dR[0, 2], dR[1, 0]]
+                Jn[3:, j] /= dt
+
+            nt.assert_array_almost_equal(J0[k], Jn, decimal=4)
+            nt.assert_array_almost_equal(puma.jacob0(qq[k]), Jn, decimal=4)
+            nt.assert_array_almost_equal(Je[k], puma.jacobe(qq[k]))
+
+    def test_chain_invalidate(self):
+        puma = rp.models.DH.Puma560()
+        q = puma.qn
+
+        chain = puma.chain
+        self.assertIs(puma.chain, chain)
+
+        T = puma.fkine(q)
+        puma.links[1].a = 0.5
+        self.assertIsNot(puma.chain, chain)
+        self.assertFalse(np.allclose(puma.fkine(q).A, T.A))
+
+        for attr, value in [('offset', 0.2), ('flip', True)]:
+            chain = puma.chain
+            T = puma.fkine(q)
+            setattr(puma.links[1], attr, value)
+            self.assertIsNot(puma.chain, chain)
+            self.assertFalse(np.allclose(puma.fkine(q).A, T.A))
+
+    def test_cache(self):
+        puma = rp.models.DH.Puma560()
+        q = puma.qn
+
+        self.assertIsNone(puma.cache_info())
+        T = puma.fkine(q)
+
+        puma.cache_enable(maxsize=4)
+        T1 = puma.fkine(q)
+        T2 = puma.fkine(q)
+        J1 = puma.jacob0(q)
+        J2 = puma.jacob0(q)
+        nt.assert_array_almost_equal(T1.A, T.A)
+        nt.assert_array_almost_equal(T2.A, T.A)
+        nt.assert_array_almost_equal(J1, J2)
+
+        info = puma.cache_info()
+        self.assertEqual(info.hits, 2)
+        self.assertEqual(info.misses, 2)
+        self.assertEqual(info.currsize, 2)
+
+        # results handed out are copies
+        J2[0, 0] = 100
+        nt.assert_array_almost_equal(puma.jacob0(q), J1)
+
+        # the stored configuration is a key like any other
+        puma.q = q
+        nt.assert_array_almost_equal(puma.fkine().A, T.A)
+
+        # link parameter changes invalidate the cache
+        puma.links[1].a = 0.5
+        self.assertEqual(puma.cache_info().currsize, 0)
+        self.assertFalse(np.allclose(puma.fkine(q).A, T.A))
+
+        # as do base and tool changes
+        puma.fkine(q)
+        puma.base = sm.SE3(1, 2, 3)
+        self.assertEqual(puma.cache_info().currsize, 0)
+        nt.assert_array_almost_equal(
+            puma.fkine(q).A, puma.fkine_batch(q)[0])
+        puma.tool = sm.SE3(0, 0, 1)
+        self.assertEqual(puma.cache_info().currsize, 0)
+
+        # bounded size
+        for k in range(10):
+            puma.jacobe(np.random.rand(6))
+        self.assertEqual(puma.cache_info().currsize, 4)
+
+        puma.cache_clear()
+        self.assertEqual(puma.cache_info().currsize, 0)
+        puma.cache_disable()
+        self.assertIsNone(puma.cache_info())
+
     def test_links(self):
         l0 = rp.PrismaticDH()
         with self.assertRaises(TypeError):
@@ -736,6 +944,78 @@ class TestDHRobot(unittest.TestCase):
                 T, mask=[1, 1, 0, 0, 0, 0], ilimit=1,
                 search=True, slimit=1)
 
+    def test_ikine_batch(self):
+        puma = rp.models.DH.Puma560()
+        rng = np.random.default_rng(0)
+        q = puma.qn + rng.uniform(-0.5, 0.5, (20, 6))
+        T = puma.fkine_batch(q)
+
+        # an unreachable pose fails, the others are solved
+        T[7] = sm.SE3(5, 0, 0).A
+        q0 = np.tile(puma.qn, (20, 1))
+
+        qb, failed, err = puma.ikine_batch(T, q0=puma.qn, ilimit=100)
+        qi, failedi, erri = puma.ikine(
+            sm.SE3([Tk for Tk in T]), q0=q0, ilimit=100)
+
+        nt.assert_array_almost_equal(qb, qi)
+        nt.assert_array_equal(failed, failedi)
+        self.assertEqual(len(err), len(erri))
+        self.assertEqual(np.flatnonzero(failed).tolist(), [7])
+
+        ok = ~failed
+        nt.assert_array_almost_equal(puma.fkine_batch(qb[ok]), T[ok])
+
+        # a single pose, with a mask
+        Tm = sm.SE3(T[0])
+        mask = [1, 1, 1, 0, 0, 0]
+        qm, failm, _ = puma.ikine_batch(Tm, q0=puma.qn, mask=mask)
+        nt.assert_array_almost_equal(
+            qm, puma.ikine(Tm, q0=puma.qn, mask=mask)[0])
+        self.assertFalse(failm)
+        self.assertEqual(qm.shape, (6,))
+
+        qr, failr, errr = puma.ikine_batch(T, q0=q0, rlimit=2)
+        self.assertTrue(failr[7])
+        self.assertIn('rejected-step', errr[0])
+
+        with self.assertRaises(ValueError):
+            puma.ikine_batch(T, q0=np.zeros((3, 6)))
+
+    def test_ikine_search(self):
+        puma = rp.models.DH.Puma560()
+        T = puma.fkine(puma.qn)
+
+        q, failed, err = puma.ikine_search(T, seed=0)
+        self.assertFalse(failed)
+        self.assertEqual(err, [])
+        nt.assert_array_almost_equal(puma.fkine(q).A, T.A)
+
+        # the 8 solution branches of the arm
+        q, failed, _ = puma.ikine_search(
+            T, nsolutions=8, slimit=400, seed=1)
+        self.assertFalse(failed)
+        self.assertEqual(q.shape, (8, 6))
+        nt.assert_array_almost_equal(
+            puma.fkine_batch(q), np.tile(T.A, (8, 1, 1)))
+        d = np.abs(q[:, np.newaxis] - q[np.newaxis])
+        self.assertTrue(np.all(d.max(axis=2) + np.eye(8) > 1e-3))
+
+        # reproducible
+        q2, _, _ = puma.ikine_search(T, nsolutions=8, slimit=400, seed=1)
+        nt.assert_array_equal(q, q2)
+
+        # unreachable, the best attempt is returned
+        q, failed, err = puma.ikine_search(
+            sm.SE3(5, 0, 0), slimit=10, ilimit=20)
+        self.assertTrue(failed)
+        self.assertEqual(q.shape, (6,))
+        self.assertEqual(len(err), 1)
+
+        q, failed, _ = puma.ikine(T, search=True, slimit=20)
+        self.assertFalse(failed)
+        nt.assert_array_almost_equal(puma.fkine(q).A, T.A)
+
     def test_ikine3(self):
         l0 = rp.RevoluteDH(alpha=np.pi / 2)
         l1 = rp.RevoluteDH(a=0.4318)
@@ -928,6 +1208,68 @@ class TestDHRobot(unittest.TestCase):
         with self.assertRaises(ValueError):
             r3.ikine6s(T)
 
+    def test_ikine6s_batch(self):
+        puma = rp.models.DH.Puma560()
+        rng = np.random.default_rng(0)
+        T = puma.fkine_batch(rng.uniform(-1, 1, (10, 6)))
+        T[3] = sm.SE3(0, 10, 10).A
+
+        q, valid = puma.ikine6s_batch(T)
+        self.assertEqual(q.shape, (10, 8, 6))
+        self.assertTrue(np.all(valid[np.arange(10) != 3]))
+        self.assertFalse(np.any(valid[3]))
+
+        for k in range(8):
+            qk, _ = puma.ikine6s(
+                sm.SE3([Tk for Tk in T[:3]]), left=not k & 4,
+                elbow_up=not k & 2, wrist_flip=bool(k & 1))
+            nt.assert_array_almost_equal(q[:3, k], qk)
+            nt.assert_array_almost_equal(puma.fkine_batch(q[:3, k]), T[:3])
+
+        q, valid = puma.ikine6s_batch(sm.SE3(T[0]))
+        self.assertEqual(valid.shape, (1, 8))
+
+        with self.assertRaises(ValueError):
+            rp.models.DH.Panda().ikine6s_batch(T)
+
+    def test_ikine6s_batch_offset(self):
+        kr5 = rp.models.DH.KR5()
+        rng = np.random.default_rng(0)
+        q0 = rng.uniform(-1, 1, (10, 6))
+        T = kr5.fkine_batch(q0)
+
+        q, valid = kr5.ikine6s_batch(T)
+        self.assertTrue(np.all(np.sum(valid, axis=1) >= 4))
+        for j in range(10):
+            nt.assert_array_almost_equal(
+                kr5.fkine_batch(q[j, valid[j]]),
+                np.broadcast_to(T[j], (np.sum(valid[j]), 4, 4)))
+
+            # the configuration of q0 is one of the solutions
+            e = np.angle(np.exp(1j * (q[j, valid[j]] - q0[j])))
+            self.assertTrue(np.any(np.all(np.abs(e) < 1e-6, axis=1)))
+
+        qk, _ = kr5.ikine6s(sm.SE3(T[0]))
+        nt.assert_array_almost_equal(kr5.fkine(qk).A, T[0])
+
+    def test_ikine3_batch(self):
+        l0 = rp.RevoluteDH(alpha=np.pi / 2)
+        l1 = rp.RevoluteDH(a=0.4318)
+        l2 = rp.RevoluteDH(d=0.15005, a=0.0203, alpha=-np.pi / 2)
+        r0 = rp.DHRobot([l0, l1, l2])
+        rng = np.random.default_rng(0)
+        T = r0.fkine_batch(rng.uniform(-1, 1, (6, 3)))
+        T[2, :3, 3] = [3, 0, 0]
+
+        q, valid = r0.ikine3_batch(T)
+        self.assertEqual(q.shape, (6, 4, 3))
+        nt.assert_array_equal(valid.all(axis=1), np.arange(6) != 2)
+        self.assertFalse(np.any(valid[2]))
+
+        for k in range(4):
+            qk = r0.ikine3(T[0], left=not k & 2, elbow_up=not k & 1)
+            nt.assert_array_almost_equal(q[0, k], qk)
+
     def test_ikinem(self):
         puma = rp.models.DH.Puma560()
         q = puma.qr
@@ -966,6 +1308,51 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(
             T.A - puma.fkine(q1).A, np.zeros((4, 4)), decimal=4)
 
+    def test_ikcost(self):
+        panda = rp.models.DH.Panda()
+        panda.base = sm.SE3(0.1, 0.2, 0.3) * sm.SE3.Rz(0.4)
+        panda.tool = sm.SE3(0, 0, 0.1) * sm.SE3.Rx(0.3)
+        rng = np.random.default_rng(0)
+
+        q = rng.uniform(-1, 1, (3, 7))
+        T, J = panda.chain.fkine_jacobe(q, panda.base, panda.tool)
+        nt.assert_array_almost_equal(T, panda.fkine_batch(q))
+        nt.assert_array_almost_equal(J, panda.jacobe_batch(q))
+
+        Tinv = np.linalg.inv(panda.fkine(rng.uniform(-1, 1, 7)).A)
+        omega = np.diag([1, 1, 1, 2])
+        for qk in q:
+            E, g = panda._ikcost(qk, Tinv, omega)
+            self.assertAlmostEqual(
+                E, np.sum(((Tinv @ panda.fkine(qk).A - np.eye(4)) @
+                           omega) ** 2))
+            gd = [(panda._ikcost(qk + dq, Tinv, omega)[0] -
+                   panda._ikcost(qk - dq, Tinv, omega)[0]) / 2e-6
+                  for dq in np.eye(7) * 1e-6]
+            nt.assert_array_almost_equal(g, gd, decimal=5)
+
+        # a flipped joint reverses the gradient of its joint coordinate
+        puma = rp.models.DH.Puma560()
+        puma.links[1].flip = True
+        Tinv = np.linalg.inv(puma.fkine(puma.qn).A)
+        q = rng.uniform(-1, 1, 6)
+        E, g = puma._ikcost(q, Tinv, omega)
+        gd = [(puma._ikcost(q + dq, Tinv, omega)[0] -
+               puma._ikcost(q - dq, Tinv, omega)[0]) / 2e-6
+              for dq in np.eye(6) * 1e-6]
+        nt.assert_array_almost_equal(g, gd, decimal=5)
+
+    def test_ik_flip(self):
+        puma = rp.models.DH.Puma560()
+        puma.links[1].flip = True
+        T = puma.fkine([0.2, -0.5, 0.4, 0.1, 0.3, 0.2])
+
+        q, _, _ = puma.ikunc(T)
+        nt.assert_array_almost_equal(puma.fkine(q).A, T.A, decimal=4)
+
+        q, _, _ = puma.ikcon(T)
+        nt.assert_array_almost_equal(puma.fkine(q).A, T.A, decimal=4)
+
     def test_rne(self):
         puma = rp.models.DH.Puma560()
 
@@ -1008,6 +1395,80 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(t0[0, :], tr0, decimal=4)
         nt.assert_array_almost_equal(t0[1, :], tr1, decimal=4)
 
+    def test_rne_batch(self):
+        from frne import frne, frne_batch
+        puma = rp.models.DH.Puma560()
+        puma.links[1].Tc = [0.4, -0.3]
+        m = 20
+        q = np.random.rand(m, 6)
+        qd = np.random.rand(m, 6) - 0.5
+        qdd = np.random.rand(m, 6)
+        fext = np.r_[1.0, 2, 3, 1, 2, 3]
+
+        tau = puma.rne(q, qd, qdd, fext=fext)
+        grav = puma.gravity
+        for i in range(m):
+            tr = frne(puma._rne_ob, q[i], qd[i], qdd[i], grav, fext)
+            nt.assert_array_almost_equal(tau[i], tr)
+
+        mdh = rp.models.DH.Puma560()
+        mdh.links[2].sigma = 1
+        tr = mdh.rne(q, qd, qdd)
+        for i in range(m):
+            nt.assert_array_almost_equal(tr[i], mdh.rne(q[i], qd[i], qdd[i]))
+
+        # written in place
+        out = np.zeros((m, 6))
+        frne_batch(puma._rne_ob, q, qd, qdd, grav, fext, out)
+        nt.assert_array_almost_equal(out, tau)
+
+        # non contiguous inputs
+        qf = np.asfortranarray(q)
+        nt.assert_array_almost_equal(puma.rne(qf, qd, qdd, fext=fext), tau)
+
+        with self.assertRaises(ValueError):
+            frne_batch(puma._rne_ob, q, qd, qdd, grav, fext, out[1:])
+        with self.assertRaises(TypeError):
+            frne_batch(
+                puma._rne_ob, q, qd, qdd, grav, fext,
+                np.zeros((m, 6), dtype=np.float32))
+        with self.assertRaises(ValueError):
+            frne_batch(puma._rne_ob, q, qd, qdd, grav[:2], fext, out)
+
+    def test_rne_threads(self):
+        puma = rp.models.DH.Puma560()
+        puma.thread_rows = 10
+        m = 95
+        q = np.random.rand(m, 6)
+        qd = np.random.rand(m, 6) - 0.5
+        qdd = np.random.rand(m, 6)
+
+        tau = puma.rne(q, qd, qdd, threads=1)
+        for threads in [2, 3, 0]:
+            nt.assert_array_equal(puma.rne(q, qd, qdd, threads=threads), tau)
+
+        out = np.zeros((m, 6))
+        puma.rne(q, qd, qdd, out=out, threads=4)
+        nt.assert_array_equal(out, tau)
+
+        taug = puma.gravload(q, threads=1)
+        nt.assert_array_equal(puma.gravload(q, threads=4), taug)
+        nt.assert_array_almost_equal(taug[7], puma.gravload(q[7]))
+
+        M = puma.inertia(q, threads=1)
+        nt.assert_array_equal(puma.inertia(q, threads=4), M)
+
+        taui = puma.itorque(q, qdd, threads=4)
+        nt.assert_array_equal(puma.itorque(q, qdd, threads=1), taui)
+        nt.assert_array_almost_equal(taui[5], M[5] @ qdd[5])
+
+        # the default comes from the robot
+        puma.threads = 3
+        nt.assert_array_equal(puma.rne(q, qd, qdd), tau)
+
+        with self.assertRaises(ValueError):
+            puma.rne(q, qd, qdd, threads=-1)
+
     def test_rne_delete(self):
         puma = rp.models.DH.Puma560()
 
@@ -1022,6 +1483,110 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(t0, tr0, decimal=4)
         nt.assert_array_almost_equal(t1, tr0, decimal=4)
 
+    def test_rne_update(self):
+        puma = rp.models.DH.Puma560()
+        q = np.random.rand(5, 6)
+        qd = np.random.rand(5, 6) - 0.5
+        qdd = np.random.rand(5, 6)
+
+        puma.rne(q, qd, qdd)
+        ob = puma._rne_ob
+        L0 = puma._rne_L.copy()
+
+        puma.links[2].m = 7.5
+        puma.links[2].r = [0.1, 0.02, -0.03]
+        puma.links[4].I = [0.01, 0.02, 0.03]
+        puma.links[4].Tc = [0.3, -0.2]
+        self.assertEqual(puma._rne_stale, {2, 4})
+
+        # the C robot is updated in place, other links are not repacked
+        tau = puma.rne(q, qd, qdd)
+        self.assertIs(puma._rne_ob, ob)
+        self.assertEqual(puma._rne_stale, set())
+        nt.assert_array_equal(puma._rne_L[[0, 1, 3, 5]], L0[[0, 1, 3, 5]])
+        self.assertEqual(puma._rne_L[2, 6], 7.5)
+
+        puma2 = rp.models.DH.Puma560()
+        puma2.links[2].m = 7.5
+        puma2.links[2].r = [0.1, 0.02, -0.03]
+        puma2.links[4].I = [0.01, 0.02, 0.03]
+        puma2.links[4].Tc = [0.3, -0.2]
+        nt.assert_array_almost_equal(tau, puma2.rne(q, qd, qdd))
+
+        # a copy inherits the packed parameters
+        puma3 = puma.perturb(0)
+        nt.assert_array_almost_equal(puma3.rne(q, qd, qdd), tau)
+
+        # a frictionless copy packs its own links and tracks their changes
+        puma4 = puma.nofriction(True, True)
+        for link in puma2.links:
+            link.B = 0
+            link.Tc = [0, 0]
+        nt.assert_array_almost_equal(
+            puma4.rne(q, qd, qdd), puma2.rne(q, qd, qdd))
+        puma4.links[3].m = 2.0
+        puma2.links[3].m = 2.0
+        nt.assert_array_almost_equal(
+            puma4.rne(q, qd, qdd), puma2.rne(q, qd, qdd))
+        nt.assert_array_almost_equal(puma.rne(q, qd, qdd), tau)
+
+        # a robot level change rebuilds the C robot
+        puma.gravity = [0, 0, 9.81]
+        puma.rne(q, qd, qdd)
+        self.assertIsNot(puma._rne_ob, ob)
+
+    def test_rne_update_mdh(self):
+        puma = rp.models.DH.Puma560()
+        q = np.random.rand(5, 6)
+        qd = np.random.rand(5, 6) - 0.5
+        qdd = np.random.rand(5, 6)
+        puma.rne(q, qd, qdd)
+        ob = puma._rne_ob
+
+        # a change of convention builds a new C robot object
+        for link in puma.links[:-1]:
+            link.mdh = 1
+        self.assertEqual(puma.mdh, 0)
+        with self.assertRaises(ValueError):
+            puma.rne(q, qd, qdd)
+
+        puma.links[-1].mdh = 1
+        self.assertEqual(puma.mdh, 1)
+
+        mdh = rp.DHRobot([
+            rp.RevoluteMDH(
+                d=L.d, a=L.a, alpha=L.alpha, offset=L.offset, m=L.m, r=L.r,
+                I=L.I, Jm=L.Jm, B=L.B, Tc=L.Tc, G=L.G)
+            for L in puma.links])
+        nt.assert_array_almost_equal(
+            puma.rne(q, qd, qdd), mdh.rne(q, qd, qdd))
+        self.assertIsNot(puma._rne_ob, ob)
+
+    def test_rne_update_threads(self):
+        puma = rp.models.DH.Puma560()
+        q = np.random.rand(2000, 6)
+        qd = np.random.rand(2000, 6) - 0.5
+        qdd = np.random.rand(2000, 6)
+        tau = [puma.rne(q, qd, qdd)]
+        puma.links[2].m = 7.5
+        tau.append(puma.rne(q, qd, qdd))
+        puma.links[2].m = 4.8
+
+        # the link mass changes while other threads evaluate batches, each
+        # batch sees one set of parameters
+        def worker():
+            return puma.rne(q, qd, qdd, threads=2)
+
+        with ThreadPoolExecutor(4) as pool:
+            futures = [pool.submit(worker) for _ in range(8)]
+            for k in range(20):
+                puma.links[2].m = [4.8, 7.5][k % 2]
+            results = [f.result() for f in futures]
+
+        for res in results:
+            self.assertTrue(any(np.allclose(res, t) for t in tau))
+        self.assertEqual(puma._rne_busy, 0)
+
     def test_accel(self):
         puma = rp.models.DH.Puma560()
         puma.q = puma.qn
@@ -1040,6 +1605,128 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(qdd1[0, :], res, decimal=4)
         nt.assert_array_almost_equal(qdd1[1, :], res, decimal=4)
 
+    def test_accel_aba(self):
+        puma = rp.models.DH.Puma560()
+        q = puma.qn
+        qd = [0.1, 0.2, 0.8, 0.2, 0.5, 1.0]
+        torque = [1.0, 3.2, 1.8, 0.1, 0.7, 4.6]
+
+        res = [-7.4102, -9.8432, -10.9694, -4.4314, -0.9881, 21.0228]
+
+        nt.assert_array_almost_equal(
+            puma.accel(q, qd, torque, method='aba'), res, decimal=4)
+
+        for robot in [
+                rp.models.DH.Stanford(), rp.models.DH.Panda(),
+                rp.models.DH.Ball()]:
+            for link in robot.links:
+                link.m = 2.0
+                link.r = [0.1, -0.2, 0.3]
+                link.I = [0.3, 0.2, 0.1, 0.01, 0.02, 0.03]
+                link.Jm = 0.1
+                link.G = 2.0
+                link.B = 0.1
+                link.Tc = [0.2, -0.3]
+            robot.base = sm.SE3.Rx(0.3)
+
+            q = np.random.rand(5, robot.n)
+            qd = np.random.rand(5, robot.n) - 0.5
+            torque = np.random.rand(5, robot.n)
+
+            nt.assert_array_almost_equal(
+                robot.accel(q, qd, torque, method='aba'),
+                robot.accel(q, qd, torque))
+
+        with self.assertRaises(ValueError):
+            puma.accel(q, qd, torque, method='foo')
+
+    def test_fdyn_aba(self):
+        puma = rp.models.DH.Puma560().nofriction()
+
+        tw = puma.fdyn(0.2, puma.qn, dt=0.05)
+        ta = puma.fdyn(0.2, puma.qn, dt=0.05, method='aba')
+
+        nt.assert_array_almost_equal(ta.q, tw.q)
+        nt.assert_array_almost_equal(ta.qd, tw.qd)
+
+    def test_fdyn_ensemble(self):
+        puma = rp.models.DH.Puma560().nofriction()
+        q0 = np.r_[[puma.qn, puma.qz, puma.qr]]
+
+        def pd(robot, t, q, qd, qstar):
+            return (qstar - q) * 20 - qd * 5
+
+        targs = {'qstar': puma.qn}
+        tg = puma.fdyn_ensemble(0.2, q0, 1e-3, pd, targs, method='aba')
+
+        self.assertEqual(tg.t.shape, (201,))
+        self.assertEqual(tg.q.shape, (3, 201, 6))
+        self.assertEqual(tg.x.shape, (3, 201, 12))
+        nt.assert_array_almost_equal(tg.q[:, 0, :], q0)
+        nt.assert_array_almost_equal(tg.qd[:, 0, :], 0)
+
+        # each member agrees with the adaptive single state integrator
+        sargs = {'rtol': 1e-9, 'atol': 1e-9}
+        for k in range(3):
+            tr = puma.fdyn(
+                0.2, q0[k], lambda r, t, q, qd: pd(r, t, q, qd, puma.qn),
+                sargs=sargs)
+            nt.assert_array_almost_equal(tg.q[k, -1, :], tr.q[-1], decimal=5)
+            nt.assert_array_almost_equal(
+                tg.qd[k, -1, :], tr.qd[-1], decimal=5)
+
+        out = np.zeros((3, 201, 12))
+        te = puma.fdyn_ensemble(
+            0.2, q0, 1e-3, pd, targs, integrator='euler', out=out)
+        self.assertIs(te.x, out)
+        # first order method
+        nt.assert_allclose(te.q[:, -1], tg.q[:, -1], atol=0.02)
+
+        with self.assertRaises(ValueError):
+            puma.fdyn_ensemble(0.2, q0, 1e-3, integrator='foo')
+        with self.assertRaises(RuntimeError):
+            puma.fdyn_ensemble(
+                0.2, q0, 1e-3, lambda r, t, q, qd: np.zeros(6))
+
+    def test_out(self):
+        puma = rp.models.DH.Puma560()
+        puma.base = sm.SE3.Rz(0.2)
+        puma.tool = sm.SE3(0, 0, 0.1)
+        q = puma.qn
+        qq = np.random.rand(3, 6)
+
+        T = np.empty((4, 4))
+        self.assertIs(puma.fkine(q, out=T), T)
+        nt.assert_array_almost_equal(T, puma.fkine(q).A)
+
+        TT = np.empty((3, 4, 4))
+        self.assertIs(puma.fkine(qq, out=TT), TT)
+        nt.assert_array_almost_equal(TT[1], puma.fkine(qq[1]).A)
+
+        J = np.empty((6, 6))
+        self.assertIs(puma.jacob0(q, out=J), J)
+        nt.assert_array_almost_equal(J, puma.jacob0(q))
+        self.assertIs(puma.jacobe(q, out=J), J)
+        nt.assert_array_almost_equal(J, puma.jacobe(q))
+
+        tau = np.empty(6)
+        self.assertIs(puma.rne(q, q, q, out=tau), tau)
+        nt.assert_array_almost_equal(tau, puma.rne(q, q, q))
+
+        M = np.empty((6, 6))
+        self.assertIs(puma.inertia(q, out=M), M)
+        nt.assert_array_almost_equal(M, puma.inertia(q))
+
+        self.assertIs(puma.gravload(q, out=tau), tau)
+        nt.assert_array_almost_equal(tau, puma.gravload(q))
+
+        tau = np.empty((3, 6))
+        self.assertIs(puma.gravload(qq, out=tau), tau)
+        nt.assert_array_almost_equal(tau[2], puma.gravload(qq[2]))
+
+        with self.assertRaises(ValueError):
+            puma.gravload(qq, out=np.empty((2, 6)))
+
     def test_inertia(self):
         puma = rp.models.DH.Puma560()
         puma.q = puma.qn
@@ -1060,6 +1747,198 @@ class TestDHRobot(unittest.TestCase):
         # nt.assert_array_almost_equal(I1[0, :, :], Ir, decimal=4)
         # nt.assert_array_almost_equal(I1[1, :, :], Ir, decimal=4)
 
+    def test_inertia_crba(self):
+        from roboticstoolbox.robot.Dynamics import Dynamics
+
+        for robot in [
+                rp.models.DH.Puma560(), rp.models.DH.Stanford(),
+                rp.models.DH.Panda()]:
+            for link in robot.links:
+                link.m = 2.0
+                link.r = [0.1, -0.2, 0.3]
+                link.I = [0.3, 0.2, 0.1, 0.01, 0.02, 0.03]
+                link.Jm = 0.1
+                link.G = 2.0
+
+            q = np.random.rand(5, robot.n)
+
+            # reference, one rne call per column
+            Mr = Dynamics.inertia(robot, q)
+
+            nt.assert_array_almost_equal(robot.inertia(q), Mr)
+            nt.assert_array_almost_equal(robot.inertia(q[1]), Mr[1])
+
+            out = np.zeros((5, robot.n, robot.n))
+            self.assertIs(robot.inertia(q, out=out), out)
+            nt.assert_array_almost_equal(out, Mr)
+
+            # the chain is recompiled when an inertial parameter changes
+            robot.links[0].m = 5.0
+            nt.assert_array_almost_equal(
+                robot.inertia(q), Dynamics.inertia(robot, q))
+
+        # a flipped joint reverses its axis
+        puma = rp.models.DH.Puma560()
+        q = np.random.rand(6)
+        D = np.diag([1, -1, 1, 1, 1, 1.0])
+        M0 = puma.inertia(D @ q)
+        puma.links[1].flip = True
+        nt.assert_array_almost_equal(puma.inertia(q), D @ M0 @ D)
+
+    def test_gravload_chain(self):
+        puma = rp.models.DH.Puma560()
+        puma.base = sm.SE3.Rx(0.3)
+        q = np.random.rand(10, 6)
+        zero = np.zeros(6)
+
+        taug = puma.gravload(q)
+        for i in range(10):
+            nt.assert_array_almost_equal(
+                taug[i], puma.rne(q[i], zero, zero))
+        nt.assert_array_almost_equal(puma.gravload(q[2]), taug[2])
+
+        # gravity per configuration
+        grav = np.random.rand(10, 3)
+        taug = puma.gravload(q, grav=grav)
+        for i in range(10):
+            nt.assert_array_almost_equal(
+                taug[i], puma.rne(q[i], zero, zero, grav=grav[i]))
+
+        out = np.zeros((10, 6))
+        puma.gravload(q, grav=grav, out=out)
+        nt.assert_array_almost_equal(out, taug)
+
+    def test_gravtable(self):
+        puma = rp.models.DH.Puma560()
+        q = np.random.uniform(puma.qlim[0], puma.qlim[1], (50, 6))
+        taug = puma.gravload(q)
+
+        # the first joint axis is vertical and the last one is the axis of
+        # symmetry of the last link
+        table = puma.gravtable(npoints=20)
+        nt.assert_array_equal(table.joints, [1, 2, 3, 4])
+        nt.assert_allclose(table(q), taug, atol=0.5)
+        nt.assert_array_almost_equal(table(q[3]), table(q)[3])
+
+        # exact at the grid points
+        qg = puma.qn.copy()
+        qg[1:5] = [table.axes[k][5] for k in range(4)]
+        nt.assert_array_almost_equal(table(qg), puma.gravload(qg))
+
+        cubic = puma.gravtable(npoints=10, method='cubic')
+        nt.assert_allclose(cubic(q), taug, atol=0.05)
+
+        # outside the range the value is clamped
+        qo = puma.qn.copy()
+        qo[1] = puma.qlim[1, 1] + 1
+        qc = puma.qn.copy()
+        qc[1] = puma.qlim[1, 1]
+        nt.assert_array_almost_equal(table(qo), table(qc))
+
+        with tempfile.TemporaryDirectory() as d:
+            filename = os.path.join(d, 'puma')
+            table.save(filename)
+            saved = rp.GravityTable.load(filename + '.npz')
+        nt.assert_array_equal(saved(q), table(q))
+
+        with self.assertRaises(ValueError):
+            puma.gravtable(npoints=3, method='cubic')
+        with self.assertRaises(ValueError):
+            puma.gravtable(method='nearest')
+
+    def test_ikseeds(self):
+        puma = rp.models.DH.Puma560()
+        table = puma.ikseeds(npoints=5000, seed=0)
+        self.assertEqual(len(table), 5000)
+
+        # a stored pose finds its own configuration
+        T = puma.fkine_batch(table.q[[10, 20, 30]])
+        nt.assert_array_equal(table(T), table.q[[10, 20, 30]])
+        nt.assert_array_equal(table(sm.SE3(T[0])), table.q[10])
+
+        d, q = table.query(T, k=4)
+        self.assertEqual(q.shape, (3, 4, 6))
+        nt.assert_array_almost_equal(d[:, 0], 0)
+        self.assertTrue(np.all(np.diff(d, axis=1) >= 0))
+        self.assertEqual(table(T[0], k=2).shape, (2, 6))
+
+        # seeds are nearer the solution than the default
+        rng = np.random.default_rng(1)
+        T = puma.fkine_batch(rng.uniform(-2, 2, (50, 6)))
+        _, failed, _ = puma.ikine_batch(T, q0=table(T), ilimit=100)
+        _, failed0, _ = puma.ikine_batch(T, ilimit=100)
+        self.assertLess(np.sum(failed), np.sum(failed0))
+
+        with tempfile.TemporaryDirectory() as d:
+            table.save(d)
+            saved = rp.IKSeedTable.load(d)
+            self.assertIsInstance(saved.q, np.memmap)
+            nt.assert_array_equal(saved(T), table(T))
+            self.assertEqual(saved.weight, table.weight)
+            del saved
+
+    def test_codegen(self):
+        from roboticstoolbox.robot import DHCodegen
+
+        def dyn(j):
+            return dict(
+                m=1 + j, r=[0.1, -0.05 * j, 0.2], G=2, Jm=0.01,
+                I=[0.3, 0.2, 0.1, 0.01, 0.02, 0.03])
+
+        robots = [
+            rp.DHRobot([
+                rp.RevoluteMDH(a=0.2, alpha=np.pi / 2, **dyn(0)),
+                rp.PrismaticMDH(alpha=-np.pi / 2, offset=0.1, **dyn(1)),
+                rp.RevoluteMDH(a=0.3, d=0.1, flip=True, **dyn(2))],
+                name='mdh'),
+            rp.DHRobot([
+                rp.RevoluteDH(a=0.4, alpha=np.pi / 2, offset=0.3, **dyn(0)),
+                rp.RevoluteDH(a=0.3, d=0.1, **dyn(1))],
+                name='dh', base=sm.SE3.Rx(0.3))]
+
+        for robot in robots:
+            q = np.random.rand(10, robot.n)
+            qd = np.random.rand(10, robot.n)
+            M = robot.inertia(q)
+            C = robot.coriolis(q, qd)
+            G = robot.gravload(q)
+
+            with tempfile.TemporaryDirectory() as d:
+                code = robot.codegen(d)
+                self.assertTrue(
+                    os.path.exists(DHCodegen.filename(robot, d)))
+                self.assertIs(robot.code, code)
+
+                nt.assert_array_almost_equal(robot.inertia(q), M)
+                nt.assert_array_almost_equal(robot.coriolis(q, qd), C)
+                nt.assert_array_almost_equal(robot.gravload(q), G)
+                nt.assert_array_almost_equal(robot.inertia(q[1]), M[1])
+
+                # a later run finds the module in the cache, it is only
+                # imported once
+                copy = robot._copy()
+                self.assertIs(DHCodegen.load(copy, d, generate=False), code)
+
+                # the cache is only searched when asked to
+                cachedir = DHCodegen.cachedir
+                try:
+                    DHCodegen.cachedir = d
+                    self.assertIsNone(copy.code)
+                    copy = robot._copy()
+                    copy.codegen_autoload = True
+                    self.assertIs(copy.code, code)
+                finally:
+                    DHCodegen.cachedir = cachedir
+
+                # a parameter change makes it stale
+                key = DHCodegen.key(robot)
+                robot.links[0].m = 5
+                self.assertNotEqual(DHCodegen.key(robot), key)
+                self.assertIsNone(robot.code)
+                self.assertIsNone(DHCodegen.load(robot, d, generate=False))
+                self.assertIn(
+                    DHCodegen.filename(robot, d), DHCodegen._missing)
+
     def test_cinertia(self):
         puma = rp.models.DH.Puma560()
         puma.q = puma.qn
@@ -1104,6 +1983,66 @@ class TestDHRobot(unittest.TestCase):
         nt.assert_array_almost_equal(C1[0, :, :], Cr, decimal=4)
         nt.assert_array_almost_equal(C1[1, :, :], Cr, decimal=4)
 
+    def test_coriolis_sweep(self):
+        from roboticstoolbox.robot.Dynamics import Dynamics
+
+        for robot in [rp.models.DH.Stanford(), rp.models.DH.Panda()]:
+            for link in robot.links:
+                link.m = 2.0
+                link.r = [0.1, -0.2, 0.3]
+                link.I = [0.3, 0.2, 0.1, 0.01, 0.02, 0.03]
+
+            q = np.random.rand(5, robot.n)
+            qd = np.random.rand(5, robot.n) - 0.5
+
+            # reference, n^2/2 rne calls
+            Cr = Dynamics.coriolis(robot, q, qd)
+
+            nt.assert_array_almost_equal(robot.coriolis(q, qd), Cr)
+            nt.assert_array_almost_equal(robot.coriolis(q[2], qd[2]), Cr[2])
+
+            # C qd is the velocity dependent part of the torque
+            robot.gravity = [0, 0, 0]
+            tau = robot.rne(q, qd, np.zeros((5, robot.n)))
+            nt.assert_array_almost_equal(
+                np.einsum('kij,kj->ki', Cr, qd), tau)
+
+        # Mdot - 2C is skew symmetric
+        puma = rp.models.DH.Puma560()
+        q = np.random.rand(6)
+        qd = np.random.rand(6)
+        dt = 1e-6
+        Md = (puma.inertia(q + qd * dt) - puma.inertia(q - qd * dt)) / 2 / dt
+        N = Md - 2 * puma.coriolis(q, qd)
+        nt.assert_array_almost_equal(N, -N.T)
+
+    def test_dynamics_flip(self):
+        from roboticstoolbox.robot.Dynamics import Dynamics
+
+        puma = rp.models.DH.Puma560()
+        puma.links[1].flip = True
+        q = np.random.rand(5, 6)
+        qd = np.random.rand(5, 6) - 0.5
+        torque = np.random.rand(5, 6)
+
+        # rne and the compiled chain agree on the joint direction
+        nt.assert_array_almost_equal(
+            puma.accel(q, qd, torque),
+            puma.accel(q, qd, torque, method='aba'))
+        nt.assert_array_almost_equal(
+            puma.inertia(q), Dynamics.inertia(puma, q))
+
+        zero = np.zeros((5, 6))
+        nt.assert_array_almost_equal(
+            puma.gravload(q), puma.rne(q, zero, zero))
+
+        # C qd is the velocity dependent part of the torque, without friction
+        puma = puma.nofriction(True, True)
+        self.assertTrue(puma.links[1].flip)
+        tau = puma.rne(q, qd, zero, grav=[0, 0, 0])
+        nt.assert_array_almost_equal(
+            np.einsum('kij,kj->ki', puma.coriolis(q, qd), qd), tau)
+
     def test_gravload(self):
         puma = rp.models.DH.Puma560()
         puma.q = puma.qn
@@ -1162,7 +2101,6 @@ class TestDHRobot(unittest.TestCase):
 #         self.assertEqual(str(puma), res)
 
     def test_paycap(self):
-        self.skipTest("error introduced with DHLink change")
         puma = rp.models.DH.Puma560()
         puma.q = puma.qn
         q = puma.qn
@@ -1176,15 +2114,42 @@ class TestDHRobot(unittest.TestCase):
             3.76356072e+00, 1.93649167e+00]
 
         wmax0, joint = puma.paycap(w, tauR, q=q, frame=0)
-        wmax1, _ = puma.paycap(np.c_[w, w], tauR, q=np.c_[q, q], frame=0)
+        wmax1, _ = puma.paycap(
+            np.c_[w, w].T, tauR, q=np.c_[q, q].T, frame=0)
         wmax2, _ = puma.paycap(w, tauR, frame=0)
 
         nt.assert_allclose(wmax0, res0)
         self.assertEqual(joint, 1)
-        nt.assert_allclose(wmax1[:, 0], res0)
-        nt.assert_allclose(wmax1[:, 1], res0)
+        nt.assert_allclose(wmax1[0, :], res0)
+        nt.assert_allclose(wmax1[1, :], res0)
         nt.assert_allclose(wmax2, res0)
 
+    def test_paycap_traj(self):
+        puma = rp.models.DH.Puma560()
+        q = np.random.uniform(puma.qlim[0], puma.qlim[1], (10, 6))
+        w = [0, 0, -20, 0, 0, 0]
+        tauR = np.array([97, 186, 89, 24, 20, 21])
+        tauR = np.c_[tauR, -tauR]
+
+        wmax, joint = puma.paycap(w, tauR, q=q)
+        self.assertEqual(wmax.shape, (10, 6))
+        for i in range(10):
+            wi, ji = puma.paycap(w, tauR, q=q[i])
+            nt.assert_array_almost_equal(wmax[i], wi)
+            self.assertEqual(joint[i], ji)
+
+        # a wrench per pose
+        wT = np.tile(w, (10, 1))
+        wT[3] = [0, 5, 0, 0, 0, 1]
+        wmax, joint = puma.paycap(wT, tauR, q=q, frame=0)
+        wi, ji = puma.paycap(wT[3], tauR, q=q[3], frame=0)
+        nt.assert_array_almost_equal(wmax[3], wi)
+        self.assertEqual(joint[3], ji)
+
+        # constant wrench over a trajectory
+        tau = puma.pay(w, q=q)
+        nt.assert_array_almost_equal(tau[4], puma.pay(w, q=q[4]))
+
     def test_jacob_dot(self):
         puma = rp.models.DH.Puma560()
         puma.q = puma.qr
@@ -122,6 +122,14 @@ class TestETS(unittest.TestCase):
         nt.assert_array_almost_equal(TT[2].A, ans)
         nt.assert_array_almost_equal(TT[3].A, ans)
 
+        # fkine takes one configuration per column, jacob0 one per row
+        qq = np.random.rand(7, 3)
+        TT = panda.fkine(qq)
+        J = panda.jacob0(qq.T)
+        for k in range(3):
+            nt.assert_array_almost_equal(TT[k].A, panda.fkine(qq[:, k]).A)
+            nt.assert_array_almost_equal(J[k], panda.jacob0(qq[:, k]))
+
     def test_fkine_all(self):
         pm = rp.models.DH.Panda()
         p = rp.models.ETS.Panda()
@@ -139,6 +147,294 @@ class TestETS(unittest.TestCase):
         for i in range(7):
             nt.assert_array_almost_equal(p.ets[i]._fk.A, r2[i].A)
 
+    def test_fkine_all_buffer(self):
+        c0 = rp.Cylinder(0.1, 0.2, base=sm.SE3(0, 0, 0.1))
+        c1 = rp.Cylinder(0.1, 0.2)
+        l0 = rp.ELink(rp.ETS.tz(0.3), rp.ETS.rz(), geometry=c0)
+        l1 = rp.ELink(rp.ETS.tx(0.2), rp.ETS.ry(), parent=l0, collision=c1)
+        l2 = rp.ELink(rp.ETS.tx(0.1), parent=l1)
+        r = rp.ERobot([l0, l1, l2], base=sm.SE3.Rx(0.2))
+        q = [0.3, -0.5]
+
+        T = r.fkine_all(q)
+        self.assertEqual(T.shape, (3, 4, 4))
+
+        T0 = r.base * l0.A(q[0])
+        T1 = T0 * l1.A(q[1])
+        T2 = T1 * l2.A()
+        nt.assert_array_almost_equal(T[0], T0.A)
+        nt.assert_array_almost_equal(T[2], T2.A)
+        nt.assert_array_almost_equal(l1._fk.A, T1.A)
+
+        # shapes read the pose from the buffer
+        nt.assert_array_almost_equal(c0.wT.A, (T0 * c0.base).A)
+        nt.assert_array_almost_equal(c1.wT.A, T1.A)
+
+        # the buffer is updated in place and the shapes follow it, the
+        # returned poses are a copy
+        fk = l1._fk
+        Tq = T
+        T = r.fkine_all([0.1, 0.2])
+        T1 = r.base * l0.A(0.1) * l1.A(0.2)
+        nt.assert_array_almost_equal(c1.wT.A, T1.A)
+        self.assertFalse(np.allclose(fk.A, T1.A))
+        self.assertIsNot(T, Tq)
+        nt.assert_array_almost_equal(Tq[2], T2.A)
+
+        # shapes assigned later are bound to the link pose too
+        c2 = rp.Cylinder(0.1, 0.2)
+        l2.geometry = c2
+        nt.assert_array_almost_equal(c2.wT.A, T[2])
+
+        # a pose set by the user is copied
+        c3 = rp.Cylinder(0.1, 0.2)
+        Tu = sm.SE3(1, 2, 3).A
+        c3.wT = Tu
+        Tu[0, 3] = 5
+        nt.assert_array_almost_equal(c3.wT.t, [1, 2, 3])
+
+    def test_cache(self):
+        panda = rp.models.ETS.Panda()
+        q = np.array([1.4, 0.2, 1.8, 0.7, 0.1, 3.1, 2.9])
+        panda.cache_enable()
+
+        T = panda.fkine(q)
+        J = panda.jacob0(q)
+        nt.assert_array_almost_equal(panda.fkine(q).A, T.A)
+        nt.assert_array_almost_equal(panda.jacob0(q), J)
+        self.assertEqual(panda.cache_info().hits, 2)
+
+        # the link range is part of the key
+        J4 = panda.jacob0(q, to_link=panda.ets[4])
+        self.assertEqual(J4.shape, (6, 5))
+
+        # changing the end-effector link invalidates the cache
+        panda.ee_link = panda.ets[5]
+        self.assertEqual(panda.cache_info().currsize, 0)
+        self.assertFalse(np.allclose(panda.fkine(q).A, T.A))
+
+        panda.base = sm.SE3(1, 0, 0)
+        self.assertEqual(panda.cache_info().currsize, 0)
+
+    def test_out(self):
+        panda = rp.models.ETS.Panda()
+        panda.base = sm.SE3(0.1, 0, 0)
+        q = np.array([1.4, 0.2, 1.8, 0.7, 0.1, 3.1, 2.9])
+
+        T = np.empty((4, 4))
+        self.assertIs(panda.fkine(q, out=T), T)
+        nt.assert_array_almost_equal(T, panda.fkine(q).A)
+
+        TT = np.empty((2, 4, 4))
+        panda.fkine(np.c_[q, q * 0.5], out=TT)
+        nt.assert_array_almost_equal(TT[1], panda.fkine(q * 0.5).A)
+
+        J = np.empty((6, 7))
+        self.assertIs(panda.jacob0(q, out=J), J)
+        nt.assert_array_almost_equal(J, panda.jacob0(q))
+        self.assertIs(panda.jacobe(q, out=J), J)
+        nt.assert_array_almost_equal(J, panda.jacobe(q))
+
+        qq = np.random.rand(3, 7)
+        JJ = np.empty((3, 6, 7))
+        self.assertIs(panda.jacob0(qq, out=JJ), JJ)
+        nt.assert_array_almost_equal(JJ[2], panda.jacob0(qq[2]))
+
+    def _dh_to_erobot(self, dh):
+        # an ERobot equivalent to a modified DH robot, the centre of mass
+        # frame is rotated and the inertia given in that frame
+        links = []
+        parent = None
+        R = sm.SE3.RPY([0.1, 0.2, 0.3])
+        for j, L in enumerate(dh.links):
+            ets = rp.ETS.rx(L.alpha) * rp.ETS.tx(L.a) * rp.ETS.tz(L.d)
+            link = rp.ELink(
+                ets, rp.ETS.rz(), name=str(j), parent=parent,
+                m=L.m, r=sm.SE3(L.r) * R, I=R.R.T @ L.I @ R.R,
+                Jm=L.Jm, G=L.G, B=L.B, Tc=L.Tc)
+            links.append(link)
+            parent = link
+        return rp.ERobot(links)
+
+    def _dh_dyn(self):
+        dh = rp.models.DH.Panda()
+        for j, L in enumerate(dh.links):
+            L.m = 1.0 + j / 10
+            L.r = [0.1, -0.05 * j, 0.02]
+            L.I = [0.3, 0.2, 0.1, 0.01, 0.02, 0.03]
+            L.Jm = 0.1
+            L.G = 2.0
+            L.B = 0.1
+            L.Tc = [0.2, -0.3]
+        return dh
+
+    def test_rne(self):
+        dh = self._dh_dyn()
+        er = self._dh_to_erobot(dh)
+        dh.base = er.base = sm.SE3.Rx(0.4)
+
+        q = np.random.rand(4, 7)
+        qd = np.random.rand(4, 7) - 0.5
+        qdd = np.random.rand(4, 7)
+        fext = [1, 2, 3, 0.1, 0.2, 0.3]
+
+        nt.assert_array_almost_equal(
+            er.rne(q, qd, qdd), dh.rne(q, qd, qdd))
+        nt.assert_array_almost_equal(
+            er.rne(q[0], qd[0], qdd[0], fext=fext),
+            dh.rne(q[0], qd[0], qdd[0], fext=fext))
+        nt.assert_array_almost_equal(
+            er.rne(q, qd, qdd, grav=[0, 0, 0]),
+            dh.rne(q, qd, qdd, grav=[0, 0, 0]))
+
+        tau = np.empty((4, 7))
+        self.assertIs(er.rne(q, qd, qdd, out=tau), tau)
+        nt.assert_array_almost_equal(tau, dh.rne(q, qd, qdd))
+
+    def test_dynamics(self):
+        dh = self._dh_dyn()
+        er = self._dh_to_erobot(dh)
+
+        q = np.random.rand(4, 7)
+        qd = np.random.rand(4, 7) - 0.5
+        tau = np.random.rand(4, 7)
+
+        nt.assert_array_almost_equal(er.inertia(q), dh.inertia(q))
+        nt.assert_array_almost_equal(er.inertia(q[1]), dh.inertia(q[1]))
+        nt.assert_array_almost_equal(er.coriolis(q, qd), dh.coriolis(q, qd))
+        nt.assert_array_almost_equal(er.gravload(q), dh.gravload(q))
+        nt.assert_array_almost_equal(
+            er.accel(q, qd, tau), dh.accel(q, qd, tau))
+        nt.assert_array_almost_equal(er.friction(qd[0]), dh.friction(qd[0]))
+
+        nt.assert_array_almost_equal(
+            er.accel(q, qd, tau, method='aba'), dh.accel(q, qd, tau))
+        nt.assert_array_almost_equal(
+            er.accel(q[2], qd[2], tau[2], method='aba'),
+            dh.accel(q[2], qd[2], tau[2]))
+
+    def test_dynamics_copy(self):
+        dh = self._dh_dyn()
+        er = self._dh_to_erobot(dh)
+
+        q = np.random.rand(4, 7)
+        qd = np.random.rand(4, 7) - 0.5
+        qdd = np.random.rand(4, 7)
+
+        # the tree is kept until a link parameter changes
+        tree = er.tree
+        er.rne(q, qd, qdd)
+        self.assertIs(er.tree, tree)
+        er.links[3].m = 5.0
+        dh.links[3].m = 5.0
+        self.assertIsNot(er.tree, tree)
+        nt.assert_array_almost_equal(er.inertia(q), dh.inertia(q))
+
+        tree = er.tree
+        er.ee_link = er.links[5]
+        self.assertIsNot(er.tree, tree)
+        er.ee_link = er.links[6]
+
+        nf = er.nofriction(True, True)
+        self.assertEqual(nf.name, 'NF/' + er.name)
+        self.assertEqual(nf.n, 7)
+        nt.assert_array_almost_equal(
+            nf.rne(q, qd, qdd),
+            dh.nofriction(True, True).rne(q, qd, qdd))
+        nt.assert_array_almost_equal(
+            nf.fkine(q[0]).A, er.fkine(q[0]).A)
+
+        # the copy is independent of the original
+        nf.links[2].m = 4.0
+        nt.assert_array_almost_equal(er.rne(q, qd, qdd), dh.rne(q, qd, qdd))
+
+        pr = er.perturb(0.1)
+        self.assertEqual(pr.name, 'P/' + er.name)
+        nt.assert_array_almost_equal(pr.fkine(q[0]).A, er.fkine(q[0]).A)
+        self.assertFalse(np.allclose(pr.inertia(q), er.inertia(q)))
+
+    def test_rne_threads(self):
+        dh = self._dh_dyn()
+        er = self._dh_to_erobot(dh)
+        er.thread_rows = 4
+
+        q = np.random.rand(21, 7)
+        qd = np.random.rand(21, 7) - 0.5
+        qdd = np.random.rand(21, 7)
+
+        nt.assert_array_equal(
+            er.rne(q, qd, qdd, threads=3), er.rne(q, qd, qdd, threads=1))
+        nt.assert_array_equal(er.inertia(q, threads=3), er.inertia(q))
+        nt.assert_array_almost_equal(
+            er.gravload(q, threads=2), dh.gravload(q))
+
+    def test_gravload(self):
+        dh = self._dh_dyn()
+        er = self._dh_to_erobot(dh)
+        dh.base = er.base = sm.SE3.Ry(0.4)
+
+        q = np.random.rand(5, 7)
+        grav = np.random.rand(5, 3)
+        zero = np.zeros(7)
+
+        taug = er.gravload(q, grav=grav)
+        for i in range(5):
+            nt.assert_array_almost_equal(
+                taug[i], er.rne(q[i], zero, zero, grav=grav[i]))
+        nt.assert_array_almost_equal(er.gravload(q[1]), dh.gravload(q[1]))
+
+        # with the base tilted the first joint is not vertical
+        table = er.gravtable(npoints=4, qlim=dh.qlim)
+        nt.assert_array_equal(table.joints, range(7))
+
+        er.base = sm.SE3()
+        table = er.gravtable(npoints=4, qlim=dh.qlim)
+        nt.assert_array_equal(table.joints, range(1, 7))
+
+    def test_rne_tree(self):
+        # a trunk joint carrying two identical two joint branches
+        def link(name, parent, v=rp.ETS.ry()):
+            return rp.ELink(
+                rp.ETS.tz(0.3) * rp.ETS.rx(0.2), v, name=name, parent=parent,
+                m=1.5, r=sm.SE3(0.05, 0.1, 0.15), I=[0.1, 0.2, 0.3],
+                Jm=0.05, G=3)
+
+        root = rp.ELink(name='root')
+        trunk = link('trunk', root, rp.ETS.rz())
+        a1 = link('a1', trunk)
+        a2 = link('a2', a1, rp.ETS.tx())
+        b1 = link('b1', trunk)
+        b2 = link('b2', b1, rp.ETS.tx())
+        tree = rp.ERobot([root, trunk, a1, a2, b1, b2])
+        self.assertEqual(tree.n, 5)
+
+        q = np.random.rand(3, 5)
+        qd = np.random.rand(3, 5) - 0.5
+        qdd = np.random.rand(3, 5)
+
+        # tau = M qdd + C qd + g
+        tau = tree.rne(q, qd, qdd)
+        M = tree.inertia(q)
+        C = tree.coriolis(q, qd)
+        g = tree.gravload(q)
+        nt.assert_array_almost_equal(
+            tau,
+            np.einsum('kij,kj->ki', M, qdd) +
+            np.einsum('kij,kj->ki', C, qd) + g)
+
+        nt.assert_array_almost_equal(
+            tree.accel(q, qd, tau, method='aba'), qdd)
+
+        # branches are dynamically decoupled, except through the trunk
+        self.assertTrue(np.all(M[:, 1:3, 3:5] == 0))
+
+        # Mdot - 2C is skew symmetric
+        dt = 1e-6
+        Md = (tree.inertia(q[0] + qd[0] * dt) -
+              tree.inertia(q[0] - qd[0] * dt)) / 2 / dt
+        N = Md - 2 * C[0]
+        nt.assert_array_almost_equal(N, -N.T)
+
     def test_jacob0(self):
         panda = rp.models.ETS.Panda()
         q1 = np.array([1.4, 0.2, 1.8, 0.7, 0.1, 3.1, 2.9])
@@ -174,6 +470,34 @@ class TestETS(unittest.TestCase):
         nt.assert_array_almost_equal(panda.jacob0(q4), ans)
         self.assertRaises(TypeError, panda.jacob0, 'Wfgsrth')
 
+    def test_jacob0_traj(self):
+        panda = rp.models.ETS.Panda()
+        qq = np.random.rand(5, panda.n)
+
+        J = panda.jacob0(qq)
+        self.assertEqual(J.shape, (5, 6, panda.n))
+        for k in range(5):
+            nt.assert_array_almost_equal(J[k], panda.jacob0(qq[k]))
+
+        # prismatic joints and static links between joints
+        l0 = rp.ELink(rp.ETS.tx(0.1), rp.ETS.rx())
+        l1 = rp.ELink(rp.ETS.tz(0.2) * rp.ETS.ry(0.3), parent=l0)
+        l2 = rp.ELink(rp.ETS.tx(0.1), rp.ETS.ty(), parent=l1)
+        l3 = rp.ELink(rp.ETS.rz(0.4), rp.ETS.ry(), parent=l2)
+        l4 = rp.ELink(rp.ETS.tx(0.3), parent=l3)
+        r = rp.ERobot([l0, l1, l2, l3, l4])
+        qq = np.random.rand(4, r.n)
+
+        J = r.jacob0(qq)
+        for k in range(4):
+            # numerical derivative of the end-effector position
+            T = r.fkine(qq[k])
+            for j in range(r.n):
+                dq = np.zeros(r.n)
+                dq[j] = 1e-6
+                dT = (r.fkine(qq[k] + dq).t - T.t) / 1e-6
+                nt.assert_array_almost_equal(J[k, :3, j], dT, decimal=4)
+
     def test_hessian0(self):
         panda = rp.models.ETS.Panda()
         q1 = np.array([1.4, 0.2, 1.8, 0.7, 0.1, 3.1, 2.9])
@@ -390,6 +714,35 @@ class TestETS(unittest.TestCase):
             ValueError, panda.jacobm, [1, 3], panda.jacob0(q1),
             np.array([1, 2, 3]))
 
+    def test_hessian0_jacobm_traj(self):
+        panda = rp.models.ETS.Panda()
+        qq = np.random.rand(4, panda.n)
+
+        J = panda.jacob0(qq)
+        H = panda.hessian0(qq)
+        m = panda.manipulability(qq)
+        Jm = panda.jacobm(qq)
+
+        self.assertEqual(H.shape, (4, 6, panda.n, panda.n))
+        self.assertEqual(m.shape, (4,))
+        self.assertEqual(Jm.shape, (4, panda.n, 1))
+
+        nt.assert_array_almost_equal(panda.hessian0(J0=J), H)
+        nt.assert_array_almost_equal(panda.jacobm(J=J, H=H), Jm)
+
+        for k in range(4):
+            nt.assert_array_almost_equal(H[k], panda.hessian0(qq[k]))
+            nt.assert_almost_equal(m[k], panda.manipulability(qq[k]))
+            nt.assert_array_almost_equal(Jm[k], panda.jacobm(qq[k]))
+
+        # the manipulability Jacobian is the gradient of manipulability
+        q = qq[0]
+        for i in range(panda.n):
+            dq = np.zeros(panda.n)
+            dq[i] = 1e-6
+            dm = (panda.manipulability(q + dq) - m[0]) / 1e-6
+            nt.assert_almost_equal(Jm[0, i, 0], dm, decimal=5)
+
     def test_jacobev(self):
         pdh = rp.models.DH.Panda()
         panda = rp.models.ETS.Panda()
@@ -480,6 +833,30 @@ class TestETS(unittest.TestCase):
 
         nt.assert_array_almost_equal(r.jacob0(), ans)
 
+    def test_fold_fk_path(self):
+        l0 = rp.ELink(rp.ETS.tz(0.3) * rp.ETS.rx(0.2), rp.ETS.rz())
+        l1 = rp.ELink(rp.ETS.ty(0.1), parent=l0)
+        l2 = rp.ELink(rp.ETS.rz(0.4) * rp.ETS.tx(0.2), parent=l1)
+        l3 = rp.ELink(rp.ETS.tx(0.1), rp.ETS.ty(), parent=l2)
+        l4 = rp.ELink(rp.ETS.ry(0.3) * rp.ETS.tz(0.5), parent=l3)
+
+        r = rp.ERobot(
+            [l0, l1, l2, l3, l4], base=sm.SE3.Rx(0.2), tool=sm.SE3(0, 0, 0.1))
+        q = [0.3, 0.4]
+
+        # one constant per joint plus the trailing constant
+        self.assertEqual(len(r._fkconst), r.n + 1)
+        self.assertEqual(len(r._fkvar), r.n)
+
+        T = r.base * l0.A(q[0]) * l1.A() * l2.A() * l3.A(q[1]) * l4.A() \
+            * r.tool
+        nt.assert_array_almost_equal(r.fkine(q).A, T.A)
+
+        r.ee_link = l2
+        self.assertEqual(len(r._fkconst), 2)
+        T = r.base * l0.A(q[0]) * l1.A() * l2.A() * r.tool
+        nt.assert_array_almost_equal(r.fkine(q).A, T.A)
+
     # def test_plot(self):
     #     panda = rp.models.ETS.Panda()
     #     panda.q = panda.qr
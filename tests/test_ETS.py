@@ -147,6 +147,19 @@ class TestETS(unittest.TestCase):
         nt.assert_array_almost_equal(ets[0].T(1), sm.trotx(1))
         nt.assert_array_almost_equal(ets[1].T(2), sm.transl(2, 0, 0))
 
+    def test_T_batch(self):
+        q = [-1.2, 0, 0.4, 2.1]
+
+        for et in [rp.ETS.rx(), rp.ETS.ry(), rp.ETS.rz(),
+                   rp.ETS.tx(), rp.ETS.ty(), rp.ETS.tz()]:
+            T = et.T_batch(q)
+            self.assertEqual(T.shape, (4, 4, 4))
+            for k in range(4):
+                nt.assert_array_almost_equal(T[k], et.T(q[k]))
+
+        T = rp.ETS.ry(0.3).T_batch(q)
+        nt.assert_array_almost_equal(T[2], sm.troty(0.3))
+
 
 if __name__ == '__main__':
 